@@ -1,64 +1,119 @@
--- SCRIPT PYTHON pour l'analyse du fait (commandes livrées/ non livrées) par rapport au temps 
+# SCRIPT PYTHON pour l'analyse du fait (commandes livrées/ non livrées) par rapport au temps 
 
 # ANALYSE Y EN FONCTION DE X - VERSION CORRIGÉE
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from northwind_bi.agregats import VueAgregats
+from northwind_bi.cache import CacheFigures, CacheResultats
+from northwind_bi.classement import clients_par_mode, mode_disponible, top_k_par_groupe
+from northwind_bi.instrumentation import Traceur
+from northwind_bi.normalisation import normaliser_dataset
+from northwind_bi.rendu import barres, etiquettes, graduations, grille
+from northwind_bi.runtime import pyplot
+from northwind_bi.stockage import stock_ou_dataset
+from northwind_bi.tendance import SerieLivraison
 
-# Configuration
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
+# Configuration (style seaborn précalculé, sans importer seaborn)
+plt = pyplot(style='seaborn')
+# Stock sur disque (NORTHWIND_BI_STOCK) ou base SQL (NORTHWIND_BI_SQL) à la place du dataset
+dataset = stock_ou_dataset(globals().get('dataset'))
+trace = Traceur('analyse_temporelle', lignes=len(dataset))
+
+# Taille du classement clients
+TOP_N = 10
+# Classement : 'global', ou top N par 'employe', 'periode' (id_temps) ou 'categorie'
+MODE_CLASSEMENT = 'global'
+# Taux de livraison glissant : nombre de périodes de la fenêtre
+FENETRE_GLISSANTE = 3
 
 # ============================================
 # 1. PAR PÉRIODE (id_temps) - VOTRE EXEMPLE
 # ============================================
 
+trace.etape('diagnostic')
 # Vérification des colonnes
 print("Colonnes disponibles:", list(dataset.columns))
+dataset, rapport_types = normaliser_dataset(dataset)
+print(f"🗜️  Types compactés : {rapport_types['avant_mo']:.2f} Mo → "
+      f"{rapport_types['apres_mo']:.2f} Mo ({len(rapport_types['conversions'])} colonnes converties)")
+
+if not mode_disponible(MODE_CLASSEMENT, dataset.columns):
+    print(f"⚠️  Mode '{MODE_CLASSEMENT}' indisponible sur ce dataset : classement global")
+    MODE_CLASSEMENT = 'global'
+
+trace.etape('agregation')
+# Agrégation unique : toutes les analyses lisent le même cube (ou, sur une
+# source qui a ses agrégats matérialisés, le plus petit qui couvre chacune)
+def calculer_analyses(dataset):
+    cube = VueAgregats(dataset)
+    analyses = {}
+    if 'id_temps' in cube:
+        par_temps = cube.agreger('id_temps').reset_index()
+        serie = SerieLivraison(par_temps)
+        par_temps['taux_livraison'] = serie.taux_mensuels
+        par_temps['taux_glissant'] = serie.taux_glissants(FENETRE_GLISSANTE)
+        par_temps['variation'] = serie.variations()
+        analyses['par_temps'] = par_temps
+        analyses['tendance'] = (serie.tendance(), serie.pente())
+    if 'id_seqClient' in cube:
+        par_client = cube.agreger('id_seqClient')
+        clients_groupes, groupe = clients_par_mode(cube, MODE_CLASSEMENT)
+        analyses['top10_clients'] = top_k_par_groupe(clients_groupes, groupe, 'nbr_commande_livrees', TOP_N)
+        analyses['top5_clients'] = par_client[['nbr_commande_livrees']].nlargest(5, 'nbr_commande_livrees')
+    if 'id_seqEmployee' in cube:
+        analyses['par_employe'] = cube.agreger('id_seqEmployee')
+    return analyses
+
+# Résultats repris du cache si le dataset n'a pas changé
+analyses = CacheResultats().calculer(
+    dataset, f'analyse_temporelle_{MODE_CLASSEMENT}_{TOP_N}_{FENETRE_GLISSANTE}', calculer_analyses)
+
+# Figures reprises du cache si les agrégats tracés n'ont pas changé
+figures = CacheFigures()
 
 # Analyse par période SI id_temps présent
 if 'id_temps' in dataset.columns:
-    fig1, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-    fig1.suptitle('ANALYSE PAR PÉRIODE (id_temps)', fontweight='bold')
-    
     # Group by id_temps
-    par_temps = dataset.groupby('id_temps').agg({
-        'nbr_commande_livrees': 'sum',
-        'nbr_commande_non_livrees': 'sum'
-    }).reset_index()
-    
-    # Graphique 1: Barres groupées
-    x = range(len(par_temps))
-    width = 0.35
-    
-    ax1.bar(x, par_temps['nbr_commande_livrees'], width, 
-            label='Livrées', color='green', alpha=0.7)
-    ax1.bar([i + width for i in x], par_temps['nbr_commande_non_livrees'], width,
-            label='Non-livrées', color='red', alpha=0.7)
-    
-    ax1.set_xlabel('Période (id_temps)')
-    ax1.set_ylabel('Nombre de commandes')
-    ax1.set_title('Commandes livrées/non-livrées par période')
-    ax1.set_xticks([i + width/2 for i in x])
-    ax1.set_xticklabels(par_temps['id_temps'], rotation=45)
-    ax1.legend()
-    ax1.grid(True, alpha=0.3)
-    
-    # Graphique 2: Taux de livraison par période
-    par_temps['taux_livraison'] = (par_temps['nbr_commande_livrees'] / 
-                                  (par_temps['nbr_commande_livrees'] + 
-                                   par_temps['nbr_commande_non_livrees'])) * 100
-    
-    ax2.plot(par_temps['id_temps'], par_temps['taux_livraison'], 
-             marker='o', linewidth=2, color='blue')
-    ax2.set_xlabel('Période (id_temps)')
-    ax2.set_ylabel('Taux de livraison (%)')
-    ax2.set_title('Taux de livraison par période')
-    ax2.grid(True, alpha=0.3)
-    ax2.set_ylim([0, 100])
-    
-    plt.tight_layout()
+    par_temps = analyses['par_temps']
+    cle_figure = figures.cle('analyse_temporelle_periode', par_temps, FENETRE_GLISSANTE)
+    image = figures.obtenir(cle_figure)
+    if image is None:
+        trace.etape('construction_figure_periode')
+        fig1, axes = grille(plt, 1, 2, figsize=(15, 6), top=0.86, wspace=0.2)
+        ax1, ax2 = axes[0]
+        fig1.suptitle('ANALYSE PAR PÉRIODE (id_temps)', fontweight='bold')
+        
+        # Graphique 1: Barres groupées
+        x = range(len(par_temps))
+        width = 0.35
+        
+        barres(ax1, par_temps['nbr_commande_livrees'], largeur=width,
+               label='Livrées', color='green', alpha=0.7)
+        barres(ax1, par_temps['nbr_commande_non_livrees'], largeur=width, decalage=width,
+               label='Non-livrées', color='red', alpha=0.7)
+        
+        ax1.set_xlabel('Période (id_temps)')
+        ax1.set_ylabel('Nombre de commandes')
+        ax1.set_title('Commandes livrées/non-livrées par période')
+        ax1.set_xticks([i + width/2 for i in x])
+        ax1.set_xticklabels(par_temps['id_temps'], rotation=45)
+        ax1.legend()
+        ax1.grid(True, alpha=0.3)
+        
+        # Graphique 2: Taux de livraison par période
+        ax2.plot(par_temps['id_temps'], par_temps['taux_livraison'], 
+                 marker='o', linewidth=2, color='blue', label='Mensuel')
+        ax2.plot(par_temps['id_temps'], par_temps['taux_glissant'],
+                 linestyle='--', linewidth=2, color='orange', label=f'Glissant {FENETRE_GLISSANTE} périodes')
+        ax2.set_xlabel('Période (id_temps)')
+        ax2.set_ylabel('Taux de livraison (%)')
+        ax2.set_title('Taux de livraison par période')
+        ax2.grid(True, alpha=0.3)
+        ax2.set_ylim([0, 100])
+        ax2.legend()
+        
+        figures.enregistrer(cle_figure, fig1)
+    trace.etape('rendu_periode')
+    figures.afficher(plt, image)
     plt.show()
 
 # ============================================
@@ -68,31 +123,35 @@ if 'id_temps' in dataset.columns:
 # Pour analyser par client, on a besoin de CompanyName
 # Si pas dans dataset, on utilise id_seqClient
 if 'id_seqClient' in dataset.columns:
-    fig2, ax = plt.subplots(figsize=(12, 6))
-    
-    par_client = dataset.groupby('id_seqClient').agg({
-        'nbr_commande_livrees': 'sum',
-        'nbr_commande_non_livrees': 'sum'
-    }).nlargest(10, 'nbr_commande_livrees')  # Top 10 clients
-    
-    # Graphique barres empilées
-    x_pos = range(len(par_client))
-    
-    ax.bar(x_pos, par_client['nbr_commande_livrees'], 
-           label='Livrées', color='lightgreen', alpha=0.8)
-    ax.bar(x_pos, par_client['nbr_commande_non_livrees'],
-           bottom=par_client['nbr_commande_livrees'],
-           label='Non-livrées', color='salmon', alpha=0.8)
-    
-    ax.set_xlabel('Client (id_seqClient)')
-    ax.set_ylabel('Nombre de commandes')
-    ax.set_title('Top 10 Clients - Commandes livrées/non-livrées')
-    ax.set_xticks(x_pos)
-    ax.set_xticklabels(par_client.index, rotation=45, ha='right')
-    ax.legend()
-    ax.grid(True, alpha=0.3, axis='y')
-    
-    plt.tight_layout()
+    par_client = analyses['top10_clients']  # Top 10 clients
+    cle_figure = figures.cle('analyse_temporelle_client', par_client, MODE_CLASSEMENT, TOP_N)
+    image = figures.obtenir(cle_figure)
+    if image is None:
+        trace.etape('construction_figure_client')
+        fig2, axes = grille(plt, 1, 1, figsize=(12, 6), bottom=0.2, top=0.93)
+        ax = axes[0, 0]
+        
+        # Graphique barres empilées
+        barres(ax, par_client['nbr_commande_livrees'], 
+               label='Livrées', color='lightgreen', alpha=0.8)
+        barres(ax, par_client['nbr_commande_non_livrees'],
+               bas=par_client['nbr_commande_livrees'],
+               label='Non-livrées', color='salmon', alpha=0.8)
+        
+        ax.set_xlabel('Client (id_seqClient)')
+        ax.set_ylabel('Nombre de commandes')
+        if MODE_CLASSEMENT == 'global':
+            ax.set_title(f'Top {TOP_N} Clients - Commandes livrées/non-livrées')
+            graduations(ax, par_client.index, ha='right')
+        else:
+            ax.set_title(f'Top {TOP_N} Clients par {MODE_CLASSEMENT} - Commandes livrées/non-livrées')
+            graduations(ax, [f'{groupe}/{client}' for groupe, client in par_client.index], ha='right')
+        ax.legend()
+        ax.grid(True, alpha=0.3, axis='y')
+        
+        figures.enregistrer(cle_figure, fig2)
+    trace.etape('rendu_client')
+    figures.afficher(plt, image)
     plt.show()
 
 # ============================================
@@ -100,38 +159,41 @@ if 'id_seqClient' in dataset.columns:
 # ============================================
 
 if 'id_seqEmployee' in dataset.columns:
-    fig3, ax = plt.subplots(figsize=(12, 6))
-    
-    par_employe = dataset.groupby('id_seqEmployee').agg({
-        'nbr_commande_livrees': 'sum',
-        'nbr_commande_non_livrees': 'sum'
-    })
-    
-    # Graphique scatter: livrées vs non-livrées
-    ax.scatter(par_employe['nbr_commande_livrees'], 
-               par_employe['nbr_commande_non_livrees'],
-               s=100, alpha=0.6, color='purple')
-    
-    # Ajouter labels pour chaque point
-    for idx, row in par_employe.iterrows():
-        ax.annotate(f'Emp{idx}', 
-                   (row['nbr_commande_livrees'], row['nbr_commande_non_livrees']),
-                   fontsize=9)
-    
-    ax.set_xlabel('Commandes livrées')
-    ax.set_ylabel('Commandes non-livrées')
-    ax.set_title('Performance des employés')
-    ax.grid(True, alpha=0.3)
-    
-    # Ligne de ratio idéal (45°)
-    max_val = max(par_employe['nbr_commande_livrees'].max(),
-                  par_employe['nbr_commande_non_livrees'].max())
-    ax.plot([0, max_val], [0, max_val], 'r--', alpha=0.5, label='Ratio 1:1')
-    ax.legend()
-    
-    plt.tight_layout()
+    par_employe = analyses['par_employe']
+    cle_figure = figures.cle('analyse_temporelle_employe', par_employe)
+    image = figures.obtenir(cle_figure)
+    if image is None:
+        trace.etape('construction_figure_employe')
+        fig3, axes = grille(plt, 1, 1, figsize=(12, 6), bottom=0.1, top=0.93)
+        ax = axes[0, 0]
+        
+        # Graphique scatter: livrées vs non-livrées
+        ax.scatter(par_employe['nbr_commande_livrees'], 
+                   par_employe['nbr_commande_non_livrees'],
+                   s=100, alpha=0.6, color='purple')
+        
+        # Ajouter labels pour chaque point
+        etiquettes(ax, par_employe['nbr_commande_livrees'], par_employe['nbr_commande_non_livrees'],
+                   [f'Emp{idx}' for idx in par_employe.index], fontsize=9)
+        
+        ax.set_xlabel('Commandes livrées')
+        ax.set_ylabel('Commandes non-livrées')
+        ax.set_title('Performance des employés')
+        ax.grid(True, alpha=0.3)
+        
+        # Ligne de ratio idéal (45°)
+        max_val = max(par_employe['nbr_commande_livrees'].max(),
+                      par_employe['nbr_commande_non_livrees'].max())
+        ax.plot([0, max_val], [0, max_val], 'r--', alpha=0.5, label='Ratio 1:1')
+        ax.legend()
+        
+        figures.enregistrer(cle_figure, fig3)
+    trace.etape('rendu_employe')
+    figures.afficher(plt, image)
     plt.show()
 
+trace.etape('synthese')
+
 # ============================================
 # 4. TABLEAU SYNTHÈSE
 # ============================================
@@ -149,14 +211,14 @@ if 'id_temps' in dataset.columns:
         print(f"Période {row['id_temps']}: {total} commandes totales")
         print(f"  → Livrées: {row['nbr_commande_livrees']} ({row['taux_livraison']:.1f}%)")
         print(f"  → Non-livrées: {row['nbr_commande_non_livrees']}")
+    tendance, pente = analyses['tendance']
+    print(f"Tendance: {tendance} ({pente:+.2f} pt par période)")
 
 # Par client
 if 'id_seqClient' in dataset.columns:
     print("\n2. TOP 5 CLIENTS:")
     print("-"*40)
-    top_clients = dataset.groupby('id_seqClient').agg({
-        'nbr_commande_livrees': 'sum'
-    }).nlargest(5, 'nbr_commande_livrees')
+    top_clients = analyses['top5_clients']
     
     for client_id, cmd_livrees in top_clients.iterrows():
         print(f"Client {client_id}: {cmd_livrees['nbr_commande_livrees']} commandes livrées")
@@ -164,3 +226,5 @@ if 'id_seqClient' in dataset.columns:
 print("\n" + "="*60)
 print("ANALYSE TERMINÉE")
 print("="*60)
+
+trace.terminer()
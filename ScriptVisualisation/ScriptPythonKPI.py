@@ -1,7 +1,24 @@
-import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
+from northwind_bi.cache import CacheFigures, CacheResultats
+from northwind_bi.instrumentation import Traceur
+from northwind_bi.normalisation import normaliser_dataset
+from northwind_bi.parallele import cube_commandes
+from northwind_bi.rendu import grille
+from northwind_bi.runtime import pyplot
+from northwind_bi.stockage import stock_ou_dataset
+from northwind_bi.tendance import SerieLivraison
+
+plt = pyplot()
+# Stock sur disque (NORTHWIND_BI_STOCK) ou base SQL (NORTHWIND_BI_SQL) à la place du dataset
+dataset = stock_ou_dataset(globals().get('dataset'))
+trace = Traceur('kpi', lignes=len(dataset))
+
+# Tendance : régression du taux mensuel sur les N dernières périodes (None : tout l'historique)
+FENETRE_TENDANCE = 12
+
+trace.etape('diagnostic')
+
 print("="*60)
 print("DASHBOARD KPI - ANALYSE DES COMMANDES NORTHWIND")
 print("="*60)
@@ -9,196 +26,221 @@ print("="*60)
 # Diagnostic initial
 print(f"📊 Données reçues : {len(dataset)} lignes")
 print(f"📋 Colonnes disponibles : {list(dataset.columns)}")
+dataset, rapport_types = normaliser_dataset(dataset)
+print(f"🗜️  Types compactés : {rapport_types['avant_mo']:.2f} Mo → "
+      f"{rapport_types['apres_mo']:.2f} Mo ({len(rapport_types['conversions'])} colonnes converties)")
 
 # ============================================
 # 1. CALCUL DES KPI PRINCIPAUX
 # ============================================
 print("\n🧮 CALCUL DES INDICATEURS CLÉS...")
 
-# KPI 1 : Taux de livraison global
-total_livrees = dataset['nbr_commande_livrees'].sum()
-total_non_livrees = dataset['nbr_commande_non_livrees'].sum()
-total_commandes = total_livrees + total_non_livrees
-taux_livraison = (total_livrees / total_commandes * 100) if total_commandes > 0 else 0
-
-# KPI 2 : Distribution par statut
-pourcentage_livrees = (total_livrees / total_commandes * 100) if total_commandes > 0 else 0
-pourcentage_non_livrees = (total_non_livrees / total_commandes * 100) if total_commandes > 0 else 0
-
-# KPI 3 : Si id_temps présent, tendance mensuelle
-tendance_amelioration = "Stable"
-if 'id_temps' in dataset.columns:
-    mensuel = dataset.groupby('id_temps').agg({
-        'nbr_commande_livrees': 'sum',
-        'nbr_commande_non_livrees': 'sum'
-    }).reset_index()
-    if len(mensuel) > 1:
-        premier_mois = (mensuel.iloc[0]['nbr_commande_livrees'] / 
-                       (mensuel.iloc[0]['nbr_commande_livrees'] + 
-                        mensuel.iloc[0]['nbr_commande_non_livrees']) * 100)
-        dernier_mois = (mensuel.iloc[-1]['nbr_commande_livrees'] / 
-                       (mensuel.iloc[-1]['nbr_commande_livrees'] + 
-                        mensuel.iloc[-1]['nbr_commande_non_livrees']) * 100)
-        if dernier_mois > premier_mois + 5:
-            tendance_amelioration = "↗ Amélioration"
-        elif dernier_mois < premier_mois - 5:
-            tendance_amelioration = "↘ Baisse"
-        else:
-            tendance_amelioration = "➡ Stable"
+def calculer_kpi(dataset):
+    # Agrégation unique du fait : les KPI sont lus dans le cube
+    cube = cube_commandes(dataset, ('id_temps',))
+    totaux = cube.totaux()
+
+    # KPI 1 : Taux de livraison global
+    total_livrees = totaux['nbr_commande_livrees']
+    total_non_livrees = totaux['nbr_commande_non_livrees']
+    total_commandes = total_livrees + total_non_livrees
+    taux_livraison = (total_livrees / total_commandes * 100) if total_commandes > 0 else 0
+
+    # KPI 2 : Distribution par statut
+    pourcentage_livrees = (total_livrees / total_commandes * 100) if total_commandes > 0 else 0
+    pourcentage_non_livrees = (total_non_livrees / total_commandes * 100) if total_commandes > 0 else 0
+
+    # KPI 3 : Si id_temps présent, tendance mensuelle (régression sur la fenêtre)
+    tendance_amelioration = "Stable"
+    if 'id_temps' in cube:
+        serie = SerieLivraison.depuis_cube(cube)
+        tendance_amelioration = serie.tendance(FENETRE_TENDANCE)
+
+    return {
+        'total_livrees': total_livrees,
+        'total_non_livrees': total_non_livrees,
+        'total_commandes': total_commandes,
+        'taux_livraison': taux_livraison,
+        'pourcentage_livrees': pourcentage_livrees,
+        'pourcentage_non_livrees': pourcentage_non_livrees,
+        'tendance_amelioration': tendance_amelioration,
+    }
+
+trace.etape('agregation')
+# Résultats repris du cache si le dataset n'a pas changé
+kpi = CacheResultats().calculer(dataset, f'kpi_{FENETRE_TENDANCE}', calculer_kpi)
+total_livrees = kpi['total_livrees']
+total_non_livrees = kpi['total_non_livrees']
+total_commandes = kpi['total_commandes']
+taux_livraison = kpi['taux_livraison']
+pourcentage_livrees = kpi['pourcentage_livrees']
+pourcentage_non_livrees = kpi['pourcentage_non_livrees']
+tendance_amelioration = kpi['tendance_amelioration']
 
 # ============================================
 # 2. CRÉATION DU DASHBOARD KPI
 # ============================================
-fig = plt.figure(figsize=(16, 10))
-fig.suptitle('TABLEAU DE BORD KPI - PERFORMANCES COMMANDES', 
-             fontsize=18, fontweight='bold', y=0.98)
-
-# --------------------------
-# GRAPHIQUE 1 : GAUGE TAUX DE LIVRAISON
-# --------------------------
-ax1 = plt.subplot(2, 3, 1)
-ax1.set_title('TAUX DE LIVRAISON', fontweight='bold', fontsize=14)
-
-# Création d'un gauge chart simplifié
-angles = np.linspace(0, 180, 100)
-ax1.fill_betweenx(angles, 0, 1, color='lightgray', alpha=0.3)
-ax1.fill_betweenx(angles[:int(taux_livraison/100*len(angles))], 
-                  0, 1, color='#2ecc71', alpha=0.7)
-
-ax1.set_xlim(0, 1)
-ax1.set_ylim(0, 180)
-ax1.axis('off')
-
-# Valeur au centre
-ax1.text(0.5, 90, f'{taux_livraison:.1f}%', 
-         ha='center', va='center', fontsize=32, fontweight='bold', color='#2ecc71')
-ax1.text(0.5, 60, 'Objectif: >90%', ha='center', va='center', fontsize=10, color='gray')
-
-# --------------------------
-# GRAPHIQUE 2 : CAMEMBERT DISTRIBUTION
-# --------------------------
-ax2 = plt.subplot(2, 3, 2)
-ax2.set_title('DISTRIBUTION DES COMMANDES', fontweight='bold', fontsize=14)
-
-labels = ['Livrées', 'Non-livrées']
-sizes = [total_livrees, total_non_livrees]
-colors = ['#2ecc71', '#e74c3c']
-explode = (0.05, 0)
-
-wedges, texts, autotexts = ax2.pie(sizes, explode=explode, labels=labels, colors=colors,
-                                   autopct='%1.1f%%', startangle=90, shadow=False)
-for autotext in autotexts:
-    autotext.set_color('white')
-    autotext.set_fontweight('bold')
-
-ax2.axis('equal')
-
-# --------------------------
-# GRAPHIQUE 3 : BARRES VOLUME TOTAL
-# --------------------------
-ax3 = plt.subplot(2, 3, 3)
-ax3.set_title('VOLUME DE COMMANDES', fontweight='bold', fontsize=14)
-
-categories = ['Total', 'Livrées', 'Non-livrées']
-values = [total_commandes, total_livrees, total_non_livrees]
-colors_bar = ['#3498db', '#2ecc71', '#e74c3c']
-
-bars = ax3.bar(categories, values, color=colors_bar, alpha=0.8)
-ax3.set_ylabel('Nombre de commandes')
-ax3.grid(True, alpha=0.3, axis='y')
-
-# Ajouter les valeurs sur les barres
-for bar, value in zip(bars, values):
-    height = bar.get_height()
-    ax3.text(bar.get_x() + bar.get_width()/2., height + max(values)*0.02,
-             f'{int(value)}', ha='center', va='bottom', fontweight='bold')
-
-# --------------------------
-# GRAPHIQUE 4 : CARTES KPI
-# --------------------------
-ax4 = plt.subplot(2, 3, 4)
-ax4.axis('off')
-
-# Création de "cartes" visuelles
-card_data = [
-    {'title': 'COMMANDES TOTALES', 'value': f'{int(total_commandes)}', 'color': '#3498db'},
-    {'title': 'TAUX LIVRAISON', 'value': f'{taux_livraison:.1f}%', 'color': '#2ecc71'},
-    {'title': 'TENDANCE', 'value': tendance_amelioration, 'color': '#9b59b6'}
-]
-
-for i, card in enumerate(card_data):
-    y_pos = 0.7 - i * 0.3
-    ax4.add_patch(plt.Rectangle((0.1, y_pos), 0.8, 0.25, 
-                               color=card['color'], alpha=0.2, ec='black'))
-    ax4.text(0.5, y_pos + 0.17, card['value'], 
-             ha='center', va='center', fontsize=24, fontweight='bold', color=card['color'])
-    ax4.text(0.5, y_pos + 0.07, card['title'], 
-             ha='center', va='center', fontsize=11, color='gray')
-
-# --------------------------
-# GRAPHIQUE 5 : TABLEAU SYNTHÈSE
-# --------------------------
-ax5 = plt.subplot(2, 3, 5)
-ax5.axis('off')
-
-table_data = [
-    ['KPI', 'Valeur', 'Statut'],
-    ['Commandes totales', f'{int(total_commandes)}', '✅'],
-    ['Taux livraison', f'{taux_livraison:.1f}%', '✅' if taux_livraison > 90 else '⚠️'],
-    ['Commandes livrées', f'{int(total_livrees)}', '✅'],
-    ['Commandes non-livrées', f'{int(total_non_livrees)}', '⚠️' if pourcentage_non_livrees > 10 else '✅'],
-    ['Ratio livraison', f'1:{total_livrees/total_non_livrees:.1f}' if total_non_livrees > 0 else 'N/A', '✅']
-]
-
-table = ax5.table(cellText=table_data, cellLoc='center', 
-                  colWidths=[0.3, 0.3, 0.1], loc='center')
-table.auto_set_font_size(False)
-table.set_fontsize(11)
-table.scale(1, 2)
-
-# Colorer les cellules
-for i in range(1, len(table_data)):
-    if '⚠️' in table_data[i][2]:
-        table[(i, 2)].set_facecolor('#f1c40f')
-    elif '✅' in table_data[i][2]:
-        table[(i, 2)].set_facecolor('#2ecc71')
-
-# --------------------------
-# GRAPHIQUE 6 : JAUGE SIMPLE
-# --------------------------
-ax6 = plt.subplot(2, 3, 6)
-ax6.set_title('PERFORMANCE GLOBALE', fontweight='bold', fontsize=14)
-
-# Score sur 10
-score = min(10, taux_livraison / 10)
-ax6.barh([0], [10], color='lightgray', alpha=0.3, height=0.5)
-ax6.barh([0], [score], color='#9b59b6', alpha=0.7, height=0.5)
-ax6.set_xlim(0, 10)
-ax6.set_yticks([])
-ax6.set_xlabel('Score /10')
-
-ax6.text(score + 0.5, 0, f'{score:.1f}/10', 
-         va='center', fontsize=16, fontweight='bold', color='#9b59b6')
-
-# Légende du score
-if score >= 9:
-    evaluation = "EXCELLENT"
-    color_eval = "#27ae60"
-elif score >= 7:
-    evaluation = "BON"
-    color_eval = "#f39c12"
-else:
-    evaluation = "À AMÉLIORER"
-    color_eval = "#e74c3c"
-
-ax6.text(5, -0.5, evaluation, ha='center', va='center', 
-         fontsize=12, fontweight='bold', color=color_eval)
+# Figure reprise du cache si les KPI n'ont pas changé
+figures = CacheFigures()
+cle_figure = figures.cle('kpi', kpi)
+image = figures.obtenir(cle_figure)
+if image is None:
+    trace.etape('construction_figure')
+    fig, axes = grille(plt, 2, 3, figsize=(16, 10),
+                       left=0.03, right=0.95, bottom=0.2, hspace=0.3, wspace=0.3)
+    fig.suptitle('TABLEAU DE BORD KPI - PERFORMANCES COMMANDES', 
+                 fontsize=18, fontweight='bold', y=0.98)
+
+    # --------------------------
+    # GRAPHIQUE 1 : GAUGE TAUX DE LIVRAISON
+    # --------------------------
+    ax1 = axes[0, 0]
+    ax1.set_title('TAUX DE LIVRAISON', fontweight='bold', fontsize=14)
+
+    # Création d'un gauge chart simplifié
+    angles = np.linspace(0, 180, 100)
+    ax1.fill_betweenx(angles, 0, 1, color='lightgray', alpha=0.3)
+    ax1.fill_betweenx(angles[:int(taux_livraison/100*len(angles))], 
+                      0, 1, color='#2ecc71', alpha=0.7)
+
+    ax1.set_xlim(0, 1)
+    ax1.set_ylim(0, 180)
+    ax1.axis('off')
+
+    # Valeur au centre
+    ax1.text(0.5, 90, f'{taux_livraison:.1f}%', 
+             ha='center', va='center', fontsize=32, fontweight='bold', color='#2ecc71')
+    ax1.text(0.5, 60, 'Objectif: >90%', ha='center', va='center', fontsize=10, color='gray')
+
+    # --------------------------
+    # GRAPHIQUE 2 : CAMEMBERT DISTRIBUTION
+    # --------------------------
+    ax2 = axes[0, 1]
+    ax2.set_title('DISTRIBUTION DES COMMANDES', fontweight='bold', fontsize=14)
+
+    labels = ['Livrées', 'Non-livrées']
+    sizes = [total_livrees, total_non_livrees]
+    colors = ['#2ecc71', '#e74c3c']
+    explode = (0.05, 0)
+
+    wedges, texts, autotexts = ax2.pie(sizes, explode=explode, labels=labels, colors=colors,
+                                       autopct='%1.1f%%', startangle=90, shadow=False)
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+    ax2.axis('equal')
+
+    # --------------------------
+    # GRAPHIQUE 3 : BARRES VOLUME TOTAL
+    # --------------------------
+    ax3 = axes[0, 2]
+    ax3.set_title('VOLUME DE COMMANDES', fontweight='bold', fontsize=14)
+
+    categories = ['Total', 'Livrées', 'Non-livrées']
+    values = [total_commandes, total_livrees, total_non_livrees]
+    colors_bar = ['#3498db', '#2ecc71', '#e74c3c']
+
+    bars = ax3.bar(categories, values, color=colors_bar, alpha=0.8)
+    ax3.set_ylabel('Nombre de commandes')
+    ax3.grid(True, alpha=0.3, axis='y')
+
+    # Ajouter les valeurs sur les barres
+    for bar, value in zip(bars, values):
+        height = bar.get_height()
+        ax3.text(bar.get_x() + bar.get_width()/2., height + max(values)*0.02,
+                 f'{int(value)}', ha='center', va='bottom', fontweight='bold')
+
+    # --------------------------
+    # GRAPHIQUE 4 : CARTES KPI
+    # --------------------------
+    ax4 = axes[1, 0]
+    ax4.axis('off')
+
+    # Création de "cartes" visuelles
+    card_data = [
+        {'title': 'COMMANDES TOTALES', 'value': f'{int(total_commandes)}', 'color': '#3498db'},
+        {'title': 'TAUX LIVRAISON', 'value': f'{taux_livraison:.1f}%', 'color': '#2ecc71'},
+        {'title': 'TENDANCE', 'value': tendance_amelioration, 'color': '#9b59b6'}
+    ]
+
+    for i, card in enumerate(card_data):
+        y_pos = 0.7 - i * 0.3
+        ax4.add_patch(plt.Rectangle((0.1, y_pos), 0.8, 0.25, 
+                                   color=card['color'], alpha=0.2, ec='black'))
+        ax4.text(0.5, y_pos + 0.17, card['value'], 
+                 ha='center', va='center', fontsize=24, fontweight='bold', color=card['color'])
+        ax4.text(0.5, y_pos + 0.07, card['title'], 
+                 ha='center', va='center', fontsize=11, color='gray')
+
+    # --------------------------
+    # GRAPHIQUE 5 : TABLEAU SYNTHÈSE
+    # --------------------------
+    ax5 = axes[1, 1]
+    ax5.axis('off')
+
+    table_data = [
+        ['KPI', 'Valeur', 'Statut'],
+        ['Commandes totales', f'{int(total_commandes)}', '✅'],
+        ['Taux livraison', f'{taux_livraison:.1f}%', '✅' if taux_livraison > 90 else '⚠️'],
+        ['Commandes livrées', f'{int(total_livrees)}', '✅'],
+        ['Commandes non-livrées', f'{int(total_non_livrees)}', '⚠️' if pourcentage_non_livrees > 10 else '✅'],
+        ['Ratio livraison', f'1:{total_livrees/total_non_livrees:.1f}' if total_non_livrees > 0 else 'N/A', '✅']
+    ]
+
+    table = ax5.table(cellText=table_data, cellLoc='center', 
+                      colWidths=[0.3, 0.3, 0.1], loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(11)
+    table.scale(1, 2)
+
+    # Colorer les cellules
+    for i in range(1, len(table_data)):
+        if '⚠️' in table_data[i][2]:
+            table[(i, 2)].set_facecolor('#f1c40f')
+        elif '✅' in table_data[i][2]:
+            table[(i, 2)].set_facecolor('#2ecc71')
+
+    # --------------------------
+    # GRAPHIQUE 6 : JAUGE SIMPLE
+    # --------------------------
+    ax6 = axes[1, 2]
+    ax6.set_title('PERFORMANCE GLOBALE', fontweight='bold', fontsize=14)
+
+    # Score sur 10
+    score = min(10, taux_livraison / 10)
+    ax6.barh([0], [10], color='lightgray', alpha=0.3, height=0.5)
+    ax6.barh([0], [score], color='#9b59b6', alpha=0.7, height=0.5)
+    ax6.set_xlim(0, 10)
+    ax6.set_yticks([])
+    ax6.set_xlabel('Score /10')
+
+    ax6.text(score + 0.5, 0, f'{score:.1f}/10', 
+             va='center', fontsize=16, fontweight='bold', color='#9b59b6')
+
+    # Légende du score
+    if score >= 9:
+        evaluation = "EXCELLENT"
+        color_eval = "#27ae60"
+    elif score >= 7:
+        evaluation = "BON"
+        color_eval = "#f39c12"
+    else:
+        evaluation = "À AMÉLIORER"
+        color_eval = "#e74c3c"
+
+    ax6.text(5, -0.5, evaluation, ha='center', va='center', 
+             fontsize=12, fontweight='bold', color=color_eval)
+
+    figures.enregistrer(cle_figure, fig)
 
 # ============================================
 # 3. AFFICHAGE DES RÉSULTATS
 # ============================================
-plt.tight_layout()
+trace.etape('rendu')
+figures.afficher(plt, image)
 plt.show()
+trace.etape('synthese')
 
 # Affichage console
 print("\n" + "="*60)
@@ -219,3 +261,5 @@ else:
     print("⚠️  ATTENTION : Taux de livraison en dessous de 80%")
     
 print("="*60)
+
+trace.terminer()
@@ -1,8 +1,23 @@
 # PAGE CLIENTS - TOP 10 CLIENTS SIMPLIFIÉ
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+from northwind_bi.cache import CacheFigures, CacheResultats
+from northwind_bi.classement import mode_disponible, top_clients
+from northwind_bi.instrumentation import Traceur
+from northwind_bi.normalisation import normaliser_dataset
+from northwind_bi.rendu import barres, etiquettes, graduations, grille
+from northwind_bi.runtime import pyplot
+from northwind_bi.stockage import stock_ou_dataset
 
+plt = pyplot()
+# Stock sur disque (NORTHWIND_BI_STOCK) ou base SQL (NORTHWIND_BI_SQL) à la place du dataset
+dataset = stock_ou_dataset(globals().get('dataset'))
+trace = Traceur('top10_clients', lignes=len(dataset))
+
+# Taille du classement
+TOP_N = 10
+# Classement : 'global', ou top N par 'employe', 'periode' (id_temps) ou 'categorie'
+MODE_CLASSEMENT = 'global'
+
+trace.etape('diagnostic')
 print("="*50)
 print("ANALYSE TOP 10 CLIENTS")
 print("="*50)
@@ -18,83 +33,105 @@ if 'id_seqClient' not in dataset.columns:
              ha='center', va='center', fontsize=12)
     plt.show()
 else:
-    # 1. Calcul Top 10
-    client_stats = dataset.groupby('id_seqClient').agg({
-        'nbr_commande_livrees': 'sum',
-        'nbr_commande_non_livrees': 'sum'
-    })
+    if not mode_disponible(MODE_CLASSEMENT, dataset.columns):
+        print(f"⚠️  Mode '{MODE_CLASSEMENT}' indisponible sur ce dataset : classement global")
+        MODE_CLASSEMENT = 'global'
     
-    client_stats['total'] = client_stats['nbr_commande_livrees'] + client_stats['nbr_commande_non_livrees']
-    client_stats['taux'] = (client_stats['nbr_commande_livrees'] / client_stats['total']) * 100
+    dataset, rapport_types = normaliser_dataset(dataset)
+    print(f"🗜️  Types compactés : {rapport_types['avant_mo']:.2f} Mo → "
+          f"{rapport_types['apres_mo']:.2f} Mo ({len(rapport_types['conversions'])} colonnes converties)")
+
+    trace.etape('agregation')
+    # 1. Calcul Top N (repris du cache si le dataset n'a pas changé)
+    def calculer_top10(dataset):
+        # Top N de chaque groupe en une passe (un seul groupe en mode global),
+        # calculé par la base quand le fait est une source SQL
+        top10, nb_clients = top_clients(dataset, MODE_CLASSEMENT, TOP_N)
+        return {'nb_clients': nb_clients, 'top10': top10}
     
-    top10 = client_stats.nlargest(10, 'total')
+    resultats = CacheResultats().calculer(dataset, f'top_clients_{MODE_CLASSEMENT}_{TOP_N}', calculer_top10)
+    top10 = resultats['top10']
     
-    print(f"\n🏆 TOP 10 CLIENTS SUR {len(client_stats)} CLIENTS:")
-    for idx, (client_id, row) in enumerate(top10.iterrows(), 1):
-        print(f"{idx:2}. Client {client_id}: {row['total']:3} cmd | " +
+    if MODE_CLASSEMENT == 'global':
+        print(f"\n🏆 TOP {TOP_N} CLIENTS SUR {resultats['nb_clients']} CLIENTS:")
+        noms_clients = [str(id) for id in top10.index]
+        libelles_clients = [f'C{id}' for id in top10.index]
+    else:
+        print(f"\n🏆 TOP {TOP_N} CLIENTS PAR {MODE_CLASSEMENT.upper()} "
+              f"SUR {resultats['nb_clients']} CLIENTS:")
+        noms_clients = [f'{id} ({MODE_CLASSEMENT} {groupe})' for groupe, id in top10.index]
+        libelles_clients = [f'{groupe}/C{id}' for groupe, id in top10.index]
+    for nom, (_, row) in zip(noms_clients, top10.iterrows()):
+        print(f"{int(row['rang']):2}. Client {nom}: {row['total']:3} cmd | " +
               f"Taux: {row['taux']:5.1f}%")
     
-    # 2. Visualisation
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
-    
-    # Graphique 1: Barres empilées
-    x_pos = range(len(top10))
-    bar_width = 0.6
-    
-    bars1 = ax1.bar(x_pos, top10['nbr_commande_livrees'], bar_width,
-                    color='#2ecc71', alpha=0.8, label='Livrées')
-    bars2 = ax1.bar(x_pos, top10['nbr_commande_non_livrees'], bar_width,
-                    bottom=top10['nbr_commande_livrees'],
-                    color='#e74c3c', alpha=0.8, label='Non-livrées')
-    
-    ax1.set_xlabel('Clients')
-    ax1.set_ylabel('Nombre de commandes')
-    ax1.set_title('TOP 10 CLIENTS - VOLUME DE COMMANDES', fontweight='bold')
-    ax1.set_xticks(x_pos)
-    ax1.set_xticklabels([f'C{id}' for id in top10.index], rotation=45)
-    ax1.legend()
-    ax1.grid(True, alpha=0.3, axis='y')
-    
-    # Ajouter les totaux sur les barres
-    for i, (_, row) in enumerate(top10.iterrows()):
-        total = row['total']
-        ax1.text(i, total + 0.5, str(total), 
-                ha='center', va='bottom', fontweight='bold')
-    
-    # Graphique 2: Taux de livraison + Score
-    ax2_taux = ax2
-    bars_taux = ax2_taux.bar(x_pos, top10['taux'], bar_width,
-                            color='#3498db', alpha=0.7, label='Taux livraison')
-    
-    ax2_taux.set_xlabel('Clients')
-    ax2_taux.set_ylabel('Taux de livraison (%)', color='#3498db')
-    ax2_taux.set_title('TOP 10 CLIENTS - PERFORMANCE', fontweight='bold')
-    ax2_taux.set_xticks(x_pos)
-    ax2_taux.set_xticklabels([f'C{id}' for id in top10.index], rotation=45)
-    ax2_taux.set_ylim([0, 105])
-    ax2_taux.tick_params(axis='y', labelcolor='#3498db')
-    ax2_taux.grid(True, alpha=0.3, axis='y')
-    
-    # Ajouter les valeurs de taux
-    for i, taux in enumerate(top10['taux']):
-        ax2_taux.text(i, taux + 2, f'{taux:.1f}%', 
-                     ha='center', va='bottom', fontweight='bold', color='#3498db')
-    
-    # Second axe pour le volume (transparent)
-    ax2_vol = ax2_taux.twinx()
-    ax2_vol.plot(x_pos, top10['total'], 'o-', color='#e67e22', 
-                linewidth=2, markersize=8, label='Volume total')
-    ax2_vol.set_ylabel('Volume total (commandes)', color='#e67e22')
-    ax2_vol.tick_params(axis='y', labelcolor='#e67e22')
-    
-    # Légende combinée
-    lines_labels = [bars_taux, ax2_vol.lines[0]]
-    labels = ['Taux livraison (%)', 'Volume total']
-    ax2_taux.legend(lines_labels, labels, loc='upper right')
-    
-    plt.suptitle('ANALYSE COMPARATIVE DES TOP 10 CLIENTS', 
-                fontsize=14, fontweight='bold', y=0.98)
-    plt.tight_layout()
+    # Figure reprise du cache si le classement affiché n'a pas changé
+    figures = CacheFigures()
+    cle_figure = figures.cle('top10_clients', top10, libelles_clients, MODE_CLASSEMENT, TOP_N)
+    image = figures.obtenir(cle_figure)
+    if image is None:
+        trace.etape('construction_figure')
+        # 2. Visualisation
+        fig, axes = grille(plt, 1, 2, figsize=(16, 8), right=0.94, wspace=0.2)
+        ax1, ax2 = axes[0]
+        
+        # Graphique 1: Barres empilées
+        x_pos = range(len(top10))
+        bar_width = 0.6
+        
+        barres(ax1, top10['nbr_commande_livrees'], largeur=bar_width,
+               color='#2ecc71', alpha=0.8, label='Livrées')
+        barres(ax1, top10['nbr_commande_non_livrees'], largeur=bar_width,
+               bas=top10['nbr_commande_livrees'],
+               color='#e74c3c', alpha=0.8, label='Non-livrées')
+        
+        ax1.set_xlabel('Clients')
+        ax1.set_ylabel('Nombre de commandes')
+        ax1.set_title(f'TOP {TOP_N} CLIENTS - VOLUME DE COMMANDES', fontweight='bold')
+        graduations(ax1, libelles_clients)
+        ax1.legend()
+        ax1.grid(True, alpha=0.3, axis='y')
+        
+        # Ajouter les totaux sur les barres
+        etiquettes(ax1, x_pos, top10['total'] + 0.5, top10['total'].astype(str),
+                   ha='center', va='bottom', fontweight='bold')
+        
+        # Graphique 2: Taux de livraison + Score
+        ax2_taux = ax2
+        bars_taux = barres(ax2_taux, top10['taux'], largeur=bar_width,
+                           color='#3498db', alpha=0.7, label='Taux livraison')
+        
+        ax2_taux.set_xlabel('Clients')
+        ax2_taux.set_ylabel('Taux de livraison (%)', color='#3498db')
+        ax2_taux.set_title(f'TOP {TOP_N} CLIENTS - PERFORMANCE', fontweight='bold')
+        graduations(ax2_taux, libelles_clients)
+        ax2_taux.set_ylim([0, 105])
+        ax2_taux.tick_params(axis='y', labelcolor='#3498db')
+        ax2_taux.grid(True, alpha=0.3, axis='y')
+        
+        # Ajouter les valeurs de taux
+        etiquettes(ax2_taux, x_pos, top10['taux'] + 2, [f'{taux:.1f}%' for taux in top10['taux']],
+                   ha='center', va='bottom', fontweight='bold', color='#3498db')
+        
+        # Second axe pour le volume (transparent)
+        ax2_vol = ax2_taux.twinx()
+        ax2_vol.plot(x_pos, top10['total'], 'o-', color='#e67e22', 
+                    linewidth=2, markersize=8, label='Volume total')
+        ax2_vol.set_ylabel('Volume total (commandes)', color='#e67e22')
+        ax2_vol.tick_params(axis='y', labelcolor='#e67e22')
+        
+        # Légende combinée
+        lines_labels = [bars_taux, ax2_vol.lines[0]]
+        labels = ['Taux livraison (%)', 'Volume total']
+        ax2_taux.legend(lines_labels, labels, loc='upper right')
+        
+        plt.suptitle(f'ANALYSE COMPARATIVE DES TOP {TOP_N} CLIENTS', 
+                    fontsize=14, fontweight='bold', y=0.98)
+        figures.enregistrer(cle_figure, fig)
+    trace.etape('rendu')
+    figures.afficher(plt, image)
     plt.show()
     
     print("\n✅ Analyse clients terminée avec succès!")
+
+trace.terminer()
@@ -0,0 +1 @@
+"""Benchmarks des visuels Python (à lancer depuis la racine du projet)."""
@@ -0,0 +1,24 @@
+"""Backend matplotlib de mesure : ``plt.show()`` encode les figures en PNG
+(comme Power BI) et note l'instant du premier affichage.
+
+Utilisé via ``MPLBACKEND=module://benchmarks.backend_chrono``.
+"""
+
+import io
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas  # noqa: F401
+
+premier_affichage = None
+
+
+def show(*args, **kwargs):
+    global premier_affichage
+    import matplotlib.pyplot as plt
+
+    for numero in plt.get_fignums():
+        figure = plt.figure(numero)
+        figure.savefig(io.BytesIO(), format='png')
+        plt.close(figure)
+    if premier_affichage is None:
+        premier_affichage = time.perf_counter()
@@ -0,0 +1,133 @@
+"""Benchmark de démarrage des visuels Python.
+
+Chaque script de ``ScriptVisualisation`` est lancé dans un interpréteur
+neuf, comme le fait Power BI, et trois durées sont mesurées :
+
+* ``interpreteur_s`` : démarrage de Python et import de pandas (à la
+  charge de Power BI, qui construit ``dataset``) ;
+* ``imports_s`` : imports de tête du script ;
+* ``premiere_figure_s`` : du début du script au premier ``plt.show()``,
+  imports différés (``northwind_bi.runtime.pyplot``) et encodage PNG de
+  la figure compris.
+
+Exemple ::
+
+    python -m benchmarks.demarrage --repetitions 5
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parents[1]
+DOSSIER_SCRIPTS = RACINE / 'ScriptVisualisation'
+
+
+def dataset_exemple(nb_lignes=2000, graine=0):
+    """Petit fait synthétique au schéma TF_COMMANDE."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(graine)
+    livrees = (rng.random(nb_lignes) < 0.9).astype('int64')
+    return pd.DataFrame({
+        'id_seq_fait': np.arange(1, nb_lignes + 1),
+        'id_temps': rng.integers(1, 25, nb_lignes),
+        'id_seqEmployee': rng.integers(1, 10, nb_lignes),
+        'id_seqClient': rng.integers(1, 90, nb_lignes),
+        'nbr_commande_livrees': livrees,
+        'nbr_commande_non_livrees': 1 - livrees,
+    })
+
+
+def mesurer_enfant(chemin_script):
+    """Exécuté dans l'interpréteur neuf : retourne les durées mesurées."""
+    debut = time.perf_counter()
+    import pandas  # noqa: F401  (chargé par Power BI avant le script)
+    interpreteur = time.perf_counter() - debut
+
+    dataset = dataset_exemple()
+    source = Path(chemin_script).read_text(encoding='utf-8')
+    arbre = ast.parse(source)
+    imports = ast.Module(
+        body=[n for n in arbre.body if isinstance(n, (ast.Import, ast.ImportFrom))],
+        type_ignores=[],
+    )
+
+    espace = {'dataset': dataset, '__name__': '__main__'}
+    debut = time.perf_counter()
+    exec(compile(imports, chemin_script, 'exec'), espace)
+    imports_s = time.perf_counter() - debut
+
+    from benchmarks import backend_chrono
+
+    debut = time.perf_counter()
+    exec(compile(arbre, chemin_script, 'exec'), espace)
+    fin = backend_chrono.premier_affichage or time.perf_counter()
+    return {
+        'interpreteur_s': interpreteur,
+        'imports_s': imports_s,
+        'premiere_figure_s': fin - debut,
+    }
+
+
+def mesurer(chemin_script, repetitions=3):
+    """Lance ``repetitions`` interpréteurs neufs ; retourne les médianes."""
+    mesures = []
+    for _ in range(repetitions):
+        with tempfile.TemporaryDirectory() as cache:
+            env = dict(os.environ,
+                       MPLBACKEND='module://benchmarks.backend_chrono',
+                       NORTHWIND_BI_CACHE=cache,
+                       PYTHONPATH=os.pathsep.join(filter(None, [str(RACINE), os.environ.get('PYTHONPATH')])))
+            debut = time.perf_counter()
+            sortie = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.demarrage', '--enfant', str(chemin_script)],
+                cwd=RACINE, env=env, capture_output=True, text=True, check=True,
+            )
+            total = time.perf_counter() - debut
+        mesure = json.loads(sortie.stdout.strip().splitlines()[-1])
+        mesure['total_s'] = total
+        mesures.append(mesure)
+    return {cle: statistics.median(m[cle] for m in mesures) for cle in mesures[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temps de démarrage des visuels Python.")
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help="Une ligne JSON par script")
+    parser.add_argument('--enfant', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.enfant:
+        import contextlib
+        import io
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            mesure = mesurer_enfant(args.enfant)
+        print(json.dumps(mesure))
+        return 0
+
+    if not args.json:
+        print(f"{'Script':<45} {'Interp.':>8} {'Imports':>8} {'1re fig.':>8} {'Total':>8}")
+        print("-" * 81)
+    for chemin in sorted(DOSSIER_SCRIPTS.glob('*.py')):
+        resultat = mesurer(chemin, args.repetitions)
+        if args.json:
+            print(json.dumps({'script': chemin.name, **resultat}, ensure_ascii=False))
+        else:
+            print(f"{chemin.stem[:45]:<45} {resultat['interpreteur_s']:>7.2f}s "
+                  f"{resultat['imports_s']:>7.2f}s {resultat['premiere_figure_s']:>7.2f}s "
+                  f"{resultat['total_s']:>7.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""Calibration du seuil de calcul parallèle du cube (``SEUIL_PARALLELE``).
+
+:func:`northwind_bi.parallele.cube_commandes` calcule le cube en série sous
+``SEUIL_PARALLELE`` lignes et, si le parallèle est activé
+(``NORTHWIND_BI_PROCESSUS`` > 1), sur un pool de processus au-delà. Le bon
+seuil dépend de la machine : démarrage du pool, copie des colonnes en
+mémoire partagée, nombre de cœurs. Pour chaque taille de fait, le cube de
+toutes les dimensions est construit ici en série puis sur ``--processus``
+processus, sur le même fait synthétique (``benchmarks.synthetique``,
+compacté par ``normaliser_dataset`` comme dans les visuels) ; les deux
+cubes sont comparés et les médianes de ``--repetitions`` mesures retenues.
+
+Le seuil recommandé est la plus petite taille mesurée à partir de
+laquelle le calcul parallèle est plus rapide d'au moins ``--marge`` à
+toutes les tailles suivantes. Il s'applique avec la variable
+``NORTHWIND_BI_SEUIL_PARALLELE``, avec ``NORTHWIND_BI_PROCESSUS`` pour
+activer le parallèle. Si le parallèle ne gagne à aucune taille, le calcul
+reste en série sur cette machine (valeur par défaut).
+
+Exemples ::
+
+    python -m benchmarks.parallele
+    python -m benchmarks.parallele --tailles 5e5 1e6 2e6 4e6 8e6 16e6 --processus 8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import pandas as pd
+
+TAILLES = (250_000, 500_000, 1_000_000, 2_000_000, 4_000_000, 8_000_000)
+MARGE = 0.10
+
+
+def _chronometrer(fonction, repetitions):
+    durees, resultat = [], None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees), resultat
+
+
+def _verifier(serie, parallele, dimensions):
+    """Le cube parallèle doit être celui calculé en série."""
+    assert serie.totaux() == parallele.totaux(), (serie.totaux(), parallele.totaux())
+    for dim in dimensions:
+        pd.testing.assert_frame_equal(serie.agreger(dim), parallele.agreger(dim))
+
+
+def mesurer(parametres, processus, repetitions=3):
+    """Durées médianes du cube en série et en parallèle sur un fait de ``parametres``."""
+    from benchmarks.synthetique import generer_fait
+    from northwind_bi.agregation import DIMENSIONS
+    from northwind_bi.normalisation import normaliser_dataset
+    from northwind_bi.parallele import cube_commandes
+
+    dataset, _ = normaliser_dataset(generer_fait(**parametres))
+    serie_s, serie = _chronometrer(lambda: cube_commandes(dataset, DIMENSIONS, processus=1), repetitions)
+    parallele_s, parallele = _chronometrer(
+        lambda: cube_commandes(dataset, DIMENSIONS, processus=processus, seuil=0), repetitions)
+    _verifier(serie, parallele, DIMENSIONS)
+    return {'serie_s': serie_s, 'parallele_s': parallele_s, 'acceleration': serie_s / parallele_s}
+
+
+def seuil_recommande(resultats, marge=MARGE):
+    """Plus petite taille dont le parallèle gagne, ainsi que toutes les suivantes ; ``None`` sinon."""
+    seuil = None
+    for taille, resultat in sorted(resultats.items(), reverse=True):
+        if resultat['parallele_s'] > resultat['serie_s'] * (1 - marge):
+            break
+        seuil = taille
+    return seuil
+
+
+def main(argv=None):
+    from northwind_bi.parallele import SEUIL_PARALLELE, VARIABLE_PROCESSUS, VARIABLE_SEUIL
+
+    parser = argparse.ArgumentParser(description="Calibration du seuil de calcul parallèle du cube.")
+    parser.add_argument('--tailles', nargs='+', type=lambda v: int(float(v)), default=list(TAILLES),
+                        help="Nombres de lignes du fait (ex. 1e6 4e6)")
+    parser.add_argument('--processus', type=int, default=max(os.cpu_count() or 1, 2),
+                        help="Processus du calcul parallèle (un par cœur par défaut, au moins 2)")
+    parser.add_argument('--clients', type=int, default=89)
+    parser.add_argument('--employes', type=int, default=9)
+    parser.add_argument('--periodes', type=int, default=23)
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--marge', type=float, default=MARGE,
+                        help="Gain minimal du parallèle sur la série (0.1 = 10 %%)")
+    parser.add_argument('--json', action='store_true', help="Une ligne JSON par mesure, puis le seuil")
+    args = parser.parse_args(argv)
+    if args.processus < 2:
+        parser.error("--processus : au moins 2 (avec 1 processus, le cube est toujours calculé en série)")
+
+    if not args.json:
+        print(f"🖥️  {os.cpu_count()} cœur(s), {args.processus} processus ; seuil actuel : {SEUIL_PARALLELE:,} lignes")
+        print(f"{'Lignes':>11} {'Série':>9} {'Parallèle':>10} {'Accélération':>13}")
+        print("-" * 46)
+    resultats = {}
+    for taille in args.tailles:
+        parametres = {'nb_lignes': taille, 'nb_clients': args.clients, 'nb_employes': args.employes,
+                      'nb_periodes': args.periodes, 'graine': args.graine}
+        resultats[taille] = resultat = mesurer(parametres, args.processus, args.repetitions)
+        if args.json:
+            print(json.dumps({**parametres, 'processus': args.processus, **resultat}))
+        else:
+            print(f"{taille:>11,} {resultat['serie_s']:>8.3f}s {resultat['parallele_s']:>9.3f}s "
+                  f"{resultat['acceleration']:>12.2f}x")
+
+    seuil = seuil_recommande(resultats, args.marge)
+    if args.json:
+        print(json.dumps({'seuil_recommande': seuil, 'marge': args.marge}))
+    elif seuil is None:
+        print(f"⚠️  Le parallèle ne gagne à aucune taille mesurée (marge {args.marge:.0%}) : "
+              f"garder le calcul en série (ne pas fixer {VARIABLE_PROCESSUS})")
+    else:
+        print(f"✅ Seuil recommandé : {seuil:,} lignes "
+              f"(export {VARIABLE_PROCESSUS}={args.processus} {VARIABLE_SEUIL}={seuil})")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+"""Générateur reproductible de faits au schéma TF_COMMANDE.
+
+Les volumes vont de l'échantillon Northwind (878 commandes, 89 clients,
+9 employés, 23 mois) à 1e8 lignes. Les cardinalités et l'asymétrie de la
+popularité des clients et des employés (loi de Zipf d'exposant
+``asymetrie`` ; 0 = uniforme) sont réglables ; chaque client a son propre
+taux de livraison, tiré autour de ``taux_livraison``.
+
+Les colonnes sont en ``int64`` comme dans le ``dataset`` de Power BI :
+compter environ 48 octets par ligne (4,8 Go pour 1e8 lignes). La
+génération se fait par blocs pour ne pas ajouter de tableaux temporaires
+de la taille du fait.
+"""
+
+import numpy as np
+import pandas as pd
+
+TAILLE_BLOC = 5_000_000
+
+
+def _poids_zipf(nb, asymetrie, rng):
+    """Probabilités de Zipf, affectées aux identifiants dans un ordre aléatoire."""
+    poids = 1.0 / np.arange(1, nb + 1) ** asymetrie
+    poids = rng.permutation(poids)
+    return poids / poids.sum()
+
+
+def _blocs(nb_lignes, nb_clients, nb_employes, nb_periodes, asymetrie, taux_livraison, graine, taille_bloc):
+    """Blocs successifs ``(debut, fin, id_temps, id_employe, id_client, livrees)``."""
+    rng = np.random.default_rng(graine)
+    p_clients = _poids_zipf(nb_clients, asymetrie, rng)
+    p_employes = _poids_zipf(nb_employes, asymetrie, rng)
+    concentration = 20.0
+    taux_clients = rng.beta(taux_livraison * concentration,
+                            (1 - taux_livraison) * concentration, nb_clients)
+    for debut in range(0, nb_lignes, taille_bloc):
+        fin = min(debut + taille_bloc, nb_lignes)
+        n = fin - debut
+        clients = rng.choice(nb_clients, n, p=p_clients)
+        id_employe = rng.choice(nb_employes, n, p=p_employes) + 1
+        id_temps = rng.integers(1, nb_periodes + 1, n)
+        livrees = rng.random(n) < taux_clients[clients]
+        yield debut, fin, id_temps, id_employe, clients + 1, livrees
+
+
+def generer_fait(nb_lignes, nb_clients=89, nb_employes=9, nb_periodes=23,
+                 asymetrie=1.0, taux_livraison=0.9, graine=0, taille_bloc=TAILLE_BLOC):
+    """Fait synthétique : ``id_seq_fait``, ``id_temps``, ``id_seqEmployee``,
+    ``id_seqClient``, ``nbr_commande_livrees``, ``nbr_commande_non_livrees``."""
+    id_temps = np.empty(nb_lignes, dtype=np.int64)
+    id_employe = np.empty(nb_lignes, dtype=np.int64)
+    id_client = np.empty(nb_lignes, dtype=np.int64)
+    livrees = np.empty(nb_lignes, dtype=np.int64)
+    for debut, fin, temps, employe, client, livre in _blocs(
+            nb_lignes, nb_clients, nb_employes, nb_periodes, asymetrie, taux_livraison, graine, taille_bloc):
+        id_temps[debut:fin] = temps
+        id_employe[debut:fin] = employe
+        id_client[debut:fin] = client
+        livrees[debut:fin] = livre
+
+    non_livrees = 1 - livrees
+    return pd.DataFrame({
+        'id_seq_fait': np.arange(1, nb_lignes + 1, dtype=np.int64),
+        'id_temps': id_temps,
+        'id_seqEmployee': id_employe,
+        'id_seqClient': id_client,
+        'nbr_commande_livrees': livrees,
+        'nbr_commande_non_livrees': non_livrees,
+    }, copy=False)
+
+
+def generer_lots(nb_lignes, nb_clients=89, nb_employes=9, nb_periodes=23,
+                 asymetrie=1.0, taux_livraison=0.9, graine=0, taille_bloc=TAILLE_BLOC):
+    """Même fait que :func:`generer_fait`, en lots de ``taille_bloc`` lignes
+    (pour écrire un stock plus grand que la mémoire, voir ``northwind_bi.stockage``)."""
+    for debut, fin, temps, employe, client, livre in _blocs(
+            nb_lignes, nb_clients, nb_employes, nb_periodes, asymetrie, taux_livraison, graine, taille_bloc):
+        livrees = livre.astype(np.int64)
+        yield pd.DataFrame({
+            'id_seq_fait': np.arange(debut + 1, fin + 1, dtype=np.int64),
+            'id_temps': temps,
+            'id_seqEmployee': employe,
+            'id_seqClient': client,
+            'nbr_commande_livrees': livrees,
+            'nbr_commande_non_livrees': 1 - livrees,
+        }, copy=False)
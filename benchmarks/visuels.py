@@ -0,0 +1,242 @@
+"""Benchmark des visuels Python sur des faits synthétiques.
+
+Chaque script de ``ScriptVisualisation`` est exécuté dans un interpréteur
+neuf sur un fait généré par ``benchmarks.synthetique``, pour chaque taille
+demandée. Sont mesurés :
+
+* ``calcul_s`` : temps passé dans les fonctions de calcul des scripts
+  (celles confiées à ``CacheResultats.calculer``, ici sans cache) ;
+* ``rendu_s`` : le reste du script, construction des figures et encodage
+  PNG de chaque ``plt.show()`` compris ;
+* ``pic_memoire_mo`` : pic de mémoire résidente pendant le script, au-delà
+  du fait déjà chargé (Linux ; approximation ``ru_maxrss`` ailleurs). Avec
+  ``--stock``, les pages du stock lues par le script y sont comprises.
+
+Les résultats peuvent être enregistrés comme références puis comparés :
+une mesure qui dépasse sa référence de plus de ``--tolerance`` (et d'un
+écart absolu minimal, pour ignorer le bruit) est signalée comme
+régression et le code de sortie vaut 1.
+
+Exemples ::
+
+    python -m benchmarks.visuels --tailles 1e3 1e5 1e6 --enregistrer
+    python -m benchmarks.visuels --tailles 1e3 1e5 1e6
+    python -m benchmarks.visuels --tailles 1e7 --clients 100000 --employes 500 --periodes 120
+    python -m benchmarks.visuels --tailles 1e8 --stock /data/bench
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parents[1]
+DOSSIER_SCRIPTS = RACINE / 'ScriptVisualisation'
+REFERENCES = Path(__file__).resolve().parent / 'references.json'
+
+TAILLES = (1_000, 10_000, 100_000, 1_000_000)
+MESURES = ('calcul_s', 'rendu_s', 'pic_memoire_mo')
+# Écarts absolus en dessous desquels une hausse n'est pas une régression
+ECARTS_MINIMAUX = {'calcul_s': 0.05, 'rendu_s': 0.15, 'pic_memoire_mo': 10.0}
+
+
+# ============================================
+# 1. MESURE DANS L'INTERPRÉTEUR NEUF
+# ============================================
+
+def _memoire():
+    """Mémoire résidente courante et pic, en octets (``None`` si inconnus)."""
+    try:
+        with open('/proc/self/status') as fichier:
+            champs = dict(ligne.split(':', 1) for ligne in fichier)
+        return int(champs['VmRSS'].split()[0]) * 1024, int(champs['VmHWM'].split()[0]) * 1024
+    except (OSError, KeyError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pic *= 1 if sys.platform == 'darwin' else 1024
+    return pic, pic
+
+
+def _reinitialiser_pic():
+    """Remet le pic de mémoire résidente au niveau courant (Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fichier:
+            fichier.write('5')
+    except OSError:
+        pass
+
+
+def mesurer_enfant(chemin_script, parametres, stock=None):
+    """Exécuté dans l'interpréteur neuf : retourne les mesures du script.
+
+    Avec ``stock`` (dossier), le fait est écrit en flux dans un stock sur
+    disque et le script le lit via ``NORTHWIND_BI_STOCK`` au lieu d'un
+    ``dataset`` en mémoire.
+    """
+    from benchmarks.synthetique import generer_fait, generer_lots
+    from northwind_bi.cache import CacheResultats
+    import matplotlib.pyplot  # noqa: F401  (backend de mesure, voir MPLBACKEND)
+
+    if stock:
+        from northwind_bi.stockage import VARIABLE, ecrire_stock
+
+        ecrire_stock(generer_lots(**parametres), stock)
+        os.environ[VARIABLE] = str(stock)
+        dataset = None
+    else:
+        dataset = generer_fait(**parametres)
+    code = compile(Path(chemin_script).read_text(encoding='utf-8'), chemin_script, 'exec')
+
+    duree_calcul = 0.0
+
+    def calculer(self, dataset, nom, fonction):
+        nonlocal duree_calcul
+        debut = time.perf_counter()
+        resultat = fonction(dataset)
+        duree_calcul += time.perf_counter() - debut
+        return resultat
+
+    CacheResultats.calculer = calculer
+    _reinitialiser_pic()
+    rss_avant, _ = _memoire()
+    debut = time.perf_counter()
+    exec(code, {'__name__': '__main__'} if stock else {'dataset': dataset, '__name__': '__main__'})
+    total = time.perf_counter() - debut
+    _, pic = _memoire()
+    return {
+        'calcul_s': duree_calcul,
+        'rendu_s': total - duree_calcul,
+        'pic_memoire_mo': (pic - rss_avant) / 2**20 if pic is not None else None,
+    }
+
+
+def mesurer(chemin_script, parametres, repetitions=3, stock=None):
+    """Lance ``repetitions`` interpréteurs neufs ; retourne les médianes."""
+    mesures = []
+    for _ in range(repetitions):
+        with tempfile.TemporaryDirectory() as cache:
+            env = dict(os.environ,
+                       MPLBACKEND='module://benchmarks.backend_chrono',
+                       NORTHWIND_BI_CACHE=cache,
+                       PYTHONPATH=os.pathsep.join(filter(None, [str(RACINE), os.environ.get('PYTHONPATH')])))
+            commande = [sys.executable, '-m', 'benchmarks.visuels', '--enfant', str(chemin_script),
+                        '--parametres', json.dumps(parametres)]
+            if stock:
+                commande += ['--stock', str(Path(stock) / 'fait')]
+            sortie = subprocess.run(commande, cwd=RACINE, env=env, capture_output=True, text=True, check=True)
+        mesures.append(json.loads(sortie.stdout.strip().splitlines()[-1]))
+    return {cle: statistics.median(m[cle] for m in mesures) if mesures[0][cle] is not None else None
+            for cle in MESURES}
+
+
+# ============================================
+# 2. RÉFÉRENCES ET RÉGRESSIONS
+# ============================================
+
+def cle_reference(script, parametres, stock=False):
+    return (f"{script}|{parametres['nb_lignes']}|{parametres['nb_clients']}|"
+            f"{parametres['nb_employes']}|{parametres['nb_periodes']}|{parametres['asymetrie']}"
+            + ("|stock" if stock else ""))
+
+
+def charger_references(chemin):
+    try:
+        return json.loads(Path(chemin).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return {}
+
+
+def regressions(resultat, reference, tolerance):
+    """Mesures de ``resultat`` en hausse de plus de ``tolerance`` sur la référence."""
+    hausses = []
+    for mesure in MESURES:
+        avant, apres = reference.get(mesure), resultat.get(mesure)
+        if avant is None or apres is None:
+            continue
+        if apres > avant * (1 + tolerance) and apres - avant > ECARTS_MINIMAUX[mesure]:
+            hausses.append(f"{mesure} {avant:.3g} → {apres:.3g}")
+    return hausses
+
+
+# ============================================
+# 3. LIGNE DE COMMANDE
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark des visuels sur faits synthétiques.")
+    parser.add_argument('--tailles', nargs='+', type=lambda v: int(float(v)), default=list(TAILLES),
+                        help="Nombres de lignes du fait (ex. 1e3 1e6)")
+    parser.add_argument('--clients', type=int, default=89)
+    parser.add_argument('--employes', type=int, default=9)
+    parser.add_argument('--periodes', type=int, default=23)
+    parser.add_argument('--asymetrie', type=float, default=1.0, help="Exposant de Zipf (0 = uniforme)")
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--scripts', nargs='+', help="Filtre sur le nom des scripts")
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--references', default=str(REFERENCES))
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--enregistrer', action='store_true', help="Enregistre les mesures comme références")
+    parser.add_argument('--json', action='store_true', help="Une ligne JSON par mesure")
+    parser.add_argument('--stock', help="Dossier de travail : scripts exécutés sur un stock de faits "
+                                        "sur disque (northwind_bi.stockage) au lieu d'un DataFrame")
+    parser.add_argument('--enfant', help=argparse.SUPPRESS)
+    parser.add_argument('--parametres', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.enfant:
+        import contextlib
+        import io
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            mesure = mesurer_enfant(args.enfant, json.loads(args.parametres), args.stock)
+        print(json.dumps(mesure))
+        return 0
+
+    scripts = sorted(DOSSIER_SCRIPTS.glob('*.py'))
+    if args.scripts:
+        scripts = [s for s in scripts if any(f.lower() in s.name.lower() for f in args.scripts)]
+    references = charger_references(args.references)
+    nouvelles = dict(references)
+    nb_regressions = 0
+
+    if not args.json:
+        print(f"{'Script':<40} {'Lignes':>11} {'Calcul':>9} {'Rendu':>9} {'Mémoire':>10}  Statut")
+        print("-" * 92)
+    for taille in args.tailles:
+        parametres = {'nb_lignes': taille, 'nb_clients': args.clients, 'nb_employes': args.employes,
+                      'nb_periodes': args.periodes, 'asymetrie': args.asymetrie, 'graine': args.graine}
+        for chemin in scripts:
+            resultat = mesurer(chemin, parametres, args.repetitions, args.stock)
+            cle = cle_reference(chemin.name, parametres, bool(args.stock))
+            hausses = regressions(resultat, references[cle], args.tolerance) if cle in references else []
+            nb_regressions += bool(hausses)
+            nouvelles[cle] = resultat
+            if args.json:
+                print(json.dumps({'script': chemin.name, **parametres, **resultat,
+                                  'regressions': hausses}, ensure_ascii=False))
+                continue
+            statut = ('❌ ' + ', '.join(hausses)) if hausses else ('✅' if cle in references else '—')
+            memoire = f"{resultat['pic_memoire_mo']:>7.1f} Mo" if resultat['pic_memoire_mo'] is not None else f"{'?':>10}"
+            print(f"{chemin.stem[:40]:<40} {taille:>11,} {resultat['calcul_s']:>8.3f}s "
+                  f"{resultat['rendu_s']:>8.3f}s {memoire}  {statut}")
+
+    if args.enregistrer:
+        Path(args.references).write_text(json.dumps(nouvelles, indent=2, sort_keys=True), encoding='utf-8')
+        if not args.json:
+            print(f"💾 Références enregistrées dans {args.references}")
+    if nb_regressions and not args.json:
+        print(f"⚠️  {nb_regressions} régression(s) au-delà de {args.tolerance:.0%}")
+    return 1 if nb_regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
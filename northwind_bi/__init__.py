@@ -0,0 +1,6 @@
+"""Module partagé des visuels Python Power BI (commandes Northwind).
+
+Les scripts de ``ScriptVisualisation`` importent ce paquet : le dossier
+parent de ``northwind_bi`` doit donc figurer dans le ``PYTHONPATH`` de
+l'interpréteur configuré dans Power BI.
+"""
@@ -0,0 +1,193 @@
+"""Cube d'agrégation partagé par les visuels.
+
+La table de fait est parcourue une seule fois : chaque dimension est codée
+en entiers puis les commandes livrées / non livrées sont cumulées dans un
+cube dense ``id_temps × id_seqClient × id_seqEmployee``. Toutes les
+agrégations des scripts (par client, par période, par employé, totaux) sont
+ensuite de simples sommes sur les axes du cube.
+
+Quand le cube dense serait trop grand (beaucoup de clients, d'employés et
+de périodes), seules les cases observées sont conservées, triées par indice
+linéaire ; les agrégations regroupent alors ces cases.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ('id_temps', 'id_seqClient', 'id_seqEmployee')
+MESURES = ('nbr_commande_livrees', 'nbr_commande_non_livrees')
+# Au-delà de ce nombre de cases (et du double du nombre de lignes), cube creux
+SEUIL_DENSE = 1 << 22
+# Clés entières sans manquant sur une plage plus courte : codées par soustraction
+PLAGE_DIRECTE = 1 << 12
+
+
+def coder(colonne):
+    """Codes entiers ``0..n-1`` de la colonne (-1 si vide) et leurs modalités.
+
+    Une clé entière contiguë (``id_temps`` d'une Dim_Temps calendaire) est
+    codée par ``valeur - minimum`` : les modalités sont alors toute la plage,
+    observée ou non, ce qui est sans effet sur les agrégations (les cases
+    vides en sont écartées).
+    """
+    if isinstance(colonne.dtype, np.dtype) and colonne.dtype.kind in 'iu' and len(colonne):
+        valeurs = colonne.to_numpy()
+        minimum, maximum = int(valeurs.min()), int(valeurs.max())
+        if maximum - minimum < PLAGE_DIRECTE:
+            modalites = np.arange(minimum, maximum + 1).astype(valeurs.dtype)
+            return (valeurs - valeurs.dtype.type(minimum)).astype(np.intp), modalites
+    return pd.factorize(colonne, sort=True)
+
+
+class CubeCommandes:
+    """Cube dense des commandes livrées / non livrées.
+
+    Seules les dimensions présentes dans ``dataset`` sont retenues (Power BI
+    ne transmet que les champs glissés dans le visuel). Une case
+    supplémentaire par axe recueille les lignes dont la clé est vide : elles
+    comptent dans les totaux mais pas dans les agrégations par dimension,
+    comme avec ``groupby``.
+    """
+
+    def __init__(self, dataset, dimensions=DIMENSIONS):
+        self.dimensions = tuple(d for d in dimensions if d in dataset.columns)
+        self.nb_lignes = len(dataset)
+        self.modalites = {}
+
+        codes = []
+        forme = []
+        for dim in self.dimensions:
+            code, uniques = coder(dataset[dim])
+            n = len(uniques)
+            codes.append(np.where(code < 0, n, code))
+            forme.append(n + 1)
+            self.modalites[dim] = uniques
+        self.forme = tuple(forme)
+
+        # Un seul passage : indice linéaire de la case puis bincount par mesure
+        if codes:
+            plat = np.ravel_multi_index(codes, self.forme)
+        else:
+            plat = np.zeros(len(dataset), dtype=np.intp)
+        taille = math.prod(self.forme)
+        self.dense = taille <= max(SEUIL_DENSE, 2 * len(dataset))
+        if self.dense:
+            self.cases = None
+        else:
+            self.cases, plat = np.unique(plat, return_inverse=True)
+            taille = len(self.cases)
+
+        self.cellules = {}
+        for mesure in MESURES:
+            colonne = dataset[mesure]
+            valeurs = colonne.to_numpy(dtype='float64', na_value=0.0)
+            somme = np.bincount(plat, weights=valeurs, minlength=taille)
+            if pd.api.types.is_integer_dtype(colonne) or pd.api.types.is_bool_dtype(colonne):
+                somme = somme.astype('int64')
+            self.cellules[mesure] = somme.reshape(self.forme) if self.dense else somme
+        self.effectifs = np.bincount(plat, minlength=taille)
+        if self.dense:
+            self.effectifs = self.effectifs.reshape(self.forme)
+
+    @classmethod
+    def depuis_cases(cls, dimensions, modalites, nb_lignes, cases, cellules, effectifs):
+        """Cube assemblé à partir de cases déjà cumulées.
+
+        ``cases`` sont des indices linéaires (uniques ou non) dans la forme
+        ``(len(modalites[dim]) + 1, ...)`` ; ``cellules`` et ``effectifs``
+        leurs sommes. Sert à fusionner les cumuls partiels d'un calcul
+        parallèle (:mod:`northwind_bi.parallele`).
+        """
+        cube = cls.__new__(cls)
+        cube.dimensions = tuple(dimensions)
+        cube.nb_lignes = nb_lignes
+        cube.modalites = dict(modalites)
+        cube.forme = tuple(len(cube.modalites[dim]) + 1 for dim in cube.dimensions)
+        taille = math.prod(cube.forme)
+        cube.dense = taille <= max(SEUIL_DENSE, 2 * nb_lignes)
+        if cube.dense:
+            cube.cases = None
+            plat = cases
+        else:
+            cube.cases, plat = np.unique(cases, return_inverse=True)
+            taille = len(cube.cases)
+
+        def cumuler(valeurs):
+            somme = np.bincount(plat, weights=valeurs, minlength=taille)
+            if valeurs.dtype.kind in 'iub':
+                somme = somme.astype('int64')
+            return somme.reshape(cube.forme) if cube.dense else somme
+
+        cube.cellules = {mesure: cumuler(cellules[mesure]) for mesure in MESURES}
+        cube.effectifs = cumuler(effectifs)
+        return cube
+
+    def __contains__(self, dimension):
+        return dimension in self.dimensions
+
+    def totaux(self):
+        """Totaux globaux des mesures (toutes lignes confondues)."""
+        return {mesure: self.cellules[mesure].sum() for mesure in MESURES}
+
+    def agreger(self, dimensions):
+        """Équivalent de ``dataset.groupby(dimensions)[MESURES].sum()``.
+
+        ``dimensions`` est un nom de colonne ou une liste de noms ; le
+        DataFrame retourné est indexé par ces clés, triées, et ne contient
+        que les combinaisons observées.
+        """
+        if isinstance(dimensions, str):
+            dimensions = [dimensions]
+        dimensions = list(dimensions)
+        for dim in dimensions:
+            if dim not in self.dimensions:
+                raise KeyError(f"Dimension absente du dataset : {dim}")
+
+        axes = [self.dimensions.index(dim) for dim in dimensions]
+        if not self.dense:
+            return self._agreger_creux(dimensions, axes)
+        autres = tuple(i for i in range(len(self.dimensions)) if i not in axes)
+        # Axes conservés dans l'ordre demandé, sans la case des clés vides
+        ordre = np.argsort(np.argsort(axes))
+        coupe = tuple(slice(0, self.forme[i] - 1) for i in sorted(axes))
+
+        def reduire(cube):
+            return np.transpose(cube.sum(axis=autres)[coupe], ordre)
+
+        presence = reduire(self.effectifs) > 0
+        if len(dimensions) == 1:
+            index = pd.Index(self.modalites[dimensions[0]], name=dimensions[0])
+        else:
+            index = pd.MultiIndex.from_product(
+                [self.modalites[dim] for dim in dimensions], names=dimensions)
+        resultat = pd.DataFrame(
+            {mesure: reduire(self.cellules[mesure]).ravel() for mesure in MESURES},
+            index=index,
+        )
+        return resultat[presence.ravel()]
+
+    def _agreger_creux(self, dimensions, axes):
+        """``agreger`` sur les seules cases observées du cube creux."""
+        coordonnees = np.unravel_index(self.cases, self.forme)
+        codes = [coordonnees[i] for i in axes]
+        forme = [self.forme[i] - 1 for i in axes]
+        # Cases dont une des clés demandées est vide : écartées
+        valides = np.logical_and.reduce([c < n for c, n in zip(codes, forme)])
+        cles = np.ravel_multi_index([c[valides] for c in codes], forme)
+        groupes, inverse = np.unique(cles, return_inverse=True)
+
+        colonnes = {}
+        for mesure in MESURES:
+            cellules = self.cellules[mesure]
+            somme = np.bincount(inverse, weights=cellules[valides], minlength=len(groupes))
+            colonnes[mesure] = somme.astype(cellules.dtype, copy=False)
+        codes_groupes = np.unravel_index(groupes, forme)
+        if len(dimensions) == 1:
+            index = pd.Index(self.modalites[dimensions[0]].take(codes_groupes[0]), name=dimensions[0])
+        else:
+            index = pd.MultiIndex.from_arrays(
+                [self.modalites[dim].take(c) for dim, c in zip(dimensions, codes_groupes)],
+                names=dimensions)
+        return pd.DataFrame(colonnes, index=index)
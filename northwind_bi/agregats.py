@@ -0,0 +1,194 @@
+"""Agrégats matérialisés du fait et routage des agrégations.
+
+Les visuels n'interrogent le fait qu'à quelques grains : par client (Top 10,
+catégorisation), par ``id_temps`` (tendance du KPI, analyse temporelle),
+par employé (analyse temporelle) et au total (KPI). La construction du
+fait produit donc aussi un agrégat par grain (:data:`GRAINS`, plus
+client × ``id_temps``) : sommes des mesures et nombre de lignes de fait
+(``effectif``) par combinaison de clés, clés vides comprises.
+
+Une source qui a ses agrégats (stock sur disque, base SQL) répond à chaque
+demande avec le plus petit agrégat qui la couvre (:func:`choisir_grain`).
+Les visuels lisent alors des milliers de lignes au lieu de millions, et
+retrouvent le même cube (:func:`cube_agregat`) que sur le fait. Sans
+agrégat couvrant, la demande retombe sur le fait.
+"""
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.agregation import DIMENSIONS, MESURES, CubeCommandes, coder
+
+# Grain -> clés de regroupement
+GRAINS = {
+    'total': (),
+    'employe': ('id_seqEmployee',),
+    'temps': ('id_temps',),
+    'client': ('id_seqClient',),
+    'client_temps': ('id_seqClient', 'id_temps'),
+}
+EFFECTIF = 'effectif'
+# Tables SQL des agrégats : AGG_COMMANDE_CLIENT, AGG_COMMANDE_TEMPS, ...
+PREFIXE_TABLE = 'AGG_COMMANDE_'
+# Lignes de cumuls partiels au-delà desquelles ils sont regroupés
+TAILLE_COMPACTAGE = 1_000_000
+
+
+def table_agregat(grain, prefixe=PREFIXE_TABLE):
+    return f'{prefixe}{grain.upper()}'
+
+
+# ============================================
+# 1. PRODUCTION DES AGRÉGATS
+# ============================================
+
+def agreger_lot(lot, dimensions):
+    """Sommes des mesures et effectif de ``lot`` par ``dimensions`` (clés vides gardées).
+
+    L'effectif est le nombre de lignes, ou la somme de la colonne ``effectif``
+    si le lot en a une (différences d'un rafraîchissement incrémental).
+    """
+    sommes = list(MESURES) + ([EFFECTIF] if EFFECTIF in lot.columns else [])
+    if not dimensions:
+        resultat = pd.DataFrame({colonne: [lot[colonne].sum()] for colonne in sommes})
+        if EFFECTIF not in resultat:
+            resultat[EFFECTIF] = len(lot)
+        return resultat.astype('int64')
+    cles = lot[list(dimensions)].astype('Int64')
+    valeurs = lot[sommes].astype('int64')
+    groupes = pd.concat([cles, valeurs], axis=1).groupby(list(dimensions), dropna=False, sort=False)
+    resultat = groupes[sommes].sum()
+    if EFFECTIF not in resultat:
+        resultat[EFFECTIF] = groupes.size()
+    return resultat.reset_index()
+
+
+def fusionner_agregats(parties, dimensions):
+    """Regroupe des agrégats partiels du même grain (effectifs compris)."""
+    colonnes = list(MESURES) + [EFFECTIF]
+    table = pd.concat(parties, ignore_index=True)
+    if not dimensions:
+        return table[colonnes].sum().to_frame().T.astype('int64')
+    table = table.astype({dim: 'Int64' for dim in dimensions})
+    return table.groupby(list(dimensions), dropna=False)[colonnes].sum().reset_index()
+
+
+class CumulAgregats:
+    """Agrégats de chaque grain, cumulés lot par lot pendant la construction du fait."""
+
+    def __init__(self, grains=GRAINS):
+        self.grains = dict(grains)
+        self._parties = {nom: [] for nom in self.grains}
+        self._lignes = {nom: 0 for nom in self.grains}
+
+    def ajouter(self, lot):
+        for nom, dimensions in self.grains.items():
+            partie = agreger_lot(lot, dimensions)
+            self._parties[nom].append(partie)
+            self._lignes[nom] += len(partie)
+            # Compactage amorti : le cumul reste de la taille du grain
+            if self._lignes[nom] > max(TAILLE_COMPACTAGE, 2 * len(self._parties[nom][0])):
+                self._compacter(nom)
+        return self
+
+    def _compacter(self, nom):
+        table = fusionner_agregats(self._parties[nom], self.grains[nom])
+        self._parties[nom] = [table]
+        self._lignes[nom] = len(table)
+
+    def suivre(self, lots):
+        """Transmet les lots tels quels, en les cumulant au passage."""
+        for lot in lots:
+            self.ajouter(lot)
+            yield lot
+
+    def tables(self):
+        """``{grain: DataFrame}`` triés par clés (vides en dernier)."""
+        resultat = {}
+        for nom, dimensions in self.grains.items():
+            if self._parties[nom]:
+                self._compacter(nom)
+                resultat[nom] = self._parties[nom][0]
+            else:
+                resultat[nom] = agreger_lot(pd.DataFrame(columns=list(dimensions) + list(MESURES)),
+                                            dimensions)
+        return resultat
+
+
+def ecrire_agregats_sql(tables, connexion, prefixe=PREFIXE_TABLE):
+    """Remplace les tables des agrégats ; retourne ``{table: nombre de lignes}``."""
+    bilan = {}
+    for nom, table in tables.items():
+        table.to_sql(table_agregat(nom, prefixe), connexion, index=False, if_exists='replace')
+        bilan[table_agregat(nom, prefixe)] = len(table)
+    return bilan
+
+
+# ============================================
+# 2. ROUTAGE
+# ============================================
+
+def choisir_grain(dimensions, tailles, grains=GRAINS):
+    """Plus petit agrégat disponible (``tailles`` : ``{grain: lignes}``) couvrant ``dimensions``."""
+    candidats = [(taille, nom) for nom, taille in tailles.items()
+                 if nom in grains and set(dimensions) <= set(grains[nom])]
+    return min(candidats)[1] if candidats else None
+
+
+def cube_agregat(table, dimensions):
+    """:class:`CubeCommandes` des ``dimensions``, à partir des lignes d'un agrégat.
+
+    Le grain de l'agrégat peut être plus fin que ``dimensions`` : ses lignes
+    sont alors cumulées dans les mêmes cases.
+    """
+    codes, modalites = [], {}
+    for dim in dimensions:
+        cles = table[dim]
+        if not cles.hasnans:
+            # Sans clé vide, l'entier numpy permet le codage par soustraction
+            cles = cles.astype('int64')
+        code, uniques = coder(cles)
+        code = np.where(code < 0, len(uniques), code)
+        codes.append(code)
+        modalites[dim] = uniques
+    forme = tuple(len(modalites[dim]) + 1 for dim in dimensions)
+    cases = np.ravel_multi_index(codes, forme) if codes else np.zeros(len(table), dtype=np.intp)
+    effectifs = table[EFFECTIF].to_numpy(dtype='int64')
+    return CubeCommandes.depuis_cases(
+        tuple(dimensions), modalites, int(effectifs.sum()), cases,
+        {mesure: table[mesure].to_numpy(dtype='int64') for mesure in MESURES}, effectifs,
+    )
+
+
+class VueAgregats:
+    """Agrégations d'un visuel, servies par les agrégats de la source.
+
+    Même interface que :class:`CubeCommandes` (``in``, ``agreger``,
+    ``totaux``). Sur une source qui a ses agrégats, chaque grain demandé a
+    son propre cube, tiré du plus petit agrégat couvrant. Sur un dataset
+    brut, un seul cube de toutes les dimensions répond à tout.
+    """
+
+    def __init__(self, donnees, dimensions=DIMENSIONS):
+        self.donnees = donnees
+        self.dimensions = tuple(d for d in dimensions if d in donnees.columns)
+        self.routee = bool(getattr(donnees, 'agregats', None))
+        self._cubes = {}
+
+    def __contains__(self, dimension):
+        return dimension in self.dimensions
+
+    def cube(self, dimensions=()):
+        from northwind_bi.parallele import cube_commandes
+
+        cle = tuple(sorted(dimensions)) if self.routee else self.dimensions
+        if cle not in self._cubes:
+            self._cubes[cle] = cube_commandes(self.donnees, cle)
+        return self._cubes[cle]
+
+    def agreger(self, dimensions):
+        dimensions = [dimensions] if isinstance(dimensions, str) else list(dimensions)
+        return self.cube(dimensions).agreger(dimensions)
+
+    def totaux(self):
+        return self.cube().totaux()
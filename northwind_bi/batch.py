@@ -0,0 +1,200 @@
+"""Rendu en lot des dashboards, hors Power BI.
+
+Les scripts de ``ScriptVisualisation`` sont exécutés tels quels avec le
+backend ``Agg`` sur des tranches du fait (par employé, par année, par
+segment client) ; chaque ``plt.show()`` enregistre la figure en PNG / SVG
+au lieu de l'afficher. Le fait est chargé une seule fois puis les tranches
+sont réparties sur un pool de processus.
+
+Exemple ::
+
+    python -m northwind_bi.batch fait.csv --dim-temps dim_temps.csv \\
+        --sortie rendus --format png svg --processus 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import runpy
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from northwind_bi.normalisation import normaliser_dataset
+
+DOSSIER_SCRIPTS = Path(__file__).resolve().parents[1] / 'ScriptVisualisation'
+
+DASHBOARDS = {
+    'kpi': 'ScriptPythonKPI.py',
+    'top10': 'ScriptPythonTop10ClientParLivraison.py',
+    'temporel': 'ScriptPythonAnalyseTemporelle.py',
+}
+TRANCHES = ('tout', 'employe', 'annee', 'segment')
+COLONNES_TRANCHE = {'employe': 'id_seqEmployee', 'annee': 'annee', 'segment': 'segment'}
+
+# État propre à chaque processus du pool
+_fait = None
+_tache = None
+
+
+# ============================================
+# 1. DÉCOUPAGE EN TRANCHES
+# ============================================
+
+def segmenter_clients(fait):
+    """Segment adaptatif de chaque client, seuils calculés sur toute la base."""
+    from northwind_bi.categorisation import categoriser_clients_adaptative
+    from northwind_bi.normalisation import ajouter_indicateurs
+    from northwind_bi.parallele import cube_commandes
+
+    clients = cube_commandes(fait, dimensions=('id_seqClient',)).agreger('id_seqClient')
+    ajouter_indicateurs(clients)
+    return categoriser_clients_adaptative(clients)
+
+
+def preparer_tranches(fait, dim_temps=None, types=TRANCHES):
+    """Ajoute les colonnes de découpage et liste les tranches ``(type, valeur)``."""
+    tranches = []
+    if 'tout' in types:
+        tranches.append(('tout', 'tout'))
+    if 'employe' in types:
+        tranches += [('employe', v) for v in sorted(fait['id_seqEmployee'].dropna().unique())]
+    if 'annee' in types:
+        if dim_temps is None:
+            raise ValueError("Le découpage par année nécessite Dim_Temps (--dim-temps)")
+        fait['annee'] = fait['id_temps'].map(dim_temps.set_index('id_temps')['annee'])
+        tranches += [('annee', v) for v in sorted(fait['annee'].dropna().unique())]
+    if 'segment' in types:
+        fait['segment'] = fait['id_seqClient'].map(segmenter_clients(fait)).astype('string')
+        tranches += [('segment', v) for v in sorted(fait['segment'].dropna().unique())]
+    return tranches
+
+
+# ============================================
+# 2. TRAVAIL D'UN PROCESSUS
+# ============================================
+
+def _initialiser(fait):
+    global _fait
+    import matplotlib
+    matplotlib.use('Agg')
+    # Les emojis des tableaux n'existent pas dans la police par défaut
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+    import matplotlib.pyplot as plt
+
+    from northwind_bi import parallele
+    from northwind_bi.cache import VARIABLE_FIGURES
+
+    _fait = fait
+    # Un processus par tranche : pas de second pool dans le cube des visuels
+    parallele.PROCESSUS = 1
+    # Figures vectorielles voulues : pas d'image PNG reprise du cache
+    os.environ[VARIABLE_FIGURES] = '0'
+    plt.show = _enregistrer
+
+
+def _enregistrer(*args, **kwargs):
+    """Remplace ``plt.show`` : enregistre puis ferme les figures ouvertes."""
+    import matplotlib.pyplot as plt
+
+    for numero in plt.get_fignums():
+        figure = plt.figure(numero)
+        rang = len(_tache['fichiers']) // len(_tache['formats']) + 1
+        for extension in _tache['formats']:
+            chemin = _tache['dossier'] / f"{_tache['prefixe']}_{rang}.{extension}"
+            figure.savefig(chemin, format=extension)
+            _tache['fichiers'].append(str(chemin))
+        plt.close(figure)
+
+
+def rendre(dashboard, type_tranche, valeur, dossier, formats):
+    """Exécute un dashboard sur une tranche ; retourne les fichiers produits."""
+    global _tache
+    import matplotlib.pyplot as plt
+
+    if type_tranche == 'tout':
+        dataset = _fait
+    else:
+        dataset = _fait[_fait[COLONNES_TRANCHE[type_tranche]] == valeur]
+    dataset = dataset.drop(columns=[c for c in ('annee', 'segment') if c in dataset.columns])
+    dossier = Path(dossier) / dashboard
+    dossier.mkdir(parents=True, exist_ok=True)
+    nom_valeur = str(valeur).replace(' ', '_').replace('/', '-')
+    _tache = {'dossier': dossier, 'prefixe': f'{type_tranche}_{nom_valeur}',
+              'formats': formats, 'fichiers': []}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(str(DOSSIER_SCRIPTS / DASHBOARDS[dashboard]),
+                           init_globals={'dataset': dataset.reset_index(drop=True)})
+    finally:
+        plt.close('all')
+    return _tache['fichiers']
+
+
+# ============================================
+# 3. LIGNE DE COMMANDE
+# ============================================
+
+def lancer(fait, tranches, dashboards, dossier, formats, processus=None):
+    """Rend toutes les combinaisons dashboard × tranche ; retourne le bilan."""
+    debut = time.perf_counter()
+    nb_figures = 0
+    echecs = []
+    with ProcessPoolExecutor(max_workers=processus, initializer=_initialiser,
+                             initargs=(fait,)) as pool:
+        futures = {
+            pool.submit(rendre, dashboard, type_tranche, valeur, dossier, formats):
+                (dashboard, type_tranche, valeur)
+            for dashboard in dashboards for type_tranche, valeur in tranches
+        }
+        for future in as_completed(futures):
+            try:
+                nb_figures += len(future.result()) // len(formats)
+            except Exception as erreur:
+                echecs.append((*futures[future], repr(erreur)))
+    duree = time.perf_counter() - debut
+    return {
+        'taches': len(futures),
+        'figures': nb_figures,
+        'echecs': echecs,
+        'duree_s': duree,
+        'figures_par_s': nb_figures / duree if duree > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendu en lot des dashboards Northwind.")
+    parser.add_argument('fait', help="TF_COMMANDE au format CSV")
+    parser.add_argument('--dim-temps', help="Dim_Temps au format CSV (découpage par année)")
+    parser.add_argument('--sortie', default='rendus', help="Dossier de sortie")
+    parser.add_argument('--dashboards', nargs='+', choices=sorted(DASHBOARDS), default=sorted(DASHBOARDS))
+    parser.add_argument('--tranches', nargs='+', choices=TRANCHES, default=list(TRANCHES))
+    parser.add_argument('--format', nargs='+', choices=['png', 'svg'], default=['png'], dest='formats')
+    parser.add_argument('--processus', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    types = list(args.tranches)
+    if args.dim_temps is None and 'annee' in types:
+        print("⚠️  Pas de Dim_Temps : découpage par année ignoré")
+        types.remove('annee')
+    # Fait compacté une fois ici : c'est lui qui est copié dans chaque processus
+    fait, _ = normaliser_dataset(pd.read_csv(args.fait))
+    dim_temps = pd.read_csv(args.dim_temps) if args.dim_temps else None
+    tranches = preparer_tranches(fait, dim_temps, types)
+
+    print(f"📊 {len(fait)} lignes de fait, {len(tranches)} tranches, "
+          f"{len(args.dashboards)} dashboards, {args.processus} processus")
+    bilan = lancer(fait, tranches, args.dashboards, args.sortie, args.formats, args.processus)
+    print(f"✅ {bilan['figures']} figures en {bilan['duree_s']:.1f} s "
+          f"({bilan['figures_par_s']:.1f} figures/s)")
+    for dashboard, type_tranche, valeur, erreur in bilan['echecs']:
+        print(f"❌ {dashboard} / {type_tranche}={valeur} : {erreur}")
+    return 1 if bilan['echecs'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,304 @@
+"""Cache disque des résultats calculés par les visuels.
+
+Power BI relance chaque script à chaque clic sur un segment, même quand le
+``dataset`` filtré est identique au précédent. Les résultats (agrégats,
+catégories, KPI) sont donc rangés sur disque sous une empreinte du dataset
+(colonnes, types, contenu des buffers), de la fonction de calcul et des
+sources du paquet ``northwind_bi`` qu'elle appelle (seuils de catégories,
+tendance, classement...) : en cas de succès, le script passe directement
+au rendu. Le cache est borné en
+taille, les entrées les moins récemment utilisées étant supprimées.
+
+Les figures ont leur propre cache (:class:`CacheFigures`) : l'image PNG
+encodée est rangée sous l'empreinte des données agrégées qu'elle affiche
+(Top 10, catégories, KPI), des paramètres du graphique, du code du script
+qui la trace et du style matplotlib actif. Des filtres différents qui
+donnent le même Top 10 retrouvent donc la même image, sans reconstruire ni
+rastériser la figure ; un titre ou une couleur modifiés dans le script
+donnent une nouvelle image.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TAILLE_MAX = 256 * 1024 * 1024
+TAILLE_MAX_FIGURES = 64 * 1024 * 1024
+# '0' désactive le cache des figures (rendu vectoriel, mise au point d'un graphique)
+VARIABLE_FIGURES = 'NORTHWIND_BI_CACHE_FIGURES'
+# rcParams sans effet sur l'image rendue
+PARAMETRES_SANS_EFFET = ('backend', 'interactive', 'webagg', 'savefig.directory')
+
+# Empreinte des sources du paquet, calculée une fois par processus
+_signature_paquet = None
+
+
+def dossier_par_defaut():
+    """Dossier du cache : ``NORTHWIND_BI_CACHE`` ou le dossier temporaire."""
+    return Path(os.environ.get('NORTHWIND_BI_CACHE',
+                               Path(tempfile.gettempdir()) / 'northwind_bi_cache'))
+
+
+def empreinte_dataset(dataset):
+    """Empreinte rapide d'un DataFrame (hors index).
+
+    Les colonnes numériques sont hachées directement depuis leur buffer ;
+    les autres passent par ``hash_pandas_object``. Un stock sur disque
+    fournit sa propre empreinte, sans relire les données.
+    """
+    if hasattr(dataset, 'empreinte'):
+        return dataset.empreinte()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((list(dataset.columns), [str(t) for t in dataset.dtypes], dataset.shape)).encode())
+    for nom in dataset.columns:
+        colonne = dataset[nom]
+        if isinstance(colonne.dtype, np.dtype) and colonne.dtype.kind in 'biufcmM':
+            valeurs = np.ascontiguousarray(colonne.to_numpy())
+        else:
+            valeurs = pd.util.hash_pandas_object(colonne, index=False).to_numpy()
+        h.update(valeurs.view(np.uint8))
+    return h.hexdigest()
+
+
+def empreinte_valeurs(*valeurs):
+    """Empreinte de résultats agrégés : DataFrame, Series, tableaux, dict, listes, scalaires."""
+    h = hashlib.blake2b(digest_size=16)
+
+    def ajouter(valeur):
+        if isinstance(valeur, (pd.DataFrame, pd.Series)):
+            colonnes = list(valeur.columns) if isinstance(valeur, pd.DataFrame) else [valeur.name]
+            types_ = [str(t) for t in valeur.dtypes] if isinstance(valeur, pd.DataFrame) else [str(valeur.dtype)]
+            h.update(repr((type(valeur).__name__, colonnes, types_, list(valeur.index.names))).encode())
+            h.update(pd.util.hash_pandas_object(valeur, index=True).to_numpy().view(np.uint8))
+        elif isinstance(valeur, np.ndarray) and valeur.dtype != object:
+            h.update(repr((valeur.dtype.str, valeur.shape)).encode())
+            h.update(np.ascontiguousarray(valeur).view(np.uint8))
+        elif isinstance(valeur, dict):
+            h.update(b'{')
+            for cle in sorted(valeur, key=repr):
+                ajouter(cle)
+                ajouter(valeur[cle])
+            h.update(b'}')
+        elif isinstance(valeur, (list, tuple, np.ndarray)):
+            h.update(b'[')
+            for element in valeur:
+                ajouter(element)
+            h.update(b']')
+        else:
+            h.update(repr((type(valeur).__name__, valeur)).encode())
+
+    for valeur in valeurs:
+        ajouter(valeur)
+    return h.hexdigest()
+
+
+def _signature_code(code):
+    """Signature stable d'une fonction : une modification du calcul invalide le cache."""
+    parties = [code.co_code, repr(code.co_names).encode()]
+    for constante in code.co_consts:
+        if isinstance(constante, types.CodeType):
+            parties.append(_signature_code(constante))
+        else:
+            parties.append(repr(constante).encode())
+    return b''.join(parties)
+
+
+def signature_paquet():
+    """Empreinte des sources de ``northwind_bi`` : une mise à jour du paquet invalide le cache."""
+    global _signature_paquet
+    if _signature_paquet is None:
+        racine = Path(__file__).resolve().parent
+        h = hashlib.blake2b(digest_size=16)
+        for chemin in sorted(racine.rglob('*.py')):
+            h.update(chemin.relative_to(racine).as_posix().encode())
+            h.update(chemin.read_bytes())
+        _signature_paquet = h.hexdigest()
+    return _signature_paquet
+
+
+def _signature_script(cadre):
+    """Source du script du cadre ``cadre`` (à défaut, son code) : modifier le tracé change la clé."""
+    chemin = cadre.f_globals.get('__file__')
+    if chemin:
+        try:
+            return Path(chemin).read_bytes()
+        except OSError:
+            pass
+    return _signature_code(cadre.f_code)
+
+
+def _signature_style():
+    """rcParams actifs (style appliqué par :func:`~northwind_bi.runtime.pyplot` compris)."""
+    import matplotlib
+
+    return repr(sorted((cle, repr(valeur)) for cle, valeur in matplotlib.rcParams.items()
+                       if not cle.startswith(PARAMETRES_SANS_EFFET))).encode()
+
+
+class CacheResultats:
+    """Cache disque adressé par contenu, avec éviction LRU bornée en octets."""
+
+    extension = '.pkl'
+
+    def __init__(self, dossier=None, taille_max=TAILLE_MAX):
+        self.dossier = Path(dossier) if dossier is not None else dossier_par_defaut()
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.taille_max = taille_max
+
+    def _chemin(self, cle):
+        return self.dossier / f'{cle}{self.extension}'
+
+    def obtenir(self, cle):
+        """Valeur en cache, ou ``None``. Un succès rafraîchit la date d'accès."""
+        chemin = self._chemin(cle)
+        try:
+            with open(chemin, 'rb') as fichier:
+                valeur = pickle.load(fichier)
+        except OSError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Entrée tronquée, ou écrite par une autre version du paquet (classe
+            # ou module disparus) : compte comme un échec et n'est plus relue
+            chemin.unlink(missing_ok=True)
+            return None
+        os.utime(chemin)
+        return valeur
+
+    def stocker(self, cle, valeur):
+        chemin = self._chemin(cle)
+        provisoire = chemin.with_suffix(f'.{os.getpid()}.tmp')
+        with open(provisoire, 'wb') as fichier:
+            pickle.dump(valeur, fichier, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(provisoire, chemin)
+        self.evincer()
+
+    def evincer(self):
+        """Supprime les entrées les plus anciennes tant que le cache dépasse sa taille."""
+        entrees = []
+        for chemin in self.dossier.glob(f'*{self.extension}'):
+            try:
+                infos = chemin.stat()
+            except OSError:
+                continue
+            entrees.append((infos.st_mtime, infos.st_size, chemin))
+        total = sum(taille for _, taille, _ in entrees)
+        for _, taille, chemin in sorted(entrees):
+            if total <= self.taille_max:
+                break
+            chemin.unlink(missing_ok=True)
+            total -= taille
+
+    def calculer(self, dataset, nom, fonction):
+        """Résultat de ``fonction(dataset)``, repris du cache si possible."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(nom.encode())
+        h.update(_signature_code(fonction.__code__))
+        h.update(signature_paquet().encode())
+        h.update(empreinte_dataset(dataset).encode())
+        cle = h.hexdigest()
+
+        resultat = self.obtenir(cle)
+        if resultat is None:
+            resultat = fonction(dataset)
+            self.stocker(cle, resultat)
+        else:
+            print(f"⚡ Résultats '{nom}' repris du cache")
+        return resultat
+
+
+class CacheFigures(CacheResultats):
+    """Images PNG des figures, adressées par l'empreinte des données qu'elles affichent.
+
+    Usage dans un visuel ::
+
+        figures = CacheFigures()
+        cle = figures.cle('top10', top10, TOP_N)
+        image = figures.obtenir(cle)
+        if image is None:
+            fig, ax = plt.subplots(...)
+            ...
+            figures.enregistrer(cle, fig)
+        figures.afficher(plt, image)
+        plt.show()
+
+    Sur un échec, la figure construite reste ouverte pour ``plt.show()`` ;
+    seule une image reprise du cache est affichée par :meth:`afficher`.
+    """
+
+    extension = '.png'
+
+    def __init__(self, dossier=None, taille_max=TAILLE_MAX_FIGURES, actif=None):
+        if dossier is None:
+            dossier = dossier_par_defaut() / 'figures'
+        super().__init__(dossier, taille_max)
+        self.actif = os.environ.get(VARIABLE_FIGURES, '1') != '0' if actif is None else actif
+
+    def cle(self, nom, *valeurs):
+        """Clé de la figure ``nom`` tracée à partir de ``valeurs`` (agrégats et paramètres).
+
+        La clé couvre aussi le script appelant, les sources du paquet (aides
+        de :mod:`northwind_bi.rendu`) et les rcParams actifs : un titre, une
+        couleur ou une mise en page modifiés invalident l'image.
+        """
+        import matplotlib
+
+        h = hashlib.blake2b(digest_size=16)
+        h.update(nom.encode())
+        h.update(matplotlib.__version__.encode())
+        h.update(signature_paquet().encode())
+        h.update(_signature_script(sys._getframe(1)))
+        h.update(_signature_style())
+        h.update(empreinte_valeurs(*valeurs).encode())
+        return h.hexdigest()
+
+    def obtenir(self, cle):
+        """Image PNG en cache, ou ``None``. Un succès rafraîchit la date d'accès."""
+        if not self.actif:
+            return None
+        chemin = self._chemin(cle)
+        try:
+            image = chemin.read_bytes()
+        except OSError:
+            return None
+        os.utime(chemin)
+        print("⚡ Figure reprise du cache")
+        return image
+
+    def stocker(self, cle, image):
+        """Écriture atomique de l'image PNG, puis éviction si le cache est plein."""
+        chemin = self._chemin(cle)
+        provisoire = chemin.with_suffix(f'.{os.getpid()}.tmp')
+        provisoire.write_bytes(image)
+        os.replace(provisoire, chemin)
+        self.evincer()
+
+    def enregistrer(self, cle, fig):
+        """Encode la figure en PNG et la range sous ``cle`` (sans effet si le cache est désactivé).
+
+        La figure reste ouverte et ``plt.show()`` l'affiche elle-même : pas
+        de décodage de l'image ni de seconde figure.
+        """
+        if not self.actif:
+            return
+        tampon = io.BytesIO()
+        fig.savefig(tampon, format='png', dpi=fig.dpi)
+        self.stocker(cle, tampon.getvalue())
+
+    def afficher(self, plt, image):
+        """Figure aux dimensions de l'image reprise du cache, affichée telle quelle (sans effet si ``None``)."""
+        if image is None:
+            return None
+        pixels = plt.imread(io.BytesIO(image), format='png')
+        hauteur, largeur = pixels.shape[:2]
+        dpi = plt.rcParams['figure.dpi']
+        fig = plt.figure(figsize=(largeur / dpi, hauteur / dpi), dpi=dpi)
+        fig.figimage(pixels)
+        return fig
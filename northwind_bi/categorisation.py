@@ -0,0 +1,143 @@
+"""Moteur de catégorisation vectorisé des clients.
+
+Les seuils sont calculés une seule fois puis les catégories sont affectées
+par opérations sur tableaux (``np.select``) : le coût est linéaire et permet
+de catégoriser toute la base clients, pas seulement le Top 10. Au-delà de
+la mémoire disponible, les seuils adaptatifs se calculent par lots sur des
+esquisses de quantiles fusionnables (:mod:`northwind_bi.quantiles`).
+"""
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.quantiles import K_DEFAUT, EsquisseQuantiles
+
+# Règles fixes (Premium / Fidèle / Actif / Standard)
+CATEGORIES = ['Premium', 'Fidèle', 'Actif', 'Standard']
+
+# Règles adaptatives, de la meilleure à la moins bonne
+CATEGORIES_ADAPTATIVES = [
+    'EXCELLENCE',
+    'HAUTE PERFORMANCE',
+    'GROS VOLUME',
+    'BON ÉQUILIBRE',
+    'PERFORMANCE MOYENNE',
+    'VOLUME MOYEN',
+    'STANDARD',
+]
+
+
+def _colonnes(clients, col_taux, col_volume):
+    taux = clients[col_taux].to_numpy(dtype='float64', na_value=np.nan)
+    volume = clients[col_volume].to_numpy(dtype='float64', na_value=np.nan)
+    return taux, volume
+
+
+def _categoriel(codes, categories, index):
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories, ordered=True),
+        index=index,
+    )
+
+
+def categoriser_clients(clients, col_taux='taux_livraison', col_volume='total_commandes'):
+    """Catégorisation à seuils fixes (taux 90 / 80 %, volume 50 / 30)."""
+    taux, volume = _colonnes(clients, col_taux, col_volume)
+    conditions = [
+        (taux >= 90) & (volume >= 50),
+        taux >= 80,
+        volume >= 30,
+    ]
+    codes = np.select(conditions, [0, 1, 2], default=3).astype('int8')
+    return _categoriel(codes, CATEGORIES, clients.index)
+
+
+def seuils_adaptatifs(clients, col_taux='taux_livraison', col_volume='total_commandes'):
+    """Médiane et 75ème percentile du taux et du volume, calculés une fois."""
+    quantiles_taux = clients[col_taux].quantile([0.50, 0.75])
+    quantiles_volume = clients[col_volume].quantile([0.50, 0.75])
+    return {
+        'taux_50': quantiles_taux[0.50],
+        'taux_75': quantiles_taux[0.75],
+        'volume_50': quantiles_volume[0.50],
+        'volume_75': quantiles_volume[0.75],
+    }
+
+
+def esquisses_clients(clients, col_taux='taux_livraison', col_volume='total_commandes', k=K_DEFAUT):
+    """Esquisses de quantiles du taux et du volume d'un lot de clients.
+
+    Les esquisses de plusieurs lots se combinent avec
+    :func:`fusionner_esquisses` ; :func:`seuils_esquisses` en tire les seuils.
+    """
+    taux, volume = _colonnes(clients, col_taux, col_volume)
+    return {
+        'taux': EsquisseQuantiles(k).ajouter(taux),
+        'volume': EsquisseQuantiles(k).ajouter(volume),
+    }
+
+
+def fusionner_esquisses(esquisses, autres):
+    """Fusionne ``autres`` dans ``esquisses`` (sur place) et les retourne."""
+    for nom, esquisse in autres.items():
+        esquisses[nom].fusionner(esquisse)
+    return esquisses
+
+
+def seuils_esquisses(esquisses):
+    """Seuils adaptatifs (mêmes clés que :func:`seuils_adaptatifs`) lus dans les esquisses.
+
+    Identiques aux seuils exacts tant que les esquisses n'ont rien compacté.
+    """
+    taux_50, taux_75 = esquisses['taux'].quantiles([0.50, 0.75])
+    volume_50, volume_75 = esquisses['volume'].quantiles([0.50, 0.75])
+    return {'taux_50': taux_50, 'taux_75': taux_75, 'volume_50': volume_50, 'volume_75': volume_75}
+
+
+def categoriser_clients_flux(lots_clients, col_taux='taux_livraison', col_volume='total_commandes',
+                             k=K_DEFAUT):
+    """Catégorisation adaptative de toute la base clients, lot par lot.
+
+    ``lots_clients`` est une fonction sans argument qui retourne un nouvel
+    itérable de lots (par exemple une relecture par morceaux). Chaque client
+    doit figurer dans un seul lot. Un premier passage construit et fusionne
+    les esquisses ; un second catégorise chaque lot avec les seuils obtenus.
+    Seul un lot est en mémoire à la fois. Génère ``(lot, categories)``.
+    """
+    esquisses = None
+    for lot in lots_clients():
+        esquisses_lot = esquisses_clients(lot, col_taux, col_volume, k)
+        esquisses = esquisses_lot if esquisses is None else fusionner_esquisses(esquisses, esquisses_lot)
+    if esquisses is None:
+        return
+    seuils = seuils_esquisses(esquisses)
+    for lot in lots_clients():
+        yield lot, categoriser_clients_adaptative(lot, seuils, col_taux, col_volume)
+
+
+def categoriser_clients_adaptative(clients, seuils=None,
+                                   col_taux='taux_livraison', col_volume='total_commandes'):
+    """Catégorisation basée sur les percentiles des données.
+
+    ``seuils`` (voir :func:`seuils_adaptatifs` et :func:`seuils_esquisses`)
+    peut être calculé sur une autre population que ``clients`` ; par défaut
+    il l'est sur ``clients``.
+    """
+    if seuils is None:
+        seuils = seuils_adaptatifs(clients, col_taux, col_volume)
+    taux, volume = _colonnes(clients, col_taux, col_volume)
+
+    taux_haut = taux >= seuils['taux_75']
+    volume_haut = volume >= seuils['volume_75']
+    taux_moyen = taux >= seuils['taux_50']
+    volume_moyen = volume >= seuils['volume_50']
+    conditions = [
+        taux_haut & volume_haut,
+        taux_haut,
+        volume_haut,
+        taux_moyen & volume_moyen,
+        taux_moyen,
+        volume_moyen,
+    ]
+    codes = np.select(conditions, range(6), default=6).astype('int8')
+    return _categoriel(codes, CATEGORIES_ADAPTATIVES, clients.index)
@@ -0,0 +1,108 @@
+"""Classements top K par groupe (par employé, par période, par catégorie).
+
+Un ``groupby(...).nlargest(k)`` traite les groupes un par un et devient
+très lent avec des milliers de groupes. Ici, toutes les lignes sont triées
+une seule fois par (groupe, valeur décroissante) ; les bornes des segments
+du tableau trié donnent le rang de chaque ligne dans son groupe, et les k
+premières de chaque segment sont gardées en une passe vectorisée.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Mode de classement -> dimension de regroupement (None : classement global)
+MODES_CLASSEMENT = {
+    'global': None,
+    'employe': 'id_seqEmployee',
+    'periode': 'id_temps',
+    'categorie': 'categorie',
+}
+
+
+def top_k_par_groupe(donnees, groupe, colonne, k):
+    """Les ``k`` plus grandes valeurs de ``colonne`` dans chaque groupe.
+
+    ``groupe`` est une colonne ou un niveau d'index de ``donnees`` (``None``
+    pour un seul groupe). Même résultat que ``nlargest(k, colonne)`` appliqué
+    à chaque groupe (ex æquo dans l'ordre d'origine, valeurs manquantes
+    écartées), groupes triés, avec une colonne ``rang`` (1 = meilleur).
+    """
+    if groupe is None:
+        codes = np.zeros(len(donnees), dtype=np.intp)
+    else:
+        cles = donnees[groupe] if groupe in donnees.columns else donnees.index.get_level_values(groupe)
+        codes, _ = pd.factorize(cles, sort=True)
+    valeurs = donnees[colonne].to_numpy(dtype=float, na_value=np.nan)
+
+    positions = np.flatnonzero((codes >= 0) & ~np.isnan(valeurs))
+    # lexsort est stable : les ex æquo gardent l'ordre d'origine
+    ordre = positions[np.lexsort((-valeurs[positions], codes[positions]))]
+    codes_tries = codes[ordre]
+    debuts = np.flatnonzero(np.r_[True, codes_tries[1:] != codes_tries[:-1]])
+    longueurs = np.diff(np.r_[debuts, len(ordre)])
+    rangs = np.arange(len(ordre)) - np.repeat(debuts, longueurs)
+
+    gardes = rangs < k
+    resultat = donnees.iloc[ordre[gardes]].copy()
+    resultat['rang'] = rangs[gardes] + 1
+    return resultat
+
+
+def clients_par_mode(cube, mode='global'):
+    """Agrégat client au grain du mode de classement, et sa dimension de groupe.
+
+    En mode ``'categorie'``, les clients reçoivent leur catégorie adaptative
+    (seuils calculés sur tous les clients) en premier niveau d'index.
+    """
+    if mode not in MODES_CLASSEMENT:
+        raise ValueError(f"Mode de classement inconnu : {mode!r} "
+                         f"(attendu : {', '.join(MODES_CLASSEMENT)})")
+    groupe = MODES_CLASSEMENT[mode]
+    if groupe is None:
+        return cube.agreger('id_seqClient'), None
+    if mode == 'categorie':
+        from northwind_bi.categorisation import categoriser_clients_adaptative
+
+        clients = cube.agreger('id_seqClient')
+        total = clients['nbr_commande_livrees'] + clients['nbr_commande_non_livrees']
+        categorie = categoriser_clients_adaptative(pd.DataFrame({
+            'total_commandes': total,
+            'taux_livraison': clients['nbr_commande_livrees'] / total * 100,
+        }))
+        clients = clients.set_index(categorie.rename(groupe), append=True).swaplevel()
+        return clients, groupe
+    return cube.agreger([groupe, 'id_seqClient']), groupe
+
+
+def mode_disponible(mode, colonnes):
+    """Le mode peut-il s'appliquer à un dataset ayant ces colonnes ?"""
+    groupe = MODES_CLASSEMENT.get(mode)
+    return mode in MODES_CLASSEMENT and (groupe is None or mode == 'categorie' or groupe in colonnes)
+
+
+def top_clients(donnees, mode='global', k=10):
+    """Top ``k`` clients (par commandes) au grain du mode, et nombre de clients.
+
+    Le classement porte les colonnes ``total``, ``taux`` et ``rang``. Sur une
+    source SQL (:class:`~northwind_bi.sql.SourceSQL`), la base ne retourne
+    que les ``k`` lignes de chaque groupe ; le mode ``'categorie'``, dont
+    les seuils portent sur tous les clients, reste calculé en Python.
+    """
+    from northwind_bi.normalisation import ajouter_indicateurs
+    from northwind_bi.parallele import cube_commandes
+    from northwind_bi.sql import Requete, SourceSQL, compter_modalites, executer
+
+    if mode not in MODES_CLASSEMENT:
+        raise ValueError(f"Mode de classement inconnu : {mode!r} "
+                         f"(attendu : {', '.join(MODES_CLASSEMENT)})")
+    groupe = MODES_CLASSEMENT[mode]
+    if isinstance(donnees, SourceSQL) and mode != 'categorie':
+        dimensions = ('id_seqClient',) if groupe is None else (groupe, 'id_seqClient')
+        top = executer(Requete(dimensions, taux=True, top=k, par=groupe), donnees)
+        return top, compter_modalites(donnees, 'id_seqClient')
+
+    dimensions = ('id_seqClient',) if groupe in (None, 'categorie') else (groupe, 'id_seqClient')
+    clients, groupe = clients_par_mode(cube_commandes(donnees, dimensions), mode)
+    ajouter_indicateurs(clients, total='total', taux='taux')
+    return (top_k_par_groupe(clients, groupe, 'total', k),
+            clients.index.get_level_values('id_seqClient').nunique())
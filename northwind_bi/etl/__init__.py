@@ -0,0 +1,2 @@
+"""Étapes ETL Python du modèle en étoile (équivalents des scripts Power Query
+de ``ScriptRemplissage``)."""
@@ -0,0 +1,131 @@
+"""Résolution des clés de substitution des dimensions.
+
+Remplace les ``Table.NestedJoin`` + ``ExpandTableColumn`` sur clés texte
+composites du script M. Pour chaque dimension, les clés naturelles sont
+codées une fois en entiers (codes factorisés par colonne, combinés en une
+clé ``int64``) et triées : un lot entier de faits est ensuite résolu par
+``get_indexer`` + ``searchsorted``, sans jointure. Les clés introuvables
+sont comptées au lieu de laisser silencieusement des valeurs nulles.
+"""
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.etl.temps import IndexPeriodes
+
+
+class IndexCles:
+    """Index trié ``clé naturelle -> clé de substitution`` d'une dimension.
+
+    Si une clé naturelle apparaît plusieurs fois (ancienne Dim_Employee, à
+    une ligne par territoire), la plus petite clé de substitution est
+    retenue, comme le ``List.Min`` de l'ancien script M.
+    """
+
+    def __init__(self, dimension, colonnes, cle_substitution):
+        self.colonnes = list(colonnes)
+        self.cle_substitution = cle_substitution
+        self.nb_lignes = 0
+        self.nb_non_trouves = 0
+
+        cles = dimension[self.colonnes].astype('string')
+        substitution = dimension[cle_substitution].to_numpy(dtype='int64')
+
+        self.niveaux = []
+        codes = []
+        for colonne in self.colonnes:
+            code, uniques = pd.factorize(cles[colonne])
+            self.niveaux.append(pd.Index(uniques))
+            codes.append(code)
+        composite = self._combiner(codes)
+
+        valide = composite >= 0
+        ordre = np.lexsort((substitution[valide], composite[valide]))
+        composite = composite[valide][ordre]
+        substitution = substitution[valide][ordre]
+        premier = np.ones(len(composite), dtype=bool)
+        premier[1:] = composite[1:] != composite[:-1]
+        self.composites = composite[premier]
+        self.valeurs = substitution[premier]
+
+    def __len__(self):
+        return len(self.composites)
+
+    def _combiner(self, codes):
+        """Combine les codes par colonne en un entier ; -1 si un code manque."""
+        composite = np.zeros(len(codes[0]), dtype='int64')
+        manquant = np.zeros(len(codes[0]), dtype=bool)
+        for code, niveau in zip(codes, self.niveaux):
+            composite = composite * (len(niveau) + 1) + code
+            manquant |= code < 0
+        composite[manquant] = -1
+        return composite
+
+    def codes(self, lot):
+        """Positions des clés du lot dans l'index (-1 si introuvable)."""
+        codes = [niveau.get_indexer(lot[colonne].astype('string'))
+                 for colonne, niveau in zip(self.colonnes, self.niveaux)]
+        composite = self._combiner(codes)
+        if not len(self):
+            return np.full(len(composite), -1)
+        position = np.searchsorted(self.composites, composite).clip(max=len(self) - 1)
+        trouve = (composite >= 0) & (self.composites[position] == composite)
+        return np.where(trouve, position, -1)
+
+    def resoudre(self, lot):
+        """Clés de substitution du lot (``Int64``, ``<NA>`` si introuvable)."""
+        position = self.codes(lot)
+        manquant = position < 0
+        self.nb_lignes += len(position)
+        self.nb_non_trouves += int(manquant.sum())
+        if len(self):
+            valeurs = self.valeurs[position]
+        else:
+            valeurs = np.zeros(len(position), dtype='int64')
+        return pd.arrays.IntegerArray(valeurs, manquant)
+
+
+class ResolveurCles:
+    """Résolution des trois clés du fait TF_COMMANDE.
+
+    Client et employé sont résolus comme des jointures externes gauches
+    (clé nulle si introuvable) ; le temps comme une jointure interne (la
+    ligne est écartée). Une Dim_Temps à colonne ``periode``
+    (:func:`~northwind_bi.etl.temps.construire_dim_temps`) est résolue par
+    arithmétique sur ``OrderDate`` ; sinon par ``mois_annee``, comme dans le
+    script M. Les compteurs de :meth:`rapport` cumulent les lots.
+    """
+
+    def __init__(self, dim_client, dim_employee, dim_temps):
+        self.client = IndexCles(dim_client, ['id_client_prod', 'source_prod'], 'id_seqClient')
+        self.employe = IndexCles(dim_employee, ['id_employee_prod', 'source_prod'], 'id_seqEmployee')
+        if 'periode' in dim_temps.columns:
+            self.temps = IndexPeriodes(dim_temps)
+        else:
+            self.temps = IndexCles(dim_temps, ['mois_annee'], 'id_temps')
+
+    def resoudre(self, lot):
+        """Ajoute ``id_seqClient``, ``id_seqEmployee`` et ``id_temps`` au lot."""
+        cles = {
+            'id_seqClient': self.client.resoudre(
+                lot[['CustomerID', 'source_prod']].set_axis(self.client.colonnes, axis=1)),
+            'id_seqEmployee': self.employe.resoudre(
+                lot[['EmployeeID', 'source_prod']].set_axis(self.employe.colonnes, axis=1)),
+            'id_temps': self._resoudre_temps(lot),
+        }
+        lot = lot.assign(**cles)
+        lot = lot[lot['id_temps'].notna()]
+        return lot.astype({'id_temps': 'int64'})
+
+    def _resoudre_temps(self, lot):
+        if isinstance(self.temps, IndexPeriodes):
+            return self.temps.resoudre(lot['OrderDate'])
+        return self.temps.resoudre(lot['OrderDate'].dt.strftime('%m/%Y').to_frame('mois_annee'))
+
+    def rapport(self):
+        """Nombre de lignes traitées et de clés introuvables par dimension."""
+        return {
+            nom: {'lignes': index.nb_lignes, 'non_trouves': index.nb_non_trouves}
+            for nom, index in (('client', self.client), ('employe', self.employe),
+                               ('temps', self.temps))
+        }
@@ -0,0 +1,101 @@
+"""Dimensions client et employé du modèle en étoile.
+
+Équivalents Python de ``ScriptRemplissage/CreationDimClient.txt``,
+``CreationDimEmployee.txt`` et ``CreationPontEmployeeTerritoire.txt`` :
+union des sources SSMS et EXCEL aux noms de colonnes communs, clé
+naturelle en texte, puis clé de substitution séquentielle à partir de 1.
+Dim_Employee a une ligne par employé ; ses territoires sont dans le pont
+Employee_Territory.
+
+Avec ``existante`` (la dimension déjà chargée, ou les clés retenues par
+:class:`~northwind_bi.etl.incremental.RafraichissementIncremental`), la
+numérotation ne fait qu'ajouter : chaque membre garde sa clé, les nouveaux
+sont numérotés à la suite de la plus grande. Un nouveau client SSMS ne
+décale plus les clés des clients EXCEL, et les lignes du fait déjà
+chargées pointent toujours sur le bon membre.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLONNES_DIM_CLIENT = ['id_seqClient', 'id_client_prod', 'source_prod', 'CompanyName', 'City']
+COLONNES_DIM_EMPLOYEE = ['id_seqEmployee', 'id_employee_prod', 'source_prod', 'Nom', 'Prenom', 'Region']
+COLONNES_PONT_TERRITOIRES = ['id_seqEmployee', 'Territory', 'TerritoryDesc']
+# Clé de substitution et clé naturelle de chaque dimension
+CLES_DIMENSIONS = {
+    'DimClient': ('id_seqClient', ['id_client_prod', 'source_prod']),
+    'Dim_Employee': ('id_seqEmployee', ['id_employee_prod', 'source_prod']),
+}
+
+
+def _numeroter(dimension, nom, colonnes, existante=None):
+    """Clés de substitution de ``dimension`` : 1, 2, ... ou, avec ``existante``, celles déjà attribuées."""
+    cle, naturelle = CLES_DIMENSIONS[nom]
+    dimension = dimension.reset_index(drop=True)
+    if existante is None or existante.empty:
+        valeurs = np.arange(1, len(dimension) + 1, dtype='int64')
+    else:
+        connues = pd.MultiIndex.from_frame(existante[naturelle].astype('string'))
+        position = connues.get_indexer(pd.MultiIndex.from_frame(dimension[naturelle].astype('string')))
+        nouveau = position < 0
+        valeurs = existante[cle].to_numpy(dtype='int64')[np.where(nouveau, 0, position)]
+        valeurs[nouveau] = existante[cle].max() + np.arange(1, int(nouveau.sum()) + 1)
+    dimension.insert(0, cle, valeurs)
+    return dimension[colonnes]
+
+
+def construire_dim_client(customers, customers_excel, existante=None):
+    """DimClient : ``Customers`` (SSMS) puis ``Customers_Excel``.
+
+    ``existante`` : clés déjà attribuées (``id_seqClient``, ``id_client_prod``,
+    ``source_prod``), conservées ; les nouveaux clients sont numérotés à la suite.
+    """
+    ssms = customers[['CustomerID', 'CompanyName', 'City']].rename(
+        columns={'CustomerID': 'id_client_prod'}).assign(source_prod='SSMS')
+    excel = customers_excel[['ID', 'Company', 'City']].rename(
+        columns={'ID': 'id_client_prod', 'Company': 'CompanyName'}).assign(source_prod='EXCEL')
+    dimension = pd.concat([ssms, excel], ignore_index=True)
+    dimension['id_client_prod'] = dimension['id_client_prod'].astype('string')
+    return _numeroter(dimension, 'DimClient', COLONNES_DIM_CLIENT, existante)
+
+
+def construire_dim_employee(employees, employees_excel, existante=None):
+    """Dim_Employee : une ligne par employé (``id_employee_prod``, ``source_prod``).
+
+    Les territoires ne sont plus joints à la dimension (une ligne par
+    territoire, puis ``List.Min`` dans le fait pour dédoublonner) : ils sont
+    dans le pont :func:`construire_pont_territoires`. ``existante`` : comme
+    pour :func:`construire_dim_client`.
+    """
+    ssms = employees[['EmployeeID', 'LastName', 'FirstName', 'Region']].rename(columns={
+        'EmployeeID': 'id_employee_prod', 'LastName': 'Nom', 'FirstName': 'Prenom',
+    }).assign(source_prod='SSMS')
+    excel = employees_excel[['ID', 'Last Name', 'First Name']].rename(columns={
+        'ID': 'id_employee_prod', 'Last Name': 'Nom', 'First Name': 'Prenom',
+    }).assign(source_prod='EXCEL', Region=pd.NA)
+    dimension = pd.concat([ssms, excel], ignore_index=True)
+    dimension['id_employee_prod'] = dimension['id_employee_prod'].astype('string')
+    return _numeroter(dimension, 'Dim_Employee', COLONNES_DIM_EMPLOYEE, existante)
+
+
+def construire_pont_territoires(dim_employee, employee_territories, territories, employees_excel):
+    """Pont Employee_Territory : une ligne par employé et territoire.
+
+    Côté SSMS, ``EmployeeTerritories`` complété par ``Territories`` ; côté
+    EXCEL, la ville et l'état de l'employé tiennent lieu de territoire.
+    Les employés sont repérés par leur ``id_seqEmployee`` dans ``dim_employee``.
+    """
+    ssms = employee_territories[['EmployeeID', 'TerritoryID']].merge(
+        territories[['TerritoryID', 'TerritoryDescription']], on='TerritoryID', how='left')
+    ssms = ssms.rename(columns={
+        'EmployeeID': 'id_employee_prod', 'TerritoryID': 'Territory', 'TerritoryDescription': 'TerritoryDesc',
+    }).assign(source_prod='SSMS')
+    excel = employees_excel[['ID', 'City', 'State/Province']].rename(columns={
+        'ID': 'id_employee_prod', 'City': 'Territory', 'State/Province': 'TerritoryDesc',
+    }).assign(source_prod='EXCEL')
+    excel = excel[excel['Territory'].notna() | excel['TerritoryDesc'].notna()]
+    pont = pd.concat([ssms, excel], ignore_index=True)
+    pont['id_employee_prod'] = pont['id_employee_prod'].astype('string')
+    pont = pont.merge(dim_employee[['id_seqEmployee', 'id_employee_prod', 'source_prod']],
+                      on=['id_employee_prod', 'source_prod'], how='inner')
+    return pont.sort_values('id_seqEmployee', kind='stable')[COLONNES_PONT_TERRITOIRES].reset_index(drop=True)
@@ -0,0 +1,249 @@
+"""Cache binaire des feuilles des classeurs Excel sources.
+
+Les requêtes ``Orders_Excel``, ``Customers_Excel``, ``Employees_Excel`` et
+``Temps_Excel`` relisent les classeurs XLSX à chaque actualisation, et
+l'analyse du XML coûte plus que toute la transformation. Chaque feuille
+est donc convertie une fois en fichier colonnaire typé (Parquet, Feather
+ou, sans ``pyarrow``, pickle pandas), réduit aux colonnes que les scripts
+M sélectionnent (:data:`FEUILLES_EXCEL`).
+
+Un fichier ``.json`` accompagne chaque conversion : taille, date de
+modification et empreinte du classeur source. Tant que taille et date sont
+inchangées, le fichier converti est relu tel quel ; si seule la date a
+changé (classeur recopié, réenregistré à l'identique), l'empreinte du
+contenu décide. Les feuilles à convertir le sont en parallèle, une par
+processus.
+
+Exemple ::
+
+    python -m northwind_bi.etl.excel Northwind.xlsx --cache cache_excel --processus 4
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+# Colonnes retenues par les scripts M de ScriptRemplissage, et leur type
+FEUILLES_EXCEL = {
+    'Orders_Excel': {
+        'Order ID': 'texte', 'Customer ID': 'texte', 'Employee ID': 'texte',
+        'Order Date': 'date', 'Shipped Date': 'date',
+    },
+    'Customers_Excel': {'ID': 'texte', 'Company': 'texte', 'City': 'texte'},
+    'Employees_Excel': {
+        'ID': 'texte', 'Last Name': 'texte', 'First Name': 'texte',
+        'City': 'texte', 'State/Province': 'texte',
+    },
+    'Temps_Excel': {'Order Date': 'date'},
+}
+FORMATS = ('parquet', 'feather', 'pickle')
+TAILLE_BLOC_EMPREINTE = 1 << 20
+
+
+def format_par_defaut():
+    """Parquet si ``pyarrow`` est installé, sinon pickle pandas."""
+    return 'parquet' if importlib.util.find_spec('pyarrow') else 'pickle'
+
+
+def empreinte_fichier(chemin):
+    h = hashlib.blake2b(digest_size=16)
+    with open(chemin, 'rb') as fichier:
+        while bloc := fichier.read(TAILLE_BLOC_EMPREINTE):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+# ============================================
+# 1. CONVERSION D'UNE FEUILLE
+# ============================================
+
+def _texte(valeurs):
+    """Texte comme ``Text.From`` : les nombres entiers lus en flottant perdent leur ``.0``."""
+    serie = pd.Series(valeurs, dtype=object)
+    return serie.map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v,
+                     na_action='ignore').astype('string')
+
+
+def lire_feuille_excel(classeur, feuille, colonnes):
+    """Colonnes ``{nom: type}`` de la feuille, lue en mode flux et typée."""
+    from openpyxl import load_workbook
+
+    document = load_workbook(classeur, read_only=True, data_only=True)
+    try:
+        if feuille not in document.sheetnames:
+            raise KeyError(f"Feuille absente de {classeur} : {feuille}")
+        lignes = document[feuille].iter_rows(values_only=True)
+        entete = list(next(lignes, ()))
+        absentes = [nom for nom in colonnes if nom not in entete]
+        if absentes:
+            raise ValueError(f"Colonnes absentes de la feuille {feuille} : {absentes}")
+        positions = [entete.index(nom) for nom in colonnes]
+        valeurs = [[] for _ in positions]
+        for ligne in lignes:
+            for liste, i in zip(valeurs, positions):
+                liste.append(ligne[i] if i < len(ligne) else None)
+    finally:
+        document.close()
+
+    donnees = {}
+    for (nom, genre), liste in zip(colonnes.items(), valeurs):
+        if genre == 'date':
+            donnees[nom] = pd.to_datetime(pd.Series(liste, dtype=object), errors='coerce')
+        else:
+            donnees[nom] = _texte(liste)
+    return pd.DataFrame(donnees)
+
+
+def _ecrire(table, chemin, format):
+    provisoire = chemin.with_name(f'{chemin.name}.{os.getpid()}.tmp')
+    if format == 'parquet':
+        table.to_parquet(provisoire, index=False)
+    elif format == 'feather':
+        table.to_feather(provisoire)
+    else:
+        table.to_pickle(provisoire)
+    os.replace(provisoire, chemin)
+
+
+def _lire(chemin, format, colonnes=None):
+    if format == 'parquet':
+        return pd.read_parquet(chemin, columns=colonnes)
+    if format == 'feather':
+        return pd.read_feather(chemin, columns=colonnes)
+    table = pd.read_pickle(chemin)
+    return table if colonnes is None else table[colonnes]
+
+
+def _convertir(classeur, feuille, colonnes, chemin, chemin_etat, format, source):
+    """Exécutée dans un processus du pool : conversion et écriture d'une feuille."""
+    table = lire_feuille_excel(classeur, feuille, colonnes)
+    _ecrire(table, Path(chemin), format)
+    etat = dict(source, feuille=feuille, colonnes=list(colonnes), format=format, lignes=len(table))
+    provisoire = Path(f'{chemin_etat}.{os.getpid()}.tmp')
+    provisoire.write_text(json.dumps(etat, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(provisoire, chemin_etat)
+    return len(table)
+
+
+# ============================================
+# 2. CACHE
+# ============================================
+
+class CacheExcel:
+    """Feuilles des classeurs Excel converties, relues tant que la source est inchangée."""
+
+    def __init__(self, dossier, format=None, feuilles=FEUILLES_EXCEL):
+        self.dossier = Path(dossier)
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.format = format or format_par_defaut()
+        if self.format not in FORMATS:
+            raise ValueError(f"Format inconnu : {self.format!r} (attendu : {', '.join(FORMATS)})")
+        self.feuilles = feuilles
+        self.nb_conversions = 0
+        self.nb_reprises = 0
+
+    def _chemins(self, classeur, feuille):
+        classeur = Path(classeur).resolve()
+        suffixe = hashlib.blake2b(str(classeur).encode(), digest_size=4).hexdigest()
+        nom = f"{classeur.stem}-{suffixe}.{re.sub(r'[^0-9A-Za-z_-]+', '_', feuille)}"
+        return self.dossier / f'{nom}.{self.format}', self.dossier / f'{nom}.json'
+
+    def _colonnes(self, feuille):
+        try:
+            return self.feuilles[feuille]
+        except KeyError:
+            raise KeyError(f"Feuille sans colonnes déclarées : {feuille} "
+                           f"(connues : {', '.join(self.feuilles)})") from None
+
+    def _a_jour(self, classeur, feuille):
+        """``(à jour, état de la source)`` ; l'empreinte n'est calculée que si la date a changé."""
+        chemin, chemin_etat = self._chemins(classeur, feuille)
+        infos = Path(classeur).stat()
+        source = {'classeur': str(Path(classeur).resolve()), 'taille': infos.st_size,
+                  'mtime_ns': infos.st_mtime_ns}
+        try:
+            etat = json.loads(chemin_etat.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            etat = None
+        if etat is None or not chemin.exists() or etat.get('format') != self.format \
+                or etat.get('colonnes') != list(self._colonnes(feuille)) \
+                or etat.get('taille') != infos.st_size:
+            return False, dict(source, empreinte=empreinte_fichier(classeur))
+        if etat.get('mtime_ns') == infos.st_mtime_ns:
+            return True, etat
+        source['empreinte'] = empreinte_fichier(classeur)
+        if etat.get('empreinte') != source['empreinte']:
+            return False, source
+        # Même contenu, nouvelle date : l'état est rafraîchi pour éviter de rehacher
+        etat['mtime_ns'] = infos.st_mtime_ns
+        chemin_etat.write_text(json.dumps(etat, indent=2, ensure_ascii=False), encoding='utf-8')
+        return True, etat
+
+    def convertir(self, sources, processus=None):
+        """Convertit les feuilles périmées de ``sources`` (``[(classeur, feuille), ...]``).
+
+        Retourne ``{(classeur, feuille): 'repris' | nombre de lignes converties}``.
+        """
+        resultats, taches = {}, []
+        for classeur, feuille in sources:
+            a_jour, source = self._a_jour(classeur, feuille)
+            if a_jour:
+                resultats[(classeur, feuille)] = 'repris'
+                self.nb_reprises += 1
+            else:
+                chemin, chemin_etat = self._chemins(classeur, feuille)
+                taches.append(((classeur, feuille), (str(classeur), feuille, self._colonnes(feuille),
+                                                     str(chemin), str(chemin_etat), self.format, source)))
+        processus = min(processus or os.cpu_count() or 1, len(taches))
+        if processus < 2:
+            for cle, arguments in taches:
+                resultats[cle] = _convertir(*arguments)
+        else:
+            with ProcessPoolExecutor(max_workers=processus) as pool:
+                futurs = {cle: pool.submit(_convertir, *arguments) for cle, arguments in taches}
+                for cle, futur in futurs.items():
+                    resultats[cle] = futur.result()
+        self.nb_conversions += len(taches)
+        return resultats
+
+    def lire(self, classeur, feuille, colonnes=None):
+        """Feuille typée depuis le cache, convertie d'abord si la source a changé."""
+        self.convertir([(classeur, feuille)], processus=1)
+        chemin, _ = self._chemins(classeur, feuille)
+        return _lire(chemin, self.format, colonnes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversion des feuilles Excel sources en fichiers binaires.")
+    parser.add_argument('classeurs', nargs='+', help="Classeurs XLSX")
+    parser.add_argument('--cache', default='cache_excel', help="Dossier des fichiers convertis")
+    parser.add_argument('--feuilles', nargs='+', choices=sorted(FEUILLES_EXCEL), default=list(FEUILLES_EXCEL))
+    parser.add_argument('--format', choices=FORMATS, default=None)
+    parser.add_argument('--processus', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    from openpyxl import load_workbook
+
+    sources = []
+    for classeur in args.classeurs:
+        document = load_workbook(classeur, read_only=True)
+        presentes = document.sheetnames
+        document.close()
+        sources += [(classeur, feuille) for feuille in args.feuilles if feuille in presentes]
+    cache = CacheExcel(args.cache, args.format)
+    for (classeur, feuille), resultat in cache.convertir(sources, args.processus).items():
+        if resultat == 'repris':
+            print(f"⚡ {classeur} / {feuille} : inchangé, fichier {cache.format} repris")
+        else:
+            print(f"✅ {classeur} / {feuille} : {resultat} lignes converties en {cache.format}")
+
+
+if __name__ == '__main__':
+    main()
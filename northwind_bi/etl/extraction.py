@@ -0,0 +1,323 @@
+"""Extraction concurrente des sources et construction des tables du modèle.
+
+L'actualisation lisait les tables SSMS (``Orders``, ``Customers``,
+``Employees``, ``EmployeeTerritories``, ``Territories``) puis les feuilles
+Excel (``Orders_Excel``, ``Customers_Excel``, ``Employees_Excel``,
+``Temps_Excel``) l'une après l'autre : la durée d'extraction était la somme
+de celles des sources. Ici, chaque lecture et chaque construction est une
+étape d'un graphe de dépendances (:func:`planifier_etl`) :
+
+- DimClient          <- Customers, Customers_Excel
+- Dim_Employee       <- Employees, Employees_Excel
+- Employee_Territory <- Dim_Employee, EmployeeTerritories, Territories, Employees_Excel
+- Dim_Temps          <- Orders_Bornes, Temps_Excel
+- TF_COMMANDE        <- Orders (lu en flux), Orders_Excel, DimClient, Dim_Employee, Dim_Temps
+
+Le :class:`Planificateur` lance chaque étape dès que ses entrées sont
+disponibles, sur un pool de threads : les sources indépendantes sont lues
+en même temps et une dimension est construite dès que ses sources sont
+arrivées. Les lectures SQL se partagent un :class:`PoolConnexions` borné ;
+avec un :class:`~northwind_bi.etl.excel.CacheExcel`, les feuilles périmées
+sont converties en une étape, dans un pool de processus. La durée
+d'extraction se rapproche de celle de la source la plus lente.
+
+La table Orders n'est jamais chargée en entier : Dim_Temps ne lit que ses
+dates extrêmes (``Orders_Bornes``), et l'étape TF_COMMANDE lit Orders par
+lots sur une connexion du pool, lot après lot jusqu'à l'écriture ; la
+mémoire reste bornée par la taille des lots, comme dans
+:mod:`~northwind_bi.etl.fait_commande`.
+
+Exemple (SQLite et classeur local en guise de SSMS et d'Excel) ::
+
+    python -m northwind_bi.etl.extraction sqlite:///northwind.db Northwind.xlsx \\
+        --cache cache_excel --connexions 4 --cible sqlite:///entrepot.db
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import pandas as pd
+
+from northwind_bi.etl.cles import ResolveurCles
+from northwind_bi.etl.dimensions import (
+    construire_dim_client, construire_dim_employee, construire_pont_territoires,
+)
+from northwind_bi.etl.excel import FEUILLES_EXCEL, lire_feuille_excel
+from northwind_bi.etl.fait_commande import (
+    COLONNES_EXCEL, TAILLE_LOT, construire_fait_commande, lire_orders_ssms,
+)
+from northwind_bi.etl.temps import construire_dim_temps
+
+# Colonnes lues dans chaque table SSMS (celles que les scripts M retiennent)
+TABLES_SSMS = {
+    'Customers': ['CustomerID', 'CompanyName', 'City'],
+    'Employees': ['EmployeeID', 'LastName', 'FirstName', 'Region'],
+    'EmployeeTerritories': ['EmployeeID', 'TerritoryID'],
+    'Territories': ['TerritoryID', 'TerritoryDescription'],
+}
+CONNEXIONS = 4
+
+
+# ============================================
+# 1. POOL DE CONNEXIONS
+# ============================================
+
+class PoolConnexions:
+    """Au plus ``taille`` connexions ouvertes, prêtées une à la fois.
+
+    ``fabrique`` ouvre une connexion DB-API (par exemple
+    ``lambda: connecter(url, partageable=True)``) ; elle n'est appelée
+    qu'à la première demande qui ne trouve pas de connexion libre.
+    """
+
+    def __init__(self, fabrique, taille=CONNEXIONS):
+        if taille < 1:
+            raise ValueError(f"Taille du pool invalide : {taille}")
+        self.fabrique = fabrique
+        self.taille = taille
+        self._libres = queue.LifoQueue()
+        self._places = threading.BoundedSemaphore(taille)
+        self._ouvertes = []
+        self._verrou = threading.Lock()
+
+    @contextmanager
+    def connexion(self):
+        self._places.acquire()
+        try:
+            try:
+                cnx = self._libres.get_nowait()
+            except queue.Empty:
+                cnx = self.fabrique()
+                with self._verrou:
+                    self._ouvertes.append(cnx)
+            try:
+                yield cnx
+            finally:
+                self._libres.put(cnx)
+        finally:
+            self._places.release()
+
+    def fermer(self):
+        with self._verrou:
+            for cnx in self._ouvertes:
+                cnx.close()
+            self._ouvertes.clear()
+        self._libres = queue.LifoQueue()
+
+
+# ============================================
+# 2. PLANIFICATEUR
+# ============================================
+
+class Planificateur:
+    """Étapes nommées exécutées sur un pool de threads dès que leurs entrées sont prêtes.
+
+    Chaque étape est une fonction qui reçoit ``{dépendance: résultat}``.
+    Après :meth:`executer`, :attr:`chronologie` donne le début et la fin de
+    chaque étape (secondes depuis le lancement).
+    """
+
+    def __init__(self):
+        self.etapes = {}
+        self.chronologie = {}
+        self.duree = None
+
+    def ajouter(self, nom, fonction, dependances=()):
+        if nom in self.etapes:
+            raise ValueError(f"Étape déjà déclarée : {nom}")
+        self.etapes[nom] = (fonction, tuple(dependances))
+        return self
+
+    def _verifier(self):
+        """Dépendances connues et graphe sans cycle."""
+        for nom, (_, dependances) in self.etapes.items():
+            inconnues = [d for d in dependances if d not in self.etapes]
+            if inconnues:
+                raise KeyError(f"Étape {nom} : dépendances inconnues {inconnues}")
+        restantes, faites = dict(self.etapes), set()
+        while restantes:
+            pretes = [nom for nom, (_, deps) in restantes.items() if set(deps) <= faites]
+            if not pretes:
+                raise ValueError(f"Dépendances circulaires entre : {sorted(restantes)}")
+            for nom in pretes:
+                faites.add(nom)
+                del restantes[nom]
+
+    def _chronometrer(self, nom, fonction, entrees, origine):
+        debut = time.perf_counter() - origine
+        try:
+            return fonction(entrees)
+        finally:
+            self.chronologie[nom] = (debut, time.perf_counter() - origine)
+
+    def executer(self, threads=None):
+        """Exécute toutes les étapes ; retourne ``{étape: résultat}``.
+
+        Si une étape échoue, aucune nouvelle étape n'est lancée ; celles en
+        cours se terminent, puis l'erreur est relancée.
+        """
+        self._verifier()
+        threads = threads or len(self.etapes) or 1
+        resultats, restantes, en_cours = {}, dict(self.etapes), {}
+        origine = time.perf_counter()
+        self.chronologie = {}
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='etl') as pool:
+            while restantes or en_cours:
+                for nom, (fonction, dependances) in list(restantes.items()):
+                    if all(d in resultats for d in dependances):
+                        entrees = {d: resultats[d] for d in dependances}
+                        en_cours[pool.submit(self._chronometrer, nom, fonction, entrees, origine)] = nom
+                        del restantes[nom]
+                finis, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                for futur in finis:
+                    nom = en_cours.pop(futur)
+                    try:
+                        resultats[nom] = futur.result()
+                    except Exception as erreur:
+                        wait(en_cours)
+                        raise RuntimeError(f"Étape {nom} en échec : {erreur}") from erreur
+        self.duree = time.perf_counter() - origine
+        return resultats
+
+    def bilan(self):
+        """Durée de chaque étape, cumul et durée réelle de l'exécution."""
+        durees = {nom: fin - debut for nom, (debut, fin) in self.chronologie.items()}
+        return {'etapes': durees, 'cumul': sum(durees.values()), 'duree': self.duree}
+
+
+# ============================================
+# 3. GRAPHE DE L'ETL NORTHWIND
+# ============================================
+
+def _lire_table(pool, table, colonnes):
+    def etape(_):
+        with pool.connexion() as cnx:
+            return pd.read_sql_query(f"SELECT {', '.join(colonnes)} FROM {table}", cnx)
+    return etape
+
+
+def _lire_bornes_orders(pool):
+    """Première et dernière ``OrderDate`` : tout ce que Dim_Temps lit de Orders."""
+    def etape(_):
+        with pool.connexion() as cnx:
+            bornes = pd.read_sql_query(
+                "SELECT MIN(OrderDate) AS premiere, MAX(OrderDate) AS derniere FROM Orders", cnx)
+        return pd.to_datetime(bornes.iloc[0], errors='coerce')
+    return etape
+
+
+def _lots_excel(orders_excel, taille_lot):
+    orders = orders_excel[list(COLONNES_EXCEL)].rename(columns=COLONNES_EXCEL)
+    for debut in range(0, len(orders), taille_lot):
+        lot = orders.iloc[debut:debut + taille_lot].reset_index(drop=True)
+        lot['source_prod'] = 'EXCEL'
+        yield lot
+
+
+def planifier_etl(pool, classeur, cache=None, ecrire_fait=None, taille_lot=TAILLE_LOT, processus=None):
+    """:class:`Planificateur` de l'ETL complet.
+
+    ``classeur`` est le chemin du classeur Excel, ou ``{feuille: chemin}``
+    si les feuilles sont réparties. Avec un ``cache``, les feuilles sont
+    lues dans leur conversion binaire (étape ``Excel``, ``processus``
+    conversions en parallèle). ``ecrire_fait`` reçoit les lots de
+    TF_COMMANDE (par exemple ``lambda lots: ecrire_fait_sql(lots, cnx)``) ;
+    sans lui, le fait est retourné en un seul DataFrame.
+    """
+    classeurs = classeur if isinstance(classeur, dict) else dict.fromkeys(FEUILLES_EXCEL, classeur)
+    plan = Planificateur()
+
+    plan.ajouter('Orders_Bornes', _lire_bornes_orders(pool))
+    for table, colonnes in TABLES_SSMS.items():
+        plan.ajouter(table, _lire_table(pool, table, colonnes))
+
+    if cache is not None:
+        sources = [(classeurs[feuille], feuille) for feuille in FEUILLES_EXCEL]
+        plan.ajouter('Excel', lambda _: cache.convertir(sources, processus))
+        for feuille in FEUILLES_EXCEL:
+            plan.ajouter(feuille, lambda _, f=feuille: cache.lire(classeurs[f], f), ['Excel'])
+    else:
+        for feuille, colonnes in FEUILLES_EXCEL.items():
+            plan.ajouter(feuille, lambda _, f=feuille, c=colonnes: lire_feuille_excel(classeurs[f], f, c))
+
+    plan.ajouter('DimClient', lambda e: construire_dim_client(e['Customers'], e['Customers_Excel']),
+                 ['Customers', 'Customers_Excel'])
+    plan.ajouter('Dim_Employee', lambda e: construire_dim_employee(e['Employees'], e['Employees_Excel']),
+                 ['Employees', 'Employees_Excel'])
+    plan.ajouter('Employee_Territory', lambda e: construire_pont_territoires(
+        e['Dim_Employee'], e['EmployeeTerritories'], e['Territories'], e['Employees_Excel']),
+        ['Dim_Employee', 'EmployeeTerritories', 'Territories', 'Employees_Excel'])
+    plan.ajouter('Dim_Temps', lambda e: construire_dim_temps(
+        e['Orders_Bornes'], e['Temps_Excel']['Order Date']), ['Orders_Bornes', 'Temps_Excel'])
+
+    def fait(e):
+        resolveur = ResolveurCles(e['DimClient'], e['Dim_Employee'], e['Dim_Temps'])
+        # Orders lu en flux pendant la construction : un lot en mémoire à la fois
+        with pool.connexion() as cnx:
+            lots = construire_fait_commande(
+                itertools.chain(lire_orders_ssms(cnx, taille_lot),
+                                _lots_excel(e['Orders_Excel'], taille_lot)), resolveur)
+            if ecrire_fait is not None:
+                return ecrire_fait(lots)
+            lots = list(lots)
+        return pd.concat(lots, ignore_index=True) if lots else None
+
+    plan.ajouter('TF_COMMANDE', fait, ['Orders_Excel', 'DimClient', 'Dim_Employee', 'Dim_Temps'])
+    return plan
+
+
+def main(argv=None):
+    from northwind_bi.etl.excel import CacheExcel
+    from northwind_bi.etl.fait_commande import ecrire_fait_sql
+    from northwind_bi.sql import connecter
+
+    parser = argparse.ArgumentParser(description="Extraction concurrente des sources et construction du modèle.")
+    parser.add_argument('source', help="Base SSMS (chaîne ODBC) ou sqlite:///chemin")
+    parser.add_argument('classeur', help="Classeur Excel des feuilles *_Excel")
+    parser.add_argument('--cible', required=True, help="Base cible des dimensions et de TF_COMMANDE")
+    parser.add_argument('--cache', default=None, help="Dossier du cache binaire des feuilles Excel")
+    parser.add_argument('--connexions', type=int, default=CONNEXIONS, help="Connexions simultanées à la source")
+    parser.add_argument('--processus', type=int, default=os.cpu_count())
+    parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT)
+    parser.add_argument('--service', nargs='?', const='', default=None,
+                        help="Service d'analyse à recharger en fin d'ETL (adresse, par défaut NORTHWIND_BI_SERVICE)")
+    args = parser.parse_args(argv)
+
+    pool = PoolConnexions(lambda: connecter(args.source, partageable=True), args.connexions)
+    cible = connecter(args.cible, partageable=True)
+    cache = CacheExcel(args.cache) if args.cache else None
+    try:
+        plan = planifier_etl(pool, args.classeur, cache, lambda lots: ecrire_fait_sql(lots, cible),
+                             args.taille_lot, args.processus)
+        resultats = plan.executer()
+        for table in ('DimClient', 'Dim_Employee', 'Employee_Territory', 'Dim_Temps'):
+            resultats[table].to_sql(table, cible, index=False, if_exists='replace')
+            print(f"✅ {table} : {len(resultats[table])} lignes")
+        print(f"✅ TF_COMMANDE : {resultats['TF_COMMANDE']} lignes")
+    finally:
+        pool.fermer()
+        cible.close()
+
+    bilan = plan.bilan()
+    for nom, (debut, fin) in sorted(plan.chronologie.items(), key=lambda item: item[1]):
+        print(f"   {nom:<20} {debut:7.2f}s -> {fin:7.2f}s")
+    print(f"⏱️ Durée : {bilan['duree']:.2f}s (étapes cumulées : {bilan['cumul']:.2f}s)")
+
+    if args.service is not None:
+        from northwind_bi.service import notifier_rechargement
+
+        rechargement = notifier_rechargement(args.service or None)
+        if rechargement is None:
+            print("⚠️  Service d'analyse injoignable : pas de rechargement")
+        else:
+            print(f"🔄 Service d'analyse rechargé : {rechargement['lignes']} lignes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""Construction en flux de la table de fait TF_COMMANDE.
+
+Équivalent Python de ``ScriptRemplissage/CreationFaitCommande.txt`` sous
+forme de pipeline de générateurs : les commandes sont lues par lots de
+taille bornée (SSMS puis EXCEL), les indicateurs livrée / non livrée
+sont calculés de façon vectorisée, les clés des dimensions sont résolues
+(:mod:`northwind_bi.etl.cles`) puis le fait est écrit lot par lot. La
+mémoire utilisée ne dépend que de la taille d'un lot, pas du nombre
+de commandes.
+"""
+
+import itertools
+
+import pandas as pd
+
+from northwind_bi.agregats import PREFIXE_TABLE, CumulAgregats, ecrire_agregats_sql
+
+TAILLE_LOT = 50_000
+# SQL Server limite le nombre de paramètres par requête (2 100)
+TAILLE_PAQUET_SQL = 1000
+
+# Colonnes sélectionnées dans chaque source, renommées vers le schéma commun
+COLONNES_SSMS = {
+    'OrderID': 'OrderID',
+    'CustomerID': 'CustomerID',
+    'EmployeeID': 'EmployeeID',
+    'OrderDate': 'OrderDate',
+    'ShippedDate': 'ShippedDate',
+}
+COLONNES_EXCEL = {
+    'Order ID': 'OrderID',
+    'Customer ID': 'CustomerID',
+    'Employee ID': 'EmployeeID',
+    'Order Date': 'OrderDate',
+    'Shipped Date': 'ShippedDate',
+}
+
+CLES_COMMANDE = ['OrderID', 'CustomerID', 'EmployeeID', 'OrderDate', 'source_prod']
+COLONNES_FAIT = [
+    'id_seq_fait', 'id_temps', 'id_seqEmployee', 'id_seqClient',
+    'nbr_commande_livrees', 'nbr_commande_non_livrees',
+]
+
+
+# ============================================
+# 1. LECTURE DES SOURCES PAR LOTS
+# ============================================
+
+def lire_orders_ssms(connexion, taille_lot=TAILLE_LOT, table='Orders',
+                     depuis_commande=None, en_attente=()):
+    """Lots de la table Orders (SQL Server ou toute connexion DB-API).
+
+    Le tri par ``OrderID`` garantit que les lignes d'une même commande sont
+    contiguës, ce que suppose :func:`regrouper_commandes`. Avec
+    ``depuis_commande`` et ``en_attente`` (mode incrémental), seules sont
+    lues les commandes passées depuis cette date, puis les commandes
+    ``en_attente`` (OrderID) plus anciennes désormais expédiées, quelle que
+    soit leur date d'expédition : une expédition saisie avec une date
+    antérieure n'est pas manquée.
+    """
+    colonnes = ', '.join(COLONNES_SSMS)
+    requete = f"SELECT {colonnes} FROM {table}"
+    if depuis_commande is None:
+        requetes = [(requete + " ORDER BY OrderID", None)]
+    else:
+        requetes = [(requete + " WHERE OrderDate >= ? ORDER BY OrderID", [depuis_commande])]
+        en_attente = list(en_attente)
+        for debut in range(0, len(en_attente), TAILLE_PAQUET_SQL):
+            paquet = en_attente[debut:debut + TAILLE_PAQUET_SQL]
+            # Les commandes depuis le watermark sont déjà lues par la première requête
+            requetes.append((
+                f"{requete} WHERE OrderID IN ({', '.join('?' * len(paquet))}) "
+                f"AND ShippedDate IS NOT NULL AND (OrderDate IS NULL OR OrderDate < ?) ORDER BY OrderID",
+                [*paquet, depuis_commande],
+            ))
+    for requete, parametres in requetes:
+        for lot in pd.read_sql_query(requete, connexion, params=parametres, chunksize=taille_lot):
+            lot = lot.rename(columns=COLONNES_SSMS)
+            lot['source_prod'] = 'SSMS'
+            yield lot
+
+
+def lire_orders_excel(chemin, feuille='Orders_Excel', taille_lot=TAILLE_LOT, cache=None):
+    """Lots de la feuille Orders du classeur Excel, lue en mode flux.
+
+    Avec un :class:`~northwind_bi.etl.excel.CacheExcel`, la feuille est lue
+    dans sa conversion binaire, refaite seulement si le classeur a changé.
+    """
+    if cache is not None:
+        orders = cache.lire(chemin, feuille, list(COLONNES_EXCEL)).rename(columns=COLONNES_EXCEL)
+        for debut in range(0, len(orders), taille_lot):
+            lot = orders.iloc[debut:debut + taille_lot].reset_index(drop=True)
+            lot['source_prod'] = 'EXCEL'
+            yield lot
+        return
+
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(chemin, read_only=True, data_only=True)
+    try:
+        lignes = classeur[feuille].iter_rows(values_only=True)
+        entete = list(next(lignes))
+        positions = [entete.index(nom) for nom in COLONNES_EXCEL]
+        while True:
+            paquet = list(itertools.islice(lignes, taille_lot))
+            if not paquet:
+                break
+            lot = pd.DataFrame(
+                [[ligne[i] for i in positions] for ligne in paquet],
+                columns=list(COLONNES_EXCEL.values()),
+            )
+            lot['source_prod'] = 'EXCEL'
+            yield lot
+    finally:
+        classeur.close()
+
+
+# ============================================
+# 2. TRANSFORMATIONS VECTORISÉES
+# ============================================
+
+def preparer_lot(lot):
+    """Typage et indicateurs livrée / non livrée."""
+    lot = lot.astype({'OrderID': 'string', 'CustomerID': 'string', 'EmployeeID': 'string'})
+    lot['OrderDate'] = pd.to_datetime(lot['OrderDate'], errors='coerce').dt.normalize()
+    livree = pd.to_datetime(lot['ShippedDate'], errors='coerce').notna()
+    lot['nbr_commande_livrees'] = livree.astype('int64')
+    lot['nbr_commande_non_livrees'] = (~livree).astype('int64')
+    return lot.drop(columns='ShippedDate')
+
+
+def regrouper_commandes(lots):
+    """Agrégation par commande (``Table.Group`` du script M), lot par lot.
+
+    Les lignes de la dernière commande d'un lot sont retenues et ajoutées au
+    lot suivant, afin qu'une commande à cheval sur deux lots ne soit pas
+    émise deux fois.
+    """
+    reliquat = None
+    for lot in lots:
+        if reliquat is not None:
+            lot = pd.concat([reliquat, lot], ignore_index=True)
+        if lot.empty:
+            continue
+        derniere = (lot['OrderID'] == lot['OrderID'].iloc[-1]) & (
+            lot['source_prod'] == lot['source_prod'].iloc[-1])
+        reliquat = lot[derniere]
+        complet = lot[~derniere]
+        if not complet.empty:
+            yield _sommer_par_commande(complet)
+    if reliquat is not None and not reliquat.empty:
+        yield _sommer_par_commande(reliquat)
+
+
+def _sommer_par_commande(lot):
+    return lot.groupby(CLES_COMMANDE, dropna=False, sort=False).agg(
+        nbr_commande_livrees=('nbr_commande_livrees', 'sum'),
+        nbr_commande_non_livrees=('nbr_commande_non_livrees', 'sum'),
+    ).reset_index()
+
+
+# ============================================
+# 3. PIPELINE ET ÉCRITURE
+# ============================================
+
+def construire_fait_commande(lots_orders, resolveur):
+    """Générateur des lots de TF_COMMANDE.
+
+    ``lots_orders`` est un itérable de lots au schéma commun, par exemple
+    ``itertools.chain(lire_orders_ssms(cnx), lire_orders_excel(chemin))`` ;
+    ``resolveur`` est un :class:`~northwind_bi.etl.cles.ResolveurCles` dont
+    le rapport donne, en fin de flux, les clés introuvables.
+    ``id_seq_fait`` est numéroté à partir de 1 à travers les lots.
+    """
+    prochain_id = 1
+    for commandes in regrouper_commandes(preparer_lot(lot) for lot in lots_orders):
+        fait = resolveur.resoudre(commandes)
+        fait.insert(0, 'id_seq_fait', range(prochain_id, prochain_id + len(fait)))
+        prochain_id += len(fait)
+        yield fait[COLONNES_FAIT]
+
+
+def ecrire_fait_csv(lots_fait, chemin):
+    """Écrit les lots dans un CSV (en-tête au premier lot) ; retourne le nombre de lignes."""
+    nb_lignes = 0
+    for numero, lot in enumerate(lots_fait):
+        lot.to_csv(chemin, mode='w' if numero == 0 else 'a', header=numero == 0, index=False)
+        nb_lignes += len(lot)
+    return nb_lignes
+
+
+def ecrire_fait_sql(lots_fait, connexion, table='TF_COMMANDE', prefixe_agregats=PREFIXE_TABLE):
+    """Écrit les lots dans une table SQL (remplacée au premier lot) ; retourne le nombre de lignes.
+
+    Les agrégats matérialisés (:mod:`northwind_bi.agregats`) sont cumulés au
+    passage puis écrits dans les tables ``<prefixe_agregats><GRAIN>``
+    (``None`` : pas d'agrégats).
+    """
+    cumul = CumulAgregats() if prefixe_agregats else None
+    nb_lignes = 0
+    for numero, lot in enumerate(cumul.suivre(lots_fait) if cumul else lots_fait):
+        lot.to_sql(table, connexion, if_exists='replace' if numero == 0 else 'append', index=False)
+        nb_lignes += len(lot)
+    if cumul:
+        ecrire_agregats_sql(cumul.tables(), connexion, prefixe_agregats)
+    return nb_lignes
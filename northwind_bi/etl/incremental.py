@@ -0,0 +1,349 @@
+"""Rafraîchissement incrémental de TF_COMMANDE.
+
+Au lieu de reconstruire le fait à chaque actualisation, un état persistant
+(``etat.json``) retient pour chaque source (SSMS, EXCEL) :
+
+* le watermark ``OrderDate`` et les commandes déjà lues à cette date ;
+* les commandes encore non livrées et leur ``id_seq_fait``.
+
+Seules les nouvelles commandes et les commandes en attente dont
+``ShippedDate`` est désormais renseignée sont traitées : les premières
+sont ajoutées au fait, les secondes mises à jour sur place, et l'agrégat
+mensuel ``AGG_COMMANDE_MENSUEL`` et les agrégats matérialisés
+``AGG_COMMANDE_<GRAIN>`` (:mod:`northwind_bi.agregats`) sont corrigés par
+différence. Chaque
+actualisation est tracée dans ``journal_<source>.jsonl``.
+
+L'état retient aussi les clés de substitution de DimClient et Dim_Employee
+(:meth:`RafraichissementIncremental.cles_dimension`) : reconstruites avec
+ces clés, les dimensions ne font qu'ajouter des membres, et les lignes
+déjà chargées du fait pointent toujours sur le bon client et le bon
+employé ::
+
+    rafraichissement = RafraichissementIncremental('etat_etl')
+    dim_client = construire_dim_client(customers, customers_excel,
+                                       rafraichissement.cles_dimension('DimClient'))
+    rafraichissement.retenir_dimension('DimClient', dim_client)
+
+Les commandes en attente sont relues par leur ``OrderID``, pas par un
+watermark ``ShippedDate`` : une expédition saisie avec une date antérieure
+aux précédentes est prise en compte. Le suivi des expéditions suppose une
+ligne par commande et par source, comme dans les tables Orders de
+Northwind.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from northwind_bi.agregation import DIMENSIONS
+from northwind_bi.agregats import EFFECTIF, GRAINS, PREFIXE_TABLE, agreger_lot, fusionner_agregats, table_agregat
+from northwind_bi.etl.dimensions import CLES_DIMENSIONS
+from northwind_bi.etl.fait_commande import COLONNES_FAIT, TAILLE_PAQUET_SQL, preparer_lot, regrouper_commandes
+
+MESURES = ['nbr_commande_livrees', 'nbr_commande_non_livrees']
+
+
+def _date(valeur):
+    return None if valeur is None else pd.Timestamp(valeur)
+
+
+def _iso(valeur):
+    return None if valeur is None or pd.isna(valeur) else pd.Timestamp(valeur).isoformat()
+
+
+def _creer_agregat(table, cles, nom, connexion):
+    """Crée la table d'agrégat (premier passage), indexée sur ses clés pour les mises à jour."""
+    table.to_sql(nom, connexion, index=False, if_exists='replace')
+    if cles:
+        connexion.cursor().execute(f"CREATE INDEX IX_{nom} ON {nom} ({', '.join(cles)})")
+
+
+def _ajouter_differences(differences, cles, mesures, nom, connexion):
+    """Ajoute ``differences`` (une ligne par clé) à la table ``nom``, sur place.
+
+    Chaque ligne est un ``UPDATE nom SET m = m + ? WHERE cle = ?`` ; celles
+    qui ne touchent aucune ligne (nouveau mois, nouveau client...) sont
+    insérées. Une clé vide est comparée par ``IS NULL``. Retourne le nombre
+    de lignes mises à jour et insérées.
+    """
+    curseur = connexion.cursor()
+    affectation = ', '.join(f'{mesure} = {mesure} + ?' for mesure in mesures)
+    cles, mesures = list(cles), list(mesures)
+    mises_a_jour, insertions = 0, []
+    for ligne in differences[cles + mesures].astype(object).itertuples(index=False):
+        valeurs_cles = [None if pd.isna(valeur) else int(valeur) for valeur in ligne[:len(cles)]]
+        increments = [int(valeur) for valeur in ligne[len(cles):]]
+        if not any(increments):
+            continue
+        conditions = [f'{cle} IS NULL' if valeur is None else f'{cle} = ?'
+                      for cle, valeur in zip(cles, valeurs_cles)]
+        requete = f"UPDATE {nom} SET {affectation}"
+        if conditions:
+            requete += f" WHERE {' AND '.join(conditions)}"
+        curseur.execute(requete, increments + [valeur for valeur in valeurs_cles if valeur is not None])
+        if curseur.rowcount:
+            mises_a_jour += 1
+        else:
+            insertions.append(valeurs_cles + increments)
+    if insertions:
+        curseur.executemany(
+            f"INSERT INTO {nom} ({', '.join(cles + mesures)}) VALUES ({', '.join('?' * len(cles + mesures))})",
+            insertions)
+    return mises_a_jour, len(insertions)
+
+
+class RafraichissementIncremental:
+    """État, journal et application d'un rafraîchissement incrémental.
+
+    Le premier passage (état vide) est un chargement complet qui remplace
+    TF_COMMANDE ; les suivants n'ajoutent ou ne modifient que les lignes
+    concernées.
+    """
+
+    def __init__(self, dossier, table_fait='TF_COMMANDE', table_mensuelle='AGG_COMMANDE_MENSUEL',
+                 prefixe_agregats=PREFIXE_TABLE):
+        self.dossier = Path(dossier)
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.table_fait = table_fait
+        self.table_mensuelle = table_mensuelle
+        self.prefixe_agregats = prefixe_agregats
+        chemin = self.dossier / 'etat.json'
+        if chemin.exists():
+            self.etat = json.loads(chemin.read_text(encoding='utf-8'))
+        else:
+            self.etat = {'prochain_id_fait': 1, 'sources': {}}
+
+    # --------------------------
+    # État par source
+    # --------------------------
+    def etat_source(self, source):
+        return self.etat['sources'].setdefault(source, {
+            'watermark_commande': None,
+            'ids_au_watermark': [],
+            'en_attente': {},
+        })
+
+    def watermarks(self, source):
+        """Watermark et commandes en attente à passer à ``lire_orders_ssms`` (watermark ``None`` au premier passage)."""
+        etat = self.etat_source(source)
+        watermark = etat['watermark_commande']
+        return {
+            'depuis_commande': None if watermark is None else _date(watermark).to_pydatetime(),
+            'en_attente': list(etat['en_attente']),
+        }
+
+    def sauvegarder(self):
+        chemin = self.dossier / 'etat.json'
+        provisoire = chemin.with_suffix('.tmp')
+        provisoire.write_text(json.dumps(self.etat, indent=1), encoding='utf-8')
+        provisoire.replace(chemin)
+
+    def journaliser(self, source, entree):
+        entree = {'horodatage': datetime.now().isoformat(timespec='seconds'), **entree}
+        with open(self.dossier / f'journal_{source}.jsonl', 'a', encoding='utf-8') as journal:
+            journal.write(json.dumps(entree, ensure_ascii=False) + '\n')
+
+    # --------------------------
+    # Clés des dimensions
+    # --------------------------
+    def cles_dimension(self, nom):
+        """Clés déjà attribuées de la dimension ``nom`` (``None`` au premier passage).
+
+        À passer en ``existante`` à
+        :func:`~northwind_bi.etl.dimensions.construire_dim_client` ou
+        :func:`~northwind_bi.etl.dimensions.construire_dim_employee`.
+        """
+        lignes = self.etat.get('dimensions', {}).get(nom)
+        if lignes is None:
+            return None
+        cle, naturelle = CLES_DIMENSIONS[nom]
+        return pd.DataFrame(lignes, columns=[cle, *naturelle])
+
+    def retenir_dimension(self, nom, dimension):
+        """Retient les clés de ``dimension`` (sauvegardées avec l'état).
+
+        Les membres disparus des sources restent retenus : leur clé n'est
+        jamais réattribuée à un autre membre.
+        """
+        cle, naturelle = CLES_DIMENSIONS[nom]
+        cles = dimension[[cle, *naturelle]]
+        anciennes = self.cles_dimension(nom)
+        if anciennes is not None:
+            cles = pd.concat([anciennes, cles], ignore_index=True)
+        cles = cles.astype({colonne: 'string' for colonne in naturelle}).drop_duplicates(naturelle)
+        self.etat.setdefault('dimensions', {})[nom] = [
+            [int(valeur), *naturelles] for valeur, *naturelles in cles.itertuples(index=False)
+        ]
+
+    # --------------------------
+    # Sélection des changements
+    # --------------------------
+    def filtrer(self, lots, vus):
+        """Ne garde que les nouvelles commandes et les expéditions en attente.
+
+        ``vus`` reçoit, par source, les dates observées pour avancer les
+        watermarks en fin de rafraîchissement.
+        """
+        for lot in lots:
+            for source, partie in lot.groupby('source_prod', sort=False):
+                etat = self.etat_source(source)
+                ids = partie['OrderID'].astype('string')
+                date_commande = pd.to_datetime(partie['OrderDate'], errors='coerce').dt.normalize()
+                expediee = pd.to_datetime(partie['ShippedDate'], errors='coerce').notna()
+
+                watermark = _date(etat['watermark_commande'])
+                if watermark is None:
+                    nouvelle = pd.Series(True, index=partie.index)
+                else:
+                    nouvelle = (date_commande > watermark) | (
+                        (date_commande == watermark) & ~ids.isin(etat['ids_au_watermark']))
+                expediee &= ids.isin(list(etat['en_attente']))
+
+                vus.setdefault(source, []).append(pd.DataFrame({
+                    'OrderID': ids[nouvelle],
+                    'OrderDate': date_commande[nouvelle],
+                }))
+                garde = partie[nouvelle | expediee]
+                if not garde.empty:
+                    yield garde
+
+    def _avancer_watermarks(self, vus):
+        for source, morceaux in vus.items():
+            etat = self.etat_source(source)
+            nouvelles = pd.concat(morceaux, ignore_index=True).dropna(subset=['OrderDate'])
+            if nouvelles.empty:
+                continue
+            maximum = nouvelles['OrderDate'].max()
+            courant = _date(etat['watermark_commande'])
+            ids_max = nouvelles.loc[nouvelles['OrderDate'] == maximum, 'OrderID'].tolist()
+            if courant is None or maximum > courant:
+                etat['watermark_commande'] = _iso(maximum)
+                etat['ids_au_watermark'] = ids_max
+            elif maximum == courant:
+                etat['ids_au_watermark'] = sorted(set(etat['ids_au_watermark']) | set(ids_max))
+
+    # --------------------------
+    # Application au fait
+    # --------------------------
+    def appliquer(self, lots_orders, resolveur, connexion):
+        """Applique les changements de ``lots_orders`` à TF_COMMANDE.
+
+        ``lots_orders`` contient les lots bruts des sources (voir
+        :func:`~northwind_bi.etl.fait_commande.lire_orders_ssms` avec
+        :meth:`watermarks`). Retourne le nombre de commandes ajoutées et
+        mises à jour.
+        """
+        premier_passage = self.etat['prochain_id_fait'] == 1
+        vus = {}
+        deltas = []
+        bilan = {}
+
+        for commandes in regrouper_commandes(preparer_lot(lot) for lot in self.filtrer(lots_orders, vus)):
+            for source, partie in commandes.groupby('source_prod', sort=False):
+                en_attente = self.etat_source(source)['en_attente']
+                connue = partie['OrderID'].isin(list(en_attente)).to_numpy()
+                compte = bilan.setdefault(source, {'nouvelles': 0, 'ids_fait': None, 'expediees': []})
+                if not connue.all():
+                    ids_fait = self._ajouter(partie[~connue], resolveur, connexion, en_attente,
+                                             premier_passage, deltas)
+                    premier_passage = False
+                    compte['nouvelles'] += len(ids_fait)
+                    if len(ids_fait):
+                        debut = ids_fait[0] if compte['ids_fait'] is None else compte['ids_fait'][0]
+                        compte['ids_fait'] = [debut, ids_fait[-1]]
+                if connue.any():
+                    compte['expediees'].extend(
+                        self._mettre_a_jour(partie[connue], connexion, en_attente, deltas))
+
+        self._corriger_agregat_mensuel(deltas, connexion)
+        self._corriger_agregats(deltas, connexion)
+        self._avancer_watermarks(vus)
+        connexion.commit()
+        self.sauvegarder()
+
+        for source, compte in bilan.items():
+            self.journaliser(source, compte)
+        return {
+            'nouvelles': sum(compte['nouvelles'] for compte in bilan.values()),
+            'expediees': sum(len(compte['expediees']) for compte in bilan.values()),
+        }
+
+    def _ajouter(self, commandes, resolveur, connexion, en_attente, remplacer, deltas):
+        fait = resolveur.resoudre(commandes)
+        premier = self.etat['prochain_id_fait']
+        fait.insert(0, 'id_seq_fait', range(premier, premier + len(fait)))
+        self.etat['prochain_id_fait'] = premier + len(fait)
+
+        fait[COLONNES_FAIT].to_sql(self.table_fait, connexion, index=False,
+                                   if_exists='replace' if remplacer else 'append')
+        attente = fait[fait['nbr_commande_non_livrees'] > 0]
+        en_attente.update(zip(attente['OrderID'].tolist(), attente['id_seq_fait'].tolist()))
+        deltas.append(fait[list(DIMENSIONS) + MESURES].assign(**{EFFECTIF: 1}))
+        return fait['id_seq_fait'].tolist()
+
+    def _mettre_a_jour(self, commandes, connexion, en_attente, deltas):
+        ids_fait = [en_attente[order_id] for order_id in commandes['OrderID']]
+        anciennes = pd.concat(
+            pd.read_sql_query(
+                f"SELECT id_seq_fait, {', '.join(DIMENSIONS)}, {', '.join(MESURES)} FROM {self.table_fait} "
+                f"WHERE id_seq_fait IN ({', '.join('?' * len(paquet))})",
+                connexion, params=paquet,
+            )
+            # SQL Server limite le nombre de paramètres par requête
+            for paquet in (ids_fait[i:i + TAILLE_PAQUET_SQL]
+                           for i in range(0, len(ids_fait), TAILLE_PAQUET_SQL))
+        ).set_index('id_seq_fait').loc[ids_fait]
+
+        nouvelles = commandes[MESURES].to_numpy()
+        curseur = connexion.cursor()
+        curseur.executemany(
+            f"UPDATE {self.table_fait} SET nbr_commande_livrees = ?, nbr_commande_non_livrees = ? "
+            f"WHERE id_seq_fait = ?",
+            [(int(livrees), int(non_livrees), id_fait)
+             for (livrees, non_livrees), id_fait in zip(nouvelles, ids_fait)],
+        )
+        difference = pd.DataFrame(nouvelles - anciennes[MESURES].to_numpy(), columns=MESURES)
+        for dim in DIMENSIONS:
+            difference[dim] = anciennes[dim].to_numpy()
+        difference[EFFECTIF] = 0
+        deltas.append(difference)
+
+        expediees = commandes.loc[commandes['nbr_commande_non_livrees'] == 0, 'OrderID'].tolist()
+        for order_id in expediees:
+            del en_attente[order_id]
+        return expediees
+
+    def _corriger_agregat_mensuel(self, deltas, connexion):
+        """Ajoute les différences par ``id_temps`` à l'agrégat mensuel.
+
+        Seuls les mois touchés sont mis à jour ; les nouveaux mois sont insérés.
+        """
+        if not deltas:
+            return
+        delta = pd.concat(deltas).groupby('id_temps')[MESURES].sum().reset_index()
+        if self.etat.get('agregat_mensuel'):
+            _ajouter_differences(delta, ['id_temps'], MESURES, self.table_mensuelle, connexion)
+        else:
+            _creer_agregat(delta, ['id_temps'], self.table_mensuelle, connexion)
+        self.etat['agregat_mensuel'] = True
+
+    def _corriger_agregats(self, deltas, connexion):
+        """Ajoute les différences aux agrégats matérialisés de chaque grain.
+
+        Seules les lignes des clés touchées sont mises à jour ; les clés
+        nouvelles sont insérées.
+        """
+        if not deltas or not self.prefixe_agregats:
+            return
+        delta = pd.concat(deltas, ignore_index=True)
+        for grain, dimensions in GRAINS.items():
+            differences = fusionner_agregats([agreger_lot(delta, dimensions)], dimensions)
+            nom = table_agregat(grain, self.prefixe_agregats)
+            if self.etat.get('agregats'):
+                _ajouter_differences(differences, dimensions, MESURES + [EFFECTIF], nom, connexion)
+            else:
+                _creer_agregat(differences, dimensions, nom, connexion)
+        self.etat['agregats'] = True
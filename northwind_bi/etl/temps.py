@@ -0,0 +1,99 @@
+"""Dimension temps mensuelle à clé de période entière.
+
+Équivalent Python de ``ScriptRemplissage/CreationDimTemps.txt``. Le script M
+construit ``mois_annee`` ("03/2006") ligne à ligne, fait un
+``Table.Distinct`` sur toutes les dates des deux sources, puis le fait se
+joint sur ce texte. Ici, la période est l'entier ``annee * 12 + mois``,
+calculé directement sur les tableaux de dates. Seules les dates extrêmes
+des sources sont lues, et le calendrier est contigu : il n'a aucun mois
+manquant entre la première et la dernière période observées.
+``id_temps`` se déduit donc de la période par une soustraction, sans
+jointure sur texte.
+"""
+
+import numpy as np
+import pandas as pd
+
+# annee * 12 + mois du mois d'origine de datetime64 (janvier 1970)
+ORIGINE = 1970 * 12 + 1
+
+
+def periodes(dates):
+    """Période ``annee * 12 + mois`` de chaque date (``Int64``, ``<NA>`` si vide)."""
+    mois = np.asarray(pd.to_datetime(dates, errors='coerce'), dtype='datetime64[ns]').astype('datetime64[M]')
+    manquant = np.isnat(mois)
+    valeurs = mois.astype('int64') + ORIGINE
+    valeurs[manquant] = 0
+    return pd.arrays.IntegerArray(valeurs, manquant)
+
+
+def calendrier(premiere, derniere):
+    """Dim_Temps contiguë de la période ``premiere`` à ``derniere`` incluses.
+
+    ``id_temps`` vaut 1 pour la première période et augmente d'un par mois.
+    ``mois_annee`` garde le format "03/2006" du rapport Power BI.
+    """
+    periode = np.arange(premiere, derniere + 1, dtype='int64')
+    annee, mois = np.divmod(periode - 1, 12)
+    mois += 1
+    return pd.DataFrame({
+        'id_temps': periode - premiere + 1,
+        'periode': periode,
+        'annee': annee,
+        'trimestre': (mois - 1) // 3 + 1,
+        'mois': mois,
+        'mois_annee': (pd.Series(mois).astype('string').str.zfill(2) + '/'
+                       + pd.Series(annee).astype('string')),
+    })
+
+
+def construire_dim_temps(*sources):
+    """Dim_Temps couvrant toutes les dates des ``sources``.
+
+    Chaque source est un tableau de dates, par exemple ``Orders.OrderDate``
+    et ``Temps_Excel['Order Date']``. Les dates vides sont ignorées.
+    """
+    bornes = []
+    for dates in sources:
+        dates = pd.Series(pd.to_datetime(dates, errors='coerce'))
+        if dates.notna().any():
+            bornes += [dates.min(), dates.max()]
+    if not bornes:
+        raise ValueError("Aucune date renseignée : Dim_Temps vide")
+    premiere, derniere = periodes([min(bornes), max(bornes)])
+    return calendrier(int(premiere), int(derniere))
+
+
+class IndexPeriodes:
+    """Résolution ``OrderDate -> id_temps`` sur une Dim_Temps contiguë.
+
+    Même interface que :class:`~northwind_bi.etl.cles.IndexCles`, sans
+    clé texte : la position de la période dans le calendrier est
+    ``periode - premiere``. Les dates hors calendrier sont comptées comme
+    introuvables.
+    """
+
+    def __init__(self, dim_temps):
+        dim_temps = dim_temps.sort_values('periode')
+        periode = dim_temps['periode'].to_numpy(dtype='int64')
+        if len(periode) == 0:
+            raise ValueError("Dim_Temps vide")
+        if not np.array_equal(periode, np.arange(periode[0], periode[0] + len(periode))):
+            raise ValueError("Dim_Temps non contiguë : reconstruire avec construire_dim_temps")
+        self.premiere = int(periode[0])
+        self.valeurs = dim_temps['id_temps'].to_numpy(dtype='int64')
+        self.nb_lignes = 0
+        self.nb_non_trouves = 0
+
+    def __len__(self):
+        return len(self.valeurs)
+
+    def resoudre(self, dates):
+        """``id_temps`` des dates (``Int64``, ``<NA>`` si hors calendrier)."""
+        periode = periodes(dates)
+        position = periode.to_numpy(dtype='int64', na_value=-1) - self.premiere
+        manquant = periode.isna() | (position < 0) | (position >= len(self))
+        self.nb_lignes += len(position)
+        self.nb_non_trouves += int(manquant.sum())
+        valeurs = self.valeurs[np.where(manquant, 0, position)]
+        return pd.arrays.IntegerArray(valeurs, manquant)
@@ -0,0 +1,110 @@
+"""Mesure par étape des visuels : temps réel, temps CPU, pic mémoire.
+
+Désactivée par défaut : sans la variable ``NORTHWIND_BI_TRACE``, chaque
+appel se réduit à un test d'attribut. Avec ``NORTHWIND_BI_TRACE=stdout``,
+une ligne JSON par exécution est affichée ; avec un chemin de fichier,
+elle y est ajoutée. Les étapes sont balisées à la suite dans le script ::
+
+    trace = Traceur('kpi', lignes=len(dataset))
+    trace.etape('agregation')
+    ...
+    trace.etape('rendu')
+    plt.show()
+    trace.terminer()
+
+Chaque ``etape`` clôt la précédente. Power BI tue l'interpréteur d'un
+visuel qui dépasse son délai : en sortie fichier, l'exécution en cours est
+donc réécrite à chaque étape dans ``<fichier>.en_cours.<pid>``, supprimé à
+la fin ; s'il reste, son champ ``etape_en_cours`` désigne l'étape fautive.
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+VARIABLE = 'NORTHWIND_BI_TRACE'
+
+
+class Traceur:
+    """Une exécution de visuel, découpée en étapes successives."""
+
+    def __init__(self, script, destination=None, **contexte):
+        if destination is None:
+            destination = os.environ.get(VARIABLE)
+        self.actif = bool(destination)
+        if not self.actif:
+            return
+        self.fichier = None if destination in ('1', 'stdout', '-') else Path(destination)
+        self.en_cours = (self.fichier.with_name(f'{self.fichier.name}.en_cours.{os.getpid()}')
+                         if self.fichier else None)
+        self.enregistrement = {
+            'script': script,
+            'debut': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            **contexte,
+            'etapes': [],
+        }
+        self._etape = None
+        self._termine = False
+        self._debut = time.perf_counter()
+        self._tracemalloc = not tracemalloc.is_tracing()
+        if self._tracemalloc:
+            tracemalloc.start()
+        atexit.register(self.terminer, 'interrompu')
+
+    def etape(self, nom):
+        """Clôt l'étape courante et démarre ``nom``."""
+        if not self.actif:
+            return
+        self._clore()
+        tracemalloc.reset_peak()
+        self._etape = (nom, time.perf_counter(), time.process_time(), tracemalloc.get_traced_memory()[0])
+        if self.en_cours is not None:
+            self._ecrire_en_cours()
+
+    def _clore(self):
+        if self._etape is None:
+            return
+        nom, mur, cpu, memoire = self._etape
+        self.enregistrement['etapes'].append({
+            'nom': nom,
+            'mur_s': round(time.perf_counter() - mur, 6),
+            'cpu_s': round(time.process_time() - cpu, 6),
+            'pic_memoire_mo': round((tracemalloc.get_traced_memory()[1] - memoire) / 2**20, 3),
+        })
+        self._etape = None
+
+    def _ecrire_en_cours(self):
+        partiel = dict(self.enregistrement, statut='en_cours', etape_en_cours=self._etape[0])
+        try:
+            self.en_cours.write_text(json.dumps(partiel, ensure_ascii=False), encoding='utf-8')
+        except OSError:
+            pass
+
+    def terminer(self, statut='termine'):
+        """Clôt la dernière étape et écrit la ligne JSON de l'exécution."""
+        if not self.actif or self._termine:
+            return
+        self._termine = True
+        atexit.unregister(self.terminer)
+        etape_en_cours = self._etape[0] if self._etape and statut != 'termine' else None
+        self._clore()
+        if self._tracemalloc:
+            tracemalloc.stop()
+        self.enregistrement.update(
+            statut=statut,
+            etape_en_cours=etape_en_cours,
+            total_s=round(time.perf_counter() - self._debut, 6),
+        )
+        ligne = json.dumps(self.enregistrement, ensure_ascii=False)
+        if self.fichier is None:
+            print(ligne, file=sys.stdout, flush=True)
+            return
+        with open(self.fichier, 'a', encoding='utf-8') as fichier:
+            fichier.write(ligne + '\n')
+        self.en_cours.unlink(missing_ok=True)
@@ -0,0 +1,97 @@
+"""Normalisation des types du ``dataset`` reçu de Power BI.
+
+Power BI transmet les clés et les indicateurs livrée / non livrée en
+``int64`` ou ``float64`` : 8 octets par valeur pour des identifiants de
+quelques milliers de modalités et des indicateurs 0 / 1. Sur les grandes
+pages, le visuel atteint la limite mémoire avant la limite de temps. Les
+clés sont donc ramenées au plus petit entier capable de les contenir
+(entier nullable si des clés manquent, catégorie si elles ne sont pas
+numériques) et les indicateurs au plus petit entier non signé.
+"""
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.agregation import DIMENSIONS, MESURES
+
+CLES = ('id_seq_fait',) + DIMENSIONS
+
+
+def _plus_petit_entier(minimum, maximum):
+    return np.result_type(np.min_scalar_type(minimum), np.min_scalar_type(maximum))
+
+
+def _valeurs_entieres(valeurs):
+    return valeurs.dtype.kind in 'biu' or bool(np.all(np.mod(valeurs, 1) == 0))
+
+
+def compacter_cle(serie):
+    """Clé au plus petit type entier, nullable si elle a des manquants."""
+    if not pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype('category')
+    presentes = serie.dropna()
+    if presentes.empty:
+        return serie
+    valeurs = presentes.to_numpy()
+    if not _valeurs_entieres(valeurs):
+        return serie
+    type_min = _plus_petit_entier(int(valeurs.min()), int(valeurs.max()))
+    if len(presentes) < len(serie):
+        nom = type_min.name
+        return serie.astype('UInt' + nom[4:] if nom.startswith('uint') else 'Int' + nom[3:])
+    return serie.astype(type_min)
+
+
+def compacter_indicateur(serie):
+    """Indicateur (0 / 1 ou petit comptage) au plus petit entier non signé."""
+    if pd.api.types.is_bool_dtype(serie) or not pd.api.types.is_numeric_dtype(serie):
+        return serie
+    if serie.hasnans:
+        return serie
+    valeurs = serie.to_numpy()
+    if len(valeurs) == 0 or valeurs.min() < 0 or not _valeurs_entieres(valeurs):
+        return serie
+    return serie.astype(np.min_scalar_type(int(valeurs.max())))
+
+
+def normaliser_dataset(dataset, cles=CLES, indicateurs=MESURES):
+    """Nouveau DataFrame aux types compacts et rapport de la mémoire gagnée.
+
+    Les colonnes non reconnues sont reprises telles quelles, sans copie. Un
+    stock sur disque (:class:`~northwind_bi.stockage.StockFait`), déjà à
+    largeur fixe, est retourné tel quel.
+    """
+    if not isinstance(dataset, pd.DataFrame):
+        taille = dataset.taille_mo()
+        return dataset, {'avant_mo': taille, 'apres_mo': taille, 'economie_mo': 0.0, 'conversions': {}}
+    avant = int(dataset.memory_usage(deep=True).sum())
+    colonnes = {}
+    conversions = {}
+    for nom in dataset.columns:
+        serie = dataset[nom]
+        if nom in cles:
+            nouvelle = compacter_cle(serie)
+        elif nom in indicateurs:
+            nouvelle = compacter_indicateur(serie)
+        else:
+            nouvelle = serie
+        if nouvelle.dtype != serie.dtype:
+            conversions[nom] = (str(serie.dtype), str(nouvelle.dtype))
+        colonnes[nom] = nouvelle
+    resultat = pd.DataFrame(colonnes, index=dataset.index, copy=False)
+    apres = int(resultat.memory_usage(deep=True).sum())
+    rapport = {
+        'avant_mo': avant / 2**20,
+        'apres_mo': apres / 2**20,
+        'economie_mo': (avant - apres) / 2**20,
+        'conversions': conversions,
+    }
+    return resultat, rapport
+
+
+def ajouter_indicateurs(clients, total='total_commandes', taux='taux_livraison'):
+    """Ajoute le total de commandes et le taux de livraison (%), en place."""
+    livrees = clients['nbr_commande_livrees']
+    clients[total] = livrees + clients['nbr_commande_non_livrees']
+    clients[taux] = (livrees / clients[total]) * 100
+    return clients
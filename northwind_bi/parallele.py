@@ -0,0 +1,299 @@
+"""Construction du cube d'agrégation sur plusieurs cœurs.
+
+Le fait est découpé en tranches contiguës de lignes (plages de
+``id_seq_fait`` quand le fait est trié, comme en sortie de l'ETL), une par
+tâche d'un pool de processus. Les colonnes utiles sont copiées une fois en
+mémoire partagée ; les processus les lisent sur place, sans sérialisation.
+Deux passages :
+
+1. chaque processus retourne les modalités de chaque dimension sur sa
+   tranche ; leur union donne le codage commun ;
+2. chaque processus code sa tranche et cumule ses cases (sommes des
+   mesures et effectifs) ; seules les cases observées sont retournées.
+
+Les cumuls partiels sont fusionnés par :meth:`CubeCommandes.depuis_cases`.
+Le résultat est le même cube qu'en série, qui reste utilisé pour les petits
+volumes (le démarrage du pool coûte plus que le calcul) et pour les clés
+non numériques.
+
+Le calcul parallèle est désactivé par défaut (``PROCESSUS`` = 1) : il ne
+gagne qu'au-delà d'un seuil propre à la machine (cœurs, débit mémoire),
+que ``python -m benchmarks.parallele`` mesure contre le calcul en série.
+Il s'active avec ``NORTHWIND_BI_PROCESSUS`` et
+``NORTHWIND_BI_SEUIL_PARALLELE`` réglés sur cette mesure. Même activé, le
+pool n'est jamais démarré depuis un script exécuté directement (visuel
+Power BI) quand les processus démarrent par ``spawn`` (Windows, macOS) :
+chacun réexécuterait le script, sans garde ``if __name__ == '__main__'``.
+
+Les mêmes tranches servent au stock de faits sur disque
+(:mod:`northwind_bi.stockage`) : les colonnes y sont des fichiers projetés
+en mémoire, que chaque processus ouvre lui-même.
+"""
+
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.agregation import DIMENSIONS, MESURES, SEUIL_DENSE, CubeCommandes
+
+# Nombre de lignes en dessous duquel le cube est calculé en série (à
+# calibrer sur la machine avec benchmarks.parallele)
+VARIABLE_SEUIL = 'NORTHWIND_BI_SEUIL_PARALLELE'
+SEUIL_PARALLELE = int(float(os.environ.get(VARIABLE_SEUIL, 2_000_000)))
+# Nombre de processus du cube : 1 (série) par défaut, le parallèle est opt-in
+VARIABLE_PROCESSUS = 'NORTHWIND_BI_PROCESSUS'
+PROCESSUS = int(os.environ.get(VARIABLE_PROCESSUS, 1))
+
+
+# ============================================
+# 1. CUMUL D'UNE TRANCHE
+# ============================================
+
+def _ouvrir(colonnes):
+    """Vues numpy des colonnes ``{nom: (genre, source, dtype, n)}``.
+
+    ``genre`` vaut ``'memoire'`` (bloc de mémoire partagée nommé ``source``)
+    ou ``'fichier'`` (fichier projeté en mémoire, en lecture seule).
+    """
+    from multiprocessing.shared_memory import SharedMemory
+
+    blocs, vues = [], {}
+    for nom, (genre, source, dtype, n) in colonnes.items():
+        if genre == 'fichier':
+            vues[nom] = np.memmap(source, dtype=dtype, mode='r', shape=(n,)) if n else np.empty(0, dtype)
+            continue
+        try:
+            memoire = SharedMemory(name=source, track=False)
+        except TypeError:
+            # Python < 3.13 : enregistrement sans effet, le suivi des blocs est
+            # partagé avec le processus parent, qui les libère
+            memoire = SharedMemory(name=source)
+        blocs.append(memoire)
+        vues[nom] = np.ndarray(n, dtype=dtype, buffer=memoire.buf)
+    return blocs, vues
+
+
+def _vides(valeurs, manquant):
+    """Masque des clés vides : NaN, ou valeur sentinelle d'une colonne entière."""
+    if valeurs.dtype.kind == 'f':
+        return np.isnan(valeurs)
+    if manquant is not None:
+        return valeurs == manquant
+    return None
+
+
+def modalites_tranche(vues, dimensions, debut, fin, manquants=None):
+    """Modalités triées de chaque dimension sur les lignes ``[debut, fin[``."""
+    manquants = manquants or {}
+    resultat = []
+    for dim in dimensions:
+        valeurs = np.unique(vues[dim][debut:fin])
+        vides = _vides(valeurs, manquants.get(dim))
+        resultat.append(valeurs if vides is None else valeurs[~vides])
+    return resultat
+
+
+def cases_tranche(vues, dimensions, modalites, debut, fin, manquants=None):
+    """Cases observées des lignes ``[debut, fin[`` : indices, sommes, effectifs."""
+    manquants = manquants or {}
+    forme = tuple(len(m) + 1 for m in modalites)
+    codes = []
+    for dim, uniques in zip(dimensions, modalites):
+        valeurs = vues[dim][debut:fin]
+        if uniques.dtype.kind in 'iu' and len(uniques) and int(uniques[-1]) - int(uniques[0]) + 1 == len(uniques):
+            # Modalités contiguës : code par soustraction, sans recherche
+            code = valeurs.astype(np.intp) - int(uniques[0])
+        else:
+            code = np.searchsorted(uniques, valeurs)
+        vides = _vides(valeurs, manquants.get(dim))
+        if vides is not None:
+            code[vides] = len(uniques)
+        codes.append(code)
+    if codes:
+        plat = np.ravel_multi_index(codes, forme)
+    else:
+        plat = np.zeros(fin - debut, dtype=np.intp)
+
+    taille = int(np.prod(forme, dtype=np.float64))
+    if taille <= SEUIL_DENSE:
+        effectifs = np.bincount(plat, minlength=taille)
+        cases = np.flatnonzero(effectifs)
+        effectifs = effectifs[cases]
+        sommes = {mesure: np.bincount(plat, weights=vues[mesure][debut:fin], minlength=taille)[cases]
+                  for mesure in MESURES}
+    else:
+        cases, inverse, effectifs = np.unique(plat, return_inverse=True, return_counts=True)
+        sommes = {mesure: np.bincount(inverse, weights=vues[mesure][debut:fin], minlength=len(cases))
+                  for mesure in MESURES}
+    return cases, sommes, effectifs
+
+
+def _tache(fonction, colonnes, *args):
+    """Exécutée dans un processus du pool : ouvre les colonnes puis cumule."""
+    blocs, vues = _ouvrir(colonnes)
+    try:
+        return fonction(vues, *args)
+    finally:
+        del vues
+        for memoire in blocs:
+            memoire.close()
+
+
+def _fusionner(parties):
+    """Regroupe des cumuls partiels en un seul (cases uniques)."""
+    cases = np.concatenate([partie[0] for partie in parties])
+    uniques, inverse = np.unique(cases, return_inverse=True)
+    sommes = {mesure: np.bincount(inverse, weights=np.concatenate([p[1][mesure] for p in parties]),
+                                  minlength=len(uniques))
+              for mesure in MESURES}
+    effectifs = np.bincount(inverse, weights=np.concatenate([p[2] for p in parties]),
+                            minlength=len(uniques)).astype('int64')
+    return uniques, sommes, effectifs
+
+
+# ============================================
+# 2. ORCHESTRATION
+# ============================================
+
+def cumuler_tranches(colonnes, dimensions, nb_lignes, processus=1, taille_tranche=None, manquants=None,
+                     modalites=None):
+    """Modalités et cases cumulées de toutes les tranches du fait.
+
+    Avec ``processus`` = 1, les tranches sont traitées l'une après l'autre
+    dans le processus courant ; la mémoire de travail ne dépend alors que
+    de ``taille_tranche``. Des ``modalites`` connues d'avance (triées)
+    évitent le premier passage. Retourne ``(modalites, (cases, sommes, effectifs))``.
+    """
+    nb_tranches = max(processus, -(-nb_lignes // taille_tranche) if taille_tranche else 1, 1)
+    bornes = np.linspace(0, nb_lignes, nb_tranches + 1).astype(int)
+    tranches = list(zip(bornes[:-1], bornes[1:]))
+
+    if processus < 2:
+        blocs, vues = _ouvrir(colonnes)
+        try:
+            if modalites is None:
+                parties = [modalites_tranche(vues, dimensions, debut, fin, manquants) for debut, fin in tranches]
+                modalites = [np.unique(np.concatenate([partie[i] for partie in parties]))
+                             for i in range(len(dimensions))]
+            cumul = None
+            for debut, fin in tranches:
+                partie = cases_tranche(vues, dimensions, modalites, debut, fin, manquants)
+                cumul = partie if cumul is None else _fusionner([cumul, partie])
+            return modalites, cumul
+        finally:
+            del vues
+            for memoire in blocs:
+                memoire.close()
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        if modalites is None:
+            parties = list(pool.map(_tache, *zip(*[
+                (modalites_tranche, colonnes, dimensions, debut, fin, manquants) for debut, fin in tranches])))
+            modalites = [np.unique(np.concatenate([partie[i] for partie in parties]))
+                         for i in range(len(dimensions))]
+        parties = list(pool.map(_tache, *zip(*[
+            (cases_tranche, colonnes, dimensions, modalites, debut, fin, manquants)
+            for debut, fin in tranches])))
+    return modalites, _fusionner(parties)
+
+
+def _colonne_partageable(serie):
+    """Tableau numpy de la colonne, clés vides en NaN (``None`` si non numérique)."""
+    if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'iuf':
+        return serie.to_numpy()
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.to_numpy(dtype='float64', na_value=np.nan)
+    return None
+
+
+def _modalites_typees(uniques, dtype):
+    """Modalités dans le type d'origine de la clé, comme ``pd.factorize``."""
+    if isinstance(dtype, np.dtype):
+        return uniques.astype(dtype, copy=False)
+    return pd.array(uniques, dtype=dtype)
+
+
+def assembler_cube(dimensions, modalites, types_cles, nb_lignes, cumul, mesures_entieres):
+    """:class:`CubeCommandes` à partir du résultat de :func:`cumuler_tranches`."""
+    cases, sommes, effectifs = cumul
+    cellules = {mesure: sommes[mesure].astype('int64') if mesures_entieres[mesure] else sommes[mesure]
+                for mesure in MESURES}
+    return CubeCommandes.depuis_cases(
+        dimensions,
+        {dim: _modalites_typees(m, types_cles[dim]) for dim, m in zip(dimensions, modalites)},
+        nb_lignes, cases, cellules, effectifs,
+    )
+
+
+def pool_autorise():
+    """Vrai si un pool de processus peut démarrer depuis le programme courant.
+
+    Avec ``fork``, les processus héritent du programme en mémoire. Sinon ils
+    réimportent le module ``__main__`` : c'est sans risque pour un module
+    lancé par ``python -m`` (entrée gardée), pas pour un script exécuté
+    directement, comme les visuels Power BI.
+    """
+    if multiprocessing.get_start_method() == 'fork':
+        return True
+    principal = sys.modules.get('__main__')
+    return getattr(principal, '__spec__', None) is not None
+
+
+def cube_commandes(dataset, dimensions=DIMENSIONS, processus=None, seuil=None):
+    """:class:`CubeCommandes` du ``dataset``, calculé en parallèle au-delà de ``seuil`` lignes.
+
+    ``dataset`` peut aussi être un :class:`~northwind_bi.stockage.StockFait`,
+    lu par tranches sans être chargé. Sans ``processus``, :data:`PROCESSUS`
+    (1 : en série) ; sans ``seuil``, :data:`SEUIL_PARALLELE`. Le calcul
+    reste en série si :func:`pool_autorise` est faux.
+    """
+    processus = processus or PROCESSUS
+    if processus > 1 and not pool_autorise():
+        processus = 1
+    seuil = SEUIL_PARALLELE if seuil is None else seuil
+    if hasattr(dataset, 'cube'):
+        return dataset.cube(dimensions, processus=processus if len(dataset) >= seuil else 1)
+    dimensions = tuple(d for d in dimensions if d in dataset.columns)
+    if processus < 2 or len(dataset) < seuil:
+        return CubeCommandes(dataset, dimensions)
+
+    tableaux = {}
+    for nom in dimensions:
+        tableaux[nom] = _colonne_partageable(dataset[nom])
+        if tableaux[nom] is None:
+            return CubeCommandes(dataset, dimensions)
+    for mesure in MESURES:
+        colonne = dataset[mesure]
+        if isinstance(colonne.dtype, np.dtype) and colonne.dtype.kind in 'iuf':
+            tableaux[mesure] = colonne.to_numpy()
+        else:
+            tableaux[mesure] = colonne.to_numpy(dtype='float64', na_value=0.0)
+
+    from multiprocessing.shared_memory import SharedMemory
+
+    n = len(dataset)
+    blocs = []
+    try:
+        colonnes = {}
+        for nom, tableau in tableaux.items():
+            memoire = SharedMemory(create=True, size=max(tableau.nbytes, 1))
+            blocs.append(memoire)
+            np.ndarray(n, dtype=tableau.dtype, buffer=memoire.buf)[:] = tableau
+            colonnes[nom] = ('memoire', memoire.name, tableau.dtype.str, n)
+        del tableaux
+        modalites, cumul = cumuler_tranches(colonnes, dimensions, n, processus)
+    finally:
+        for memoire in blocs:
+            memoire.close()
+            memoire.unlink()
+
+    mesures_entieres = {
+        mesure: pd.api.types.is_integer_dtype(dataset[mesure]) or pd.api.types.is_bool_dtype(dataset[mesure])
+        for mesure in MESURES}
+    return assembler_cube(dimensions, modalites, {dim: dataset[dim].dtype for dim in dimensions},
+                          n, cumul, mesures_entieres)
@@ -0,0 +1,133 @@
+"""Esquisse de quantiles fusionnable (KLL), construite par lots.
+
+Les seuils adaptatifs de la catégorisation sont des percentiles du taux de
+livraison et du volume des clients. Les calculer exactement suppose la
+base clients entière en mémoire. L'esquisse ne retient qu'un échantillon
+pondéré de taille bornée. Elle se construit lot par lot, se fusionne entre
+partitions (processus, tranches, actualisations) et se sérialise avec les
+agrégats (``pickle`` ou :meth:`EsquisseQuantiles.vers_dict`).
+
+Principe (Karnin, Lang, Liberty, 2016) : les valeurs arrivent au niveau 0 ;
+quand un niveau dépasse sa capacité, il est trié et une valeur sur deux
+(rang pair ou impair au hasard) monte au niveau suivant, où elle pèse le
+double. Avec ``k`` = 400, l'erreur sur le rang d'un quantile reste sous
+environ 1 % (3,3 / ``k``) avec une probabilité de 99 %. Tant que rien n'a
+été compacté, les quantiles sont exacts, avec la même interpolation
+linéaire que ``pandas.Series.quantile``.
+"""
+
+import math
+
+import numpy as np
+
+K_DEFAUT = 400
+# Rapport de capacité entre deux niveaux successifs
+DECROISSANCE = 2 / 3
+
+
+class EsquisseQuantiles:
+    """Esquisse KLL des quantiles d'une variable numérique."""
+
+    def __init__(self, k=K_DEFAUT, graine=0):
+        self.k = k
+        self.graine = graine
+        self.niveaux = [np.empty(0)]
+        self.n = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self._rng = np.random.default_rng(graine)
+
+    def __len__(self):
+        return self.n
+
+    def _capacite(self, niveau):
+        hauteur = len(self.niveaux) - 1 - niveau
+        return max(2, math.ceil(self.k * DECROISSANCE ** hauteur))
+
+    def ajouter(self, valeurs):
+        """Ajoute un lot de valeurs (les valeurs manquantes sont ignorées)."""
+        valeurs = np.asarray(valeurs, dtype='float64').ravel()
+        valeurs = valeurs[~np.isnan(valeurs)]
+        if not len(valeurs):
+            return self
+        self.n += len(valeurs)
+        self.minimum = min(self.minimum, valeurs.min())
+        self.maximum = max(self.maximum, valeurs.max())
+        self.niveaux[0] = np.concatenate((self.niveaux[0], valeurs))
+        self._compacter()
+        return self
+
+    def fusionner(self, autre):
+        """Ajoute à l'esquisse le contenu d'une autre (même ``k`` conseillé)."""
+        if not autre.n:
+            return self
+        while len(self.niveaux) < len(autre.niveaux):
+            self.niveaux.append(np.empty(0))
+        for h, valeurs in enumerate(autre.niveaux):
+            self.niveaux[h] = np.concatenate((self.niveaux[h], valeurs))
+        self.n += autre.n
+        self.minimum = min(self.minimum, autre.minimum)
+        self.maximum = max(self.maximum, autre.maximum)
+        self._compacter()
+        return self
+
+    def _compacter(self):
+        h = 0
+        while h < len(self.niveaux):
+            niveau = self.niveaux[h]
+            if len(niveau) <= self._capacite(h):
+                h += 1
+                continue
+            if h + 1 == len(self.niveaux):
+                self.niveaux.append(np.empty(0))
+            niveau = np.sort(niveau)
+            # Nombre pair de valeurs compactées ; la dernière reste si impair
+            pair = len(niveau) - len(niveau) % 2
+            retenues = niveau[self._rng.integers(2):pair:2]
+            self.niveaux[h] = niveau[pair:]
+            self.niveaux[h + 1] = np.concatenate((self.niveaux[h + 1], retenues))
+            # Les capacités dépendent du nombre de niveaux : on reprend au début
+            h = 0
+
+    def exacte(self):
+        """Vrai tant qu'aucune valeur n'a été compactée."""
+        return len(self.niveaux) == 1 or not any(len(v) for v in self.niveaux[1:])
+
+    def quantiles(self, q):
+        """Quantiles approchés pour les probabilités ``q`` (``NaN`` si vide)."""
+        q = np.asarray(q, dtype='float64')
+        if not self.n:
+            return np.full(q.shape, np.nan)
+        if self.exacte():
+            return np.quantile(self.niveaux[0], q)
+        valeurs = np.concatenate(self.niveaux)
+        poids = np.concatenate([np.full(len(v), 2.0 ** h) for h, v in enumerate(self.niveaux)])
+        ordre = np.argsort(valeurs, kind='stable')
+        valeurs, cumul = valeurs[ordre], np.cumsum(poids[ordre])
+        position = np.searchsorted(cumul, q * cumul[-1], side='left').clip(max=len(valeurs) - 1)
+        resultat = valeurs[position]
+        resultat = np.where(q <= 0, self.minimum, np.where(q >= 1, self.maximum, resultat))
+        return resultat
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def vers_dict(self):
+        """État sérialisable en JSON."""
+        return {
+            'k': self.k,
+            'graine': self.graine,
+            'n': self.n,
+            'minimum': None if not self.n else float(self.minimum),
+            'maximum': None if not self.n else float(self.maximum),
+            'niveaux': [v.tolist() for v in self.niveaux],
+        }
+
+    @classmethod
+    def depuis_dict(cls, etat):
+        esquisse = cls(etat['k'], etat.get('graine', 0))
+        esquisse.niveaux = [np.asarray(v, dtype='float64') for v in etat['niveaux']] or [np.empty(0)]
+        esquisse.n = etat['n']
+        if esquisse.n:
+            esquisse.minimum, esquisse.maximum = etat['minimum'], etat['maximum']
+        return esquisse
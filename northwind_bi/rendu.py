@@ -0,0 +1,108 @@
+"""Primitives de rendu vectorisées pour les classements de grande taille.
+
+Les visuels dessinaient un artiste par entité (une barre, un texte, un
+nuage par catégorie), ce qui convient à un top 10 mais pas à un top 500.
+Chaque primitive ne fait ici qu'un seul appel : les barres forment une
+``PolyCollection`` construite à partir d'un tableau de sommets, les
+couleurs sont associées par tableau, les nuages par catégorie sont un seul
+``scatter``. Les étiquettes restent des textes individuels, limitées aux
+plus grandes valeurs au-delà de ``MAX_ETIQUETTES`` (illisibles sinon).
+
+Les grilles de taille fixe reçoivent des marges constantes
+(``grille``) au lieu d'un ``tight_layout`` recalculé à chaque rendu.
+"""
+
+import numpy as np
+import pandas as pd
+
+MAX_ETIQUETTES = 30
+MAX_GRADUATIONS = 40
+
+# Marges des grilles fixes, en fraction de la figure
+MARGES = {'left': 0.07, 'right': 0.97, 'bottom': 0.14, 'top': 0.9,
+          'wspace': 0.25, 'hspace': 0.45}
+
+
+def grille(plt, lignes, colonnes, figsize, **marges):
+    """Figure et axes d'une grille fixe, sans ``tight_layout``."""
+    fig, axes = plt.subplots(lignes, colonnes, figsize=figsize, squeeze=False)
+    fig.subplots_adjust(**{**MARGES, **marges})
+    return fig, axes
+
+
+def couleurs_categories(categories, palette, defaut='#95a5a6'):
+    """Couleur de chaque élément d'après sa catégorie (tableau d'objets)."""
+    return pd.Series(categories).map(palette).fillna(defaut).to_numpy(dtype=object)
+
+
+def barres(ax, valeurs, couleurs=None, bas=None, largeur=0.8, decalage=0.0,
+           label=None, **kwargs):
+    """Barres verticales en une seule ``PolyCollection`` (positions 0..n-1)."""
+    from matplotlib.collections import PolyCollection
+
+    hauts = np.asarray(valeurs, dtype=float)
+    n = len(hauts)
+    bas = np.zeros(n) if bas is None else np.asarray(bas, dtype=float)
+    gauche = np.arange(n) + decalage - largeur / 2
+    droite = gauche + largeur
+    sommets = np.empty((n, 4, 2))
+    sommets[:, :, 0] = np.column_stack([gauche, gauche, droite, droite])
+    sommets[:, :, 1] = np.column_stack([bas, bas + hauts, bas + hauts, bas])
+
+    if couleurs is None:
+        couleurs = kwargs.pop('color', 'C0')
+    collection = PolyCollection(sommets, facecolors=couleurs,
+                                edgecolors=kwargs.pop('edgecolor', 'none'),
+                                label=label, **kwargs)
+    # Même ancrage de l'axe vertical que ax.bar
+    collection.sticky_edges.y.append(0)
+    ax.add_collection(collection, autolim=True)
+    ax.autoscale_view()
+    return collection
+
+
+def etiquettes(ax, x, y, textes, decalage=None, max_etiquettes=MAX_ETIQUETTES, **kwargs):
+    """Textes aux points ``(x, y)`` ; seules les ``max_etiquettes`` plus grandes valeurs de ``y``.
+
+    Avec ``decalage`` (en points), les textes sont des annotations décalées
+    du point ; sinon ils sont posés aux coordonnées de données.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    textes = np.asarray(textes, dtype=object)
+    if max_etiquettes is not None and len(y) > max_etiquettes:
+        gardes = np.sort(np.argpartition(-y, max_etiquettes - 1)[:max_etiquettes])
+        x, y, textes = x[gardes], y[gardes], textes[gardes]
+    if decalage is None:
+        return [ax.text(xi, yi, texte, **kwargs) for xi, yi, texte in zip(x, y, textes)]
+    return [ax.annotate(texte, (xi, yi), xytext=decalage, textcoords='offset points', **kwargs)
+            for xi, yi, texte in zip(x, y, textes)]
+
+
+def graduations(ax, libelles, rotation=45, max_graduations=MAX_GRADUATIONS, **kwargs):
+    """Graduations 0..n-1 de l'axe x, espacées pour rester lisibles."""
+    libelles = list(libelles)
+    pas = max(1, -(-len(libelles) // max_graduations))
+    positions = range(0, len(libelles), pas)
+    ax.set_xticks(positions)
+    ax.set_xticklabels([libelles[i] for i in positions], rotation=rotation, **kwargs)
+
+
+def nuage_categories(ax, x, y, categories, palette, legende=True, **kwargs):
+    """Nuage de points coloré par catégorie, en un seul ``scatter``.
+
+    La légende reprend les catégories dans leur ordre d'apparition.
+    """
+    from matplotlib.lines import Line2D
+
+    categories = pd.Series(categories).reset_index(drop=True)
+    couleurs = couleurs_categories(categories, palette)
+    nuage = ax.scatter(x, y, c=list(couleurs), **kwargs)
+    if legende:
+        presentes = pd.unique(categories.dropna())
+        poignees = [Line2D([], [], linestyle='none', marker='o', markersize=10,
+                           markerfacecolor=palette.get(cat), markeredgecolor='black',
+                           alpha=kwargs.get('alpha'), label=cat)
+                    for cat in presentes]
+        ax.legend(handles=poignees, loc='best')
+    return nuage
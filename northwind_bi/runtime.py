@@ -0,0 +1,78 @@
+"""Socle de démarrage rapide des visuels Python.
+
+Power BI lance un nouvel interpréteur pour chaque visuel : le coût des
+imports et de la configuration graphique est payé à chaque exécution.
+Ce module ne charge ``matplotlib.pyplot`` qu'à la demande et applique un
+style précalculé (simple mise à jour de ``rcParams``) au lieu de
+``plt.style.use``, qui relit les feuilles de style sur disque, et de
+``seaborn``, dont l'import coûte à lui seul plusieurs centaines de
+millisecondes.
+"""
+
+# Feuille 'seaborn-v0_8' de matplotlib, figée
+STYLE_SEABORN = {
+    'axes.axisbelow': True,
+    'axes.edgecolor': 'white',
+    'axes.facecolor': '#EAEAF2',
+    'axes.grid': True,
+    'axes.labelcolor': '.15',
+    'axes.labelsize': 11.0,
+    'axes.linewidth': 0.0,
+    'axes.titlesize': 12.0,
+    'figure.facecolor': 'white',
+    'figure.figsize': [8.0, 5.5],
+    'font.family': ['sans-serif'],
+    'font.sans-serif': ['Arial', 'Liberation Sans', 'DejaVu Sans', 'Bitstream Vera Sans', 'sans-serif'],
+    'grid.color': 'white',
+    'grid.linestyle': '-',
+    'grid.linewidth': 1.0,
+    'image.cmap': 'Greys',
+    'legend.fontsize': 10.0,
+    'legend.frameon': False,
+    'legend.numpoints': 1,
+    'legend.scatterpoints': 1,
+    'lines.linewidth': 1.75,
+    'lines.markeredgewidth': 0.0,
+    'lines.markersize': 7.0,
+    'lines.solid_capstyle': 'round',
+    'patch.facecolor': '#4C72B0',
+    'patch.linewidth': 0.3,
+    'text.color': '.15',
+    'xtick.color': '.15',
+    'xtick.direction': 'out',
+    'xtick.labelsize': 10.0,
+    'xtick.major.pad': 7.0,
+    'xtick.major.size': 0.0,
+    'xtick.major.width': 1.0,
+    'xtick.minor.size': 0.0,
+    'xtick.minor.width': 0.5,
+    'ytick.color': '.15',
+    'ytick.direction': 'out',
+    'ytick.labelsize': 10.0,
+    'ytick.major.pad': 7.0,
+    'ytick.major.size': 0.0,
+    'ytick.major.width': 1.0,
+    'ytick.minor.size': 0.0,
+    'ytick.minor.width': 0.5,
+}
+
+# sns.color_palette("husl"), précalculée
+PALETTE_HUSL = ['#f77189', '#bb9832', '#50b131', '#36ada4', '#3ba3ec', '#e866f4']
+
+
+def pyplot(style=None):
+    """Importe ``matplotlib.pyplot`` et applique éventuellement un style.
+
+    ``style='seaborn'`` équivaut à ``plt.style.use('seaborn-v0_8')`` suivi
+    de ``sns.set_palette("husl")``, sans importer seaborn.
+    """
+    import matplotlib.pyplot as plt
+
+    if style == 'seaborn':
+        from cycler import cycler
+
+        plt.rcParams.update(STYLE_SEABORN)
+        plt.rcParams['axes.prop_cycle'] = cycler(color=PALETTE_HUSL)
+    elif style is not None:
+        raise ValueError(f"Style inconnu : {style}")
+    return plt
@@ -0,0 +1,507 @@
+"""Service local d'analyse : le modèle en étoile chargé une fois, agrégats chauds.
+
+Chaque visuel Python recharge et réagrège son ``dataset`` à froid. Le
+service, lancé à part sur ``127.0.0.1``, charge TF_COMMANDE (stock sur
+disque, base SQL ou CSV) et, s'il y a lieu, les dimensions, une seule
+fois ; les cubes (:class:`~northwind_bi.agregats.VueAgregats`) et les
+réponses déjà calculées restent en mémoire jusqu'au prochain
+rechargement. Il répond en JSON sur HTTP, un thread par requête :
+
+- ``GET /kpi?fenetre=12`` : totaux, taux de livraison et tendance ;
+- ``GET /top?mode=global&k=10`` : top K clients (modes de :mod:`northwind_bi.classement`) ;
+- ``GET /segments`` : catégories adaptatives des clients et leurs seuils ;
+- ``GET /serie?fenetre=3`` : série par ``id_temps`` et taux glissants ;
+- ``GET /png/<dashboard>?figure=1`` : figure d'un dashboard de
+  :data:`~northwind_bi.batch.DASHBOARDS`, rendue une fois puis servie telle quelle ;
+- ``GET /metriques`` : latences par route (moyenne, p50, p95, max) ;
+- ``POST /recharger`` : recharge la source, par exemple en fin d'ETL.
+
+Le service répond pour tout le modèle : un visuel filtré par des segments
+Power BI garde son calcul local. Un visuel non filtré devient un client
+léger ::
+
+    from northwind_bi.service import afficher_dashboard
+    afficher_dashboard('kpi')
+
+Exemple ::
+
+    python -m northwind_bi.service stock_fait --dim-client dim_client.csv --port 8765
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import runpy
+import threading
+import time
+import warnings
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HOTE = '127.0.0.1'
+PORT = 8765
+# Adresse du service pour les clients (scripts, ETL)
+VARIABLE = 'NORTHWIND_BI_SERVICE'
+# Durées conservées par route pour les métriques
+HISTORIQUE_LATENCES = 1000
+FENETRE_TENDANCE = 12
+
+# pyplot est global au processus (figures ouvertes, plt.show) : un seul
+# rendu à la fois, tous états confondus (rechargement avec --prerendu compris)
+_VERROU_RENDU = threading.Lock()
+
+
+def adresse_par_defaut():
+    return os.environ.get(VARIABLE, f'http://{HOTE}:{PORT}')
+
+
+def charger_source(source=None):
+    """Fait à servir : dossier de stock, URL de base (``sqlite:///`` ou ODBC) ou CSV.
+
+    Sans ``source``, celle désignée par ``NORTHWIND_BI_STOCK`` ou
+    ``NORTHWIND_BI_SQL``, comme pour les visuels.
+    """
+    from northwind_bi.normalisation import normaliser_dataset
+    from northwind_bi.sql import PREFIXE_SQLITE, VARIABLE as VARIABLE_SQL, SourceSQL
+    from northwind_bi.stockage import VARIABLE as VARIABLE_STOCK, StockFait
+
+    source = source or os.environ.get(VARIABLE_STOCK) or os.environ.get(VARIABLE_SQL)
+    if not source:
+        raise NameError(f"Pas de source : la désigner, ou définir {VARIABLE_STOCK} ou {VARIABLE_SQL}")
+    if Path(source).is_dir():
+        return StockFait(source)
+    if source.startswith(PREFIXE_SQLITE) or '=' in source:
+        # Connexion partagée par les threads des requêtes
+        return SourceSQL.depuis_url(source, partageable=True)
+    fait, _ = normaliser_dataset(pd.read_csv(source))
+    return fait
+
+
+def _enregistrements(table):
+    """Lignes d'un DataFrame pour JSON : index en colonnes, manquants en ``None``."""
+    table = table.reset_index() if table.index.names != [None] else table
+    table = table.astype(object)
+    return table.where(table.notna(), None).to_dict('records')
+
+
+def _json(valeur):
+    if isinstance(valeur, np.integer):
+        return int(valeur)
+    if isinstance(valeur, np.floating):
+        return None if np.isnan(valeur) else float(valeur)
+    if isinstance(valeur, pd.Timestamp):
+        return valeur.isoformat()
+    return str(valeur)
+
+
+def _nombre(valeur):
+    valeur = float(valeur)
+    return None if np.isnan(valeur) else valeur
+
+
+# ============================================
+# 1. ÉTAT CHARGÉ
+# ============================================
+
+class EtatService:
+    """Fait, dimensions et résultats d'un chargement.
+
+    Les réponses sont mémorisées par requête : le fait ne change qu'au
+    rechargement, qui construit un nouvel état.
+    """
+
+    def __init__(self, donnees, dim_client=None, dim_temps=None):
+        from northwind_bi.agregats import VueAgregats
+
+        self.donnees = donnees
+        self.dim_client = dim_client
+        self.dim_temps = dim_temps
+        self.vue = VueAgregats(donnees)
+        self.lignes = len(donnees)
+        self.charge_le = time.time()
+        self._resultats = {}
+        # Un verrou par réponse : une requête à froid n'attend que les
+        # requêtes identiques, jamais un autre calcul (ni un rendu)
+        self._verrous = {}
+        self._verrou = threading.Lock()
+
+    def _memoriser(self, cle, fonction):
+        resultat = self._resultats.get(cle)
+        if resultat is None:
+            with self._verrou:
+                verrou = self._verrous.setdefault(cle, threading.Lock())
+            # Chaque réponse calculée une fois, même sous requêtes simultanées
+            with verrou:
+                resultat = self._resultats.get(cle)
+                if resultat is None:
+                    resultat = fonction()
+                    self._resultats[cle] = resultat
+        return resultat
+
+    def prechauffer(self, dashboards=()):
+        """Calcule d'avance les réponses par défaut (et les rendus de ``dashboards``)."""
+        self.kpi()
+        self.top()
+        self.segments()
+        if 'id_temps' in self.vue:
+            self.serie()
+        for dashboard in dashboards:
+            self.png(dashboard)
+
+    def kpi(self, fenetre=FENETRE_TENDANCE):
+        def calculer():
+            from northwind_bi.tendance import SerieLivraison
+
+            totaux = self.vue.totaux()
+            livrees = int(totaux['nbr_commande_livrees'])
+            non_livrees = int(totaux['nbr_commande_non_livrees'])
+            total = livrees + non_livrees
+            tendance = "Stable"
+            if 'id_temps' in self.vue:
+                tendance = SerieLivraison.depuis_cube(self.vue.cube(('id_temps',))).tendance(fenetre)
+            return {
+                'total_livrees': livrees,
+                'total_non_livrees': non_livrees,
+                'total_commandes': total,
+                'taux_livraison': livrees / total * 100 if total else 0,
+                'tendance': tendance,
+            }
+        return self._memoriser(('kpi', fenetre), calculer)
+
+    def top(self, mode='global', k=10):
+        def calculer():
+            from northwind_bi.classement import MODES_CLASSEMENT, clients_par_mode, top_k_par_groupe
+            from northwind_bi.normalisation import ajouter_indicateurs
+
+            if mode not in MODES_CLASSEMENT:
+                raise ValueError(f"Mode de classement inconnu : {mode!r} "
+                                 f"(attendu : {', '.join(MODES_CLASSEMENT)})")
+            groupe = MODES_CLASSEMENT[mode]
+            dimensions = ('id_seqClient',) if groupe in (None, 'categorie') else (groupe, 'id_seqClient')
+            clients, groupe = clients_par_mode(self.vue.cube(dimensions), mode)
+            ajouter_indicateurs(clients, total='total', taux='taux')
+            top = top_k_par_groupe(clients, groupe, 'total', k)
+            lignes = top.reset_index()
+            if self.dim_client is not None:
+                lignes = lignes.merge(self.dim_client[['id_seqClient', 'CompanyName']],
+                                      on='id_seqClient', how='left')
+            return {
+                'mode': mode,
+                'nb_clients': int(clients.index.get_level_values('id_seqClient').nunique()),
+                'lignes': _enregistrements(lignes),
+            }
+        return self._memoriser(('top', mode, k), calculer)
+
+    def segments(self):
+        def calculer():
+            from northwind_bi.categorisation import categoriser_clients_adaptative, seuils_adaptatifs
+            from northwind_bi.normalisation import ajouter_indicateurs
+
+            clients = ajouter_indicateurs(self.vue.agreger('id_seqClient'))
+            seuils = seuils_adaptatifs(clients)
+            clients['categorie'] = categoriser_clients_adaptative(clients, seuils)
+            par_categorie = clients.groupby('categorie', observed=True).agg(
+                clients=('total_commandes', 'size'),
+                commandes=('total_commandes', 'sum'),
+                livrees=('nbr_commande_livrees', 'sum'),
+            )
+            par_categorie['taux_livraison'] = par_categorie['livrees'] / par_categorie['commandes'] * 100
+            return {
+                'seuils': {nom: _nombre(valeur) for nom, valeur in seuils.items()},
+                'categories': _enregistrements(par_categorie),
+            }
+        return self._memoriser(('segments',), calculer)
+
+    def serie(self, fenetre=3):
+        def calculer():
+            from northwind_bi.tendance import SerieLivraison
+
+            par_temps = self.vue.agreger('id_temps')
+            serie = SerieLivraison(par_temps)
+            lignes = pd.DataFrame({
+                'id_temps': serie.periodes,
+                'livrees': par_temps['nbr_commande_livrees'].to_numpy(),
+                'non_livrees': par_temps['nbr_commande_non_livrees'].to_numpy(),
+                'taux': serie.taux_mensuels,
+                'taux_glissant': serie.taux_glissants(fenetre),
+            })
+            if self.dim_temps is not None:
+                lignes = lignes.merge(self.dim_temps[['id_temps', 'mois_annee']], on='id_temps', how='left')
+            return {'fenetre': fenetre, 'tendance': serie.tendance(FENETRE_TENDANCE),
+                    'lignes': _enregistrements(lignes)}
+        return self._memoriser(('serie', fenetre), calculer)
+
+    def png(self, dashboard, figure=1):
+        """Figures PNG du dashboard, rendu une fois par chargement."""
+        from northwind_bi.batch import DASHBOARDS, DOSSIER_SCRIPTS
+
+        if dashboard not in DASHBOARDS:
+            raise KeyError(f"Dashboard inconnu : {dashboard} (attendu : {', '.join(DASHBOARDS)})")
+
+        def rendre():
+            import matplotlib.pyplot as plt
+
+            images = []
+
+            def enregistrer(*args, **kwargs):
+                for numero in plt.get_fignums():
+                    tampon = io.BytesIO()
+                    plt.figure(numero).savefig(tampon, format='png')
+                    images.append(tampon.getvalue())
+                    plt.close(numero)
+
+            with _VERROU_RENDU:
+                show = plt.show
+                plt.show = enregistrer
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        runpy.run_path(str(DOSSIER_SCRIPTS / DASHBOARDS[dashboard]),
+                                       init_globals={'dataset': self.donnees})
+                finally:
+                    plt.show = show
+                    plt.close('all')
+            return images
+
+        images = self._memoriser(('png', dashboard), rendre)
+        if not 1 <= figure <= len(images):
+            raise KeyError(f"Figure {figure} absente du dashboard {dashboard} ({len(images)} figures)")
+        return images[figure - 1]
+
+
+# ============================================
+# 2. MÉTRIQUES
+# ============================================
+
+class Latences:
+    """Durées des dernières requêtes de chaque route, en millisecondes."""
+
+    def __init__(self, historique=HISTORIQUE_LATENCES):
+        self.historique = historique
+        self._durees = collections.defaultdict(lambda: collections.deque(maxlen=self.historique))
+        self._nombres = collections.Counter()
+        self._verrou = threading.Lock()
+
+    def ajouter(self, route, duree_ms):
+        with self._verrou:
+            self._durees[route].append(duree_ms)
+            self._nombres[route] += 1
+
+    def bilan(self):
+        with self._verrou:
+            durees = {route: np.array(valeurs) for route, valeurs in self._durees.items()}
+            nombres = dict(self._nombres)
+        return {
+            route: {
+                'requetes': nombres[route],
+                'moyenne_ms': float(valeurs.mean()),
+                'p50_ms': float(np.percentile(valeurs, 50)),
+                'p95_ms': float(np.percentile(valeurs, 95)),
+                'max_ms': float(valeurs.max()),
+            }
+            for route, valeurs in sorted(durees.items())
+        }
+
+
+# ============================================
+# 3. SERVEUR HTTP
+# ============================================
+
+class ServiceAnalyse(ThreadingHTTPServer):
+    """Serveur HTTP local : un thread par requête, état remplacé d'un bloc au rechargement."""
+
+    daemon_threads = True
+
+    def __init__(self, charger, adresse=(HOTE, PORT), prerendu=()):
+        self.charger = charger
+        self.prerendu = tuple(prerendu)
+        self.latences = Latences()
+        self.etat = None
+        self.duree_chargement = None
+        self._verrou_chargement = threading.Lock()
+        self.recharger()
+        super().__init__(adresse, GestionnaireRequetes)
+
+    def recharger(self):
+        """Charge un nouvel état ; les requêtes en cours finissent sur l'ancien."""
+        with self._verrou_chargement:
+            debut = time.perf_counter()
+            etat = self.charger()
+            etat.prechauffer(self.prerendu)
+            self.etat = etat
+            self.duree_chargement = time.perf_counter() - debut
+        return {'lignes': etat.lignes, 'duree_s': self.duree_chargement}
+
+
+class GestionnaireRequetes(BaseHTTPRequestHandler):
+    server_version = 'NorthwindBI'
+
+    def log_message(self, format, *args):
+        # Les latences sont suivies par /metriques
+        pass
+
+    def _repondre(self, statut, corps, type_contenu='application/json'):
+        if type_contenu == 'application/json':
+            corps = json.dumps(corps, default=_json, ensure_ascii=False).encode('utf-8')
+        self.send_response(statut)
+        self.send_header('Content-Type', type_contenu)
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _traiter(self, methode):
+        debut = time.perf_counter()
+        url = urllib.parse.urlsplit(self.path)
+        parametres = {cle: valeurs[-1] for cle, valeurs in urllib.parse.parse_qs(url.query).items()}
+        morceaux = [morceau for morceau in url.path.split('/') if morceau]
+        route = '/' + (morceaux[0] if morceaux else '')
+        etat = self.server.etat
+        try:
+            if methode == 'POST' and route == '/recharger':
+                self._repondre(200, self.server.recharger())
+            elif methode != 'GET':
+                self._repondre(405, {'erreur': f"Méthode non permise : {methode} {route}"})
+            elif route == '/kpi':
+                self._repondre(200, etat.kpi(int(parametres.get('fenetre', FENETRE_TENDANCE))))
+            elif route == '/top':
+                self._repondre(200, etat.top(parametres.get('mode', 'global'), int(parametres.get('k', 10))))
+            elif route == '/segments':
+                self._repondre(200, etat.segments())
+            elif route == '/serie':
+                self._repondre(200, etat.serie(int(parametres.get('fenetre', 3))))
+            elif route == '/png' and len(morceaux) == 2:
+                route = f'/png/{morceaux[1]}'
+                self._repondre(200, etat.png(morceaux[1], int(parametres.get('figure', 1))), 'image/png')
+            elif route == '/metriques':
+                self._repondre(200, {'lignes': etat.lignes, 'charge_le': etat.charge_le,
+                                     'duree_chargement_s': self.server.duree_chargement,
+                                     'routes': self.server.latences.bilan()})
+            elif route == '/sante':
+                self._repondre(200, {'statut': 'ok', 'lignes': etat.lignes})
+            else:
+                self._repondre(404, {'erreur': f"Route inconnue : {url.path}"})
+        except (KeyError, ValueError) as erreur:
+            self._repondre(400, {'erreur': str(erreur)})
+        except Exception as erreur:
+            self._repondre(500, {'erreur': repr(erreur)})
+        finally:
+            self.server.latences.ajouter(route, (time.perf_counter() - debut) * 1000)
+
+    def do_GET(self):
+        self._traiter('GET')
+
+    def do_POST(self):
+        self._traiter('POST')
+
+
+# ============================================
+# 4. CLIENT
+# ============================================
+
+class ClientService:
+    """Accès au service depuis un visuel ou l'ETL."""
+
+    def __init__(self, adresse=None, delai=5.0):
+        self.adresse = (adresse or adresse_par_defaut()).rstrip('/')
+        self.delai = delai
+
+    def _appeler(self, chemin, methode='GET', **parametres):
+        url = f'{self.adresse}{chemin}'
+        if parametres:
+            url += '?' + urllib.parse.urlencode(parametres)
+        requete = urllib.request.Request(url, method=methode)
+        with urllib.request.urlopen(requete, timeout=self.delai) as reponse:
+            corps = reponse.read()
+            if reponse.headers.get_content_type() == 'application/json':
+                return json.loads(corps)
+            return corps
+
+    def kpi(self, fenetre=FENETRE_TENDANCE):
+        return self._appeler('/kpi', fenetre=fenetre)
+
+    def top(self, mode='global', k=10):
+        return self._appeler('/top', mode=mode, k=k)
+
+    def segments(self):
+        return self._appeler('/segments')
+
+    def serie(self, fenetre=3):
+        return self._appeler('/serie', fenetre=fenetre)
+
+    def png(self, dashboard, figure=1):
+        return self._appeler(f'/png/{dashboard}', figure=figure)
+
+    def metriques(self):
+        return self._appeler('/metriques')
+
+    def recharger(self):
+        return self._appeler('/recharger', methode='POST')
+
+
+def afficher_dashboard(dashboard, figure=1, adresse=None):
+    """Visuel client léger : affiche la figure rendue par le service."""
+    from northwind_bi.runtime import pyplot
+
+    plt = pyplot()
+    image = plt.imread(io.BytesIO(ClientService(adresse).png(dashboard, figure)), format='png')
+    hauteur, largeur = image.shape[:2]
+    fig = plt.figure(figsize=(largeur / 100, hauteur / 100), dpi=100)
+    fig.figimage(image)
+    plt.show()
+
+
+def notifier_rechargement(adresse=None):
+    """Demande au service de recharger le modèle ; ``None`` s'il ne répond pas."""
+    try:
+        return ClientService(adresse).recharger()
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def main(argv=None):
+    from northwind_bi.batch import DASHBOARDS
+
+    parser = argparse.ArgumentParser(description="Service local d'analyse du modèle Northwind.")
+    parser.add_argument('source', nargs='?', default=None,
+                        help="Stock de faits, base (sqlite:///chemin ou ODBC) ou CSV de TF_COMMANDE")
+    parser.add_argument('--dim-client', help="DimClient au format CSV (noms des clients)")
+    parser.add_argument('--dim-temps', help="Dim_Temps au format CSV (libellés mois_annee)")
+    parser.add_argument('--hote', default=HOTE)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--prerendu', nargs='*', choices=sorted(DASHBOARDS), default=[],
+                        help="Dashboards rendus dès le chargement")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    # Les emojis des tableaux n'existent pas dans la police par défaut
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+
+    def charger():
+        return EtatService(
+            charger_source(args.source),
+            pd.read_csv(args.dim_client) if args.dim_client else None,
+            pd.read_csv(args.dim_temps) if args.dim_temps else None,
+        )
+
+    serveur = ServiceAnalyse(charger, (args.hote, args.port), args.prerendu)
+    print(f"✅ {serveur.etat.lignes} lignes chargées en {serveur.duree_chargement:.2f}s")
+    print(f"🌐 Service sur http://{args.hote}:{serveur.server_port}")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+"""Agrégations calculées par la base relationnelle (SQL Server, SQLite).
+
+Quand le fait ``TF_COMMANDE`` est dans une base, le tirer en entier pour le
+réduire ensuite à dix barres coûte surtout des transferts. Une
+:class:`Requete` décrit ce que les visuels demandent : les regroupements,
+les filtres, les sommes des mesures, le total et le taux de livraison, et
+un top N (éventuellement par groupe). :func:`compiler` la traduit en un
+seul ``SELECT ... GROUP BY``, le top N passant par ``ROW_NUMBER()``. La base
+ne retourne alors que les lignes agrégées.
+
+:class:`SourceSQL` s'utilise à la place du ``dataset``. Son cube
+(:meth:`SourceSQL.cube`) est lui aussi agrégé par la base, sur les seules
+dimensions demandées, et lu dans le plus petit agrégat matérialisé qui
+les couvre (tables ``AGG_COMMANDE_<GRAIN>``, :mod:`northwind_bi.agregats`)
+quand la base en a. :func:`executer` retombe sur le calcul Python (cube
+et :func:`~northwind_bi.classement.top_k_par_groupe`) pour un DataFrame, un
+stock sur disque ou une requête refusée par la base. Les résultats sont les
+mêmes : clés vides écartées des regroupements, ex æquo départagés par
+clé croissante.
+
+Les visuels lisent la base désignée par ``NORTHWIND_BI_SQL`` ::
+
+    NORTHWIND_BI_SQL=sqlite:///northwind.db python ScriptPythonKPI.py
+    NORTHWIND_BI_SQL="DRIVER={ODBC Driver 18 for SQL Server};SERVER=...;DATABASE=DW_Northwind;Trusted_Connection=yes"
+
+SQLite (module ``sqlite3``) sert de base locale de test. SQL Server passe par
+``pyodbc``, importé seulement si besoin.
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.agregation import DIMENSIONS, MESURES, CubeCommandes
+from northwind_bi.agregats import EFFECTIF, GRAINS, PREFIXE_TABLE, choisir_grain, table_agregat
+
+VARIABLE = 'NORTHWIND_BI_SQL'
+VARIABLE_TABLE = 'NORTHWIND_BI_SQL_TABLE'
+TABLE_FAIT = 'TF_COMMANDE'
+PREFIXE_SQLITE = 'sqlite:///'
+DIALECTES = ('sqlite', 'mssql')
+
+
+# ============================================
+# 1. DESCRIPTION ET COMPILATION
+# ============================================
+
+class Requete:
+    """Agrégat demandé par un visuel.
+
+    - ``dimensions`` : clés de regroupement (aucune : totaux) ;
+    - ``filtres`` : ``{colonne: valeurs}``, lignes dont la colonne est dans
+      les valeurs (segments Power BI, tranches du rendu en lot) ;
+    - ``taux`` : ajoute ``total`` et ``taux`` (% de commandes livrées) ;
+    - ``top`` : garde les ``top`` premières lignes selon ``selon``
+      (décroissant), dans chaque groupe ``par`` s'il est donné, avec une
+      colonne ``rang``.
+    """
+
+    def __init__(self, dimensions=(), filtres=None, taux=False, top=None, par=None, selon='total'):
+        self.dimensions = (dimensions,) if isinstance(dimensions, str) else tuple(dimensions)
+        self.filtres = {colonne: list(valeurs) for colonne, valeurs in (filtres or {}).items()}
+        self.taux = taux or (top is not None and selon in ('total', 'taux'))
+        self.top = top
+        self.par = par
+        self.selon = selon
+        if par is not None and par not in self.dimensions:
+            raise ValueError(f"Le groupe du classement doit être une dimension : {par}")
+        if top is not None and selon not in MESURES + ('total', 'taux'):
+            raise ValueError(f"Colonne de classement inconnue : {selon}")
+
+    def __repr__(self):
+        return (f"Requete(dimensions={self.dimensions}, filtres={self.filtres}, taux={self.taux}, "
+                f"top={self.top}, par={self.par!r}, selon={self.selon!r})")
+
+
+def _nom(identifiant):
+    """Identifiant entre guillemets doubles (``schema.table`` accepté)."""
+    return '.'.join('"' + partie.replace('"', '""') + '"' for partie in identifiant.split('.'))
+
+
+def _somme(colonne, dialecte):
+    # SUM d'un INT reste un INT sous SQL Server : débordement au-delà de 2^31
+    if dialecte == 'mssql':
+        return f'SUM(CAST({_nom(colonne)} AS BIGINT))'
+    return f'SUM({_nom(colonne)})'
+
+
+def _verifier_dialecte(dialecte):
+    if dialecte not in DIALECTES:
+        raise ValueError(f"Dialecte SQL inconnu : {dialecte!r} (attendu : {', '.join(DIALECTES)})")
+
+
+def _filtres(filtres):
+    """Clause ``WHERE`` des filtres et ses paramètres."""
+    conditions, parametres = [], []
+    for colonne, valeurs in filtres.items():
+        if not valeurs:
+            conditions.append('1 = 0')
+            continue
+        conditions.append(f"{_nom(colonne)} IN ({', '.join('?' * len(valeurs))})")
+        parametres += [v.item() if isinstance(v, np.generic) else v for v in valeurs]
+    return conditions, parametres
+
+
+def compiler(requete, table=TABLE_FAIT, dialecte='sqlite'):
+    """Texte SQL de la requête et ses paramètres (marqueurs ``?``)."""
+    _verifier_dialecte(dialecte)
+    cles = [_nom(dim) for dim in requete.dimensions]
+    livrees, non_livrees = (_somme(mesure, dialecte) for mesure in MESURES)
+    colonnes = cles + [f'{livrees} AS {_nom(MESURES[0])}', f'{non_livrees} AS {_nom(MESURES[1])}']
+    if requete.taux:
+        colonnes += [f'{livrees} + {non_livrees} AS "total"',
+                     f'100.0 * {livrees} / NULLIF({livrees} + {non_livrees}, 0) AS "taux"']
+
+    # Clés vides écartées des regroupements, comme groupby
+    conditions = [f'{cle} IS NOT NULL' for cle in cles]
+    filtres, parametres = _filtres(requete.filtres)
+    texte = f"SELECT {', '.join(colonnes)} FROM {_nom(table)}"
+    if conditions + filtres:
+        texte += f" WHERE {' AND '.join(conditions + filtres)}"
+    if cles:
+        texte += f" GROUP BY {', '.join(cles)}"
+
+    if requete.top is None:
+        if cles:
+            texte += f" ORDER BY {', '.join(cles)}"
+        return texte, parametres
+
+    # Top N par groupe : rang dans la partition, ex æquo par clé croissante
+    selon = _nom(requete.selon)
+    partition = f'PARTITION BY {_nom(requete.par)} ' if requete.par else ''
+    ordre = ', '.join([f'{selon} DESC'] + [f'a.{cle}' for cle in cles])
+    texte = (f"SELECT * FROM (SELECT a.*, ROW_NUMBER() OVER ({partition}ORDER BY {ordre}) AS \"rang\" "
+             f"FROM ({texte}) AS a WHERE a.{selon} IS NOT NULL) AS c WHERE c.\"rang\" <= ?")
+    ordre_final = ([_nom(requete.par)] if requete.par else []) + ['"rang"']
+    return texte + f" ORDER BY {', '.join(ordre_final)}", parametres + [int(requete.top)]
+
+
+def compiler_cube(dimensions, table=TABLE_FAIT, dialecte='sqlite', agregat=False):
+    """Cases observées du cube : sommes et effectifs par combinaison de clés (vides compris).
+
+    Sur un ``agregat`` matérialisé, l'effectif est la somme de sa colonne ``effectif``.
+    """
+    _verifier_dialecte(dialecte)
+    cles = [_nom(dim) for dim in dimensions]
+    effectif = _somme(EFFECTIF, dialecte) if agregat else 'COUNT(*)'
+    colonnes = cles + [f'{_somme(mesure, dialecte)} AS {_nom(mesure)}' for mesure in MESURES] \
+        + [f'{effectif} AS {_nom(EFFECTIF)}']
+    texte = f"SELECT {', '.join(colonnes)} FROM {_nom(table)}"
+    if cles:
+        texte += f" GROUP BY {', '.join(cles)}"
+    return texte, []
+
+
+# ============================================
+# 2. SOURCE SQL
+# ============================================
+
+def connecter(url, partageable=False):
+    """Connexion DB-API : ``sqlite:///chemin`` ou chaîne de connexion ODBC.
+
+    ``partageable`` : la connexion peut passer d'un thread à l'autre (pool
+    de connexions de :mod:`northwind_bi.etl.extraction`).
+    """
+    if url.startswith(PREFIXE_SQLITE):
+        import sqlite3
+
+        return sqlite3.connect(url[len(PREFIXE_SQLITE):], check_same_thread=not partageable)
+    try:
+        import pyodbc
+    except ImportError:
+        raise ImportError("pyodbc est nécessaire pour lire SQL Server : pip install pyodbc") from None
+    return pyodbc.connect(url)
+
+
+def _entiers(valeurs):
+    """Colonne retournée par la base en ``Int64`` (``<NA>`` pour NULL)."""
+    return pd.to_numeric(pd.Series(valeurs, dtype=object)).astype('Int64')
+
+
+class SourceSQL:
+    """Fait ``TF_COMMANDE`` lu dans une base, à la place du ``dataset``.
+
+    Offre ce que les visuels utilisent du ``dataset`` (``len``,
+    ``columns``, ``head``) ; les calculs passent par :meth:`cube` et
+    :meth:`executer`, agrégés par la base.
+    """
+
+    def __init__(self, connexion, table=TABLE_FAIT, dialecte=None, prefixe_agregats=PREFIXE_TABLE):
+        self.connexion = connexion
+        self.table = table
+        self.prefixe_agregats = prefixe_agregats
+        module = type(connexion).__module__.split('.')[0]
+        self.dialecte = dialecte or ('sqlite' if module == 'sqlite3' else 'mssql')
+        _verifier_dialecte(self.dialecte)
+        # Exceptions de la base (DB-API) qui font retomber sur le calcul Python
+        self.erreur = getattr(sys.modules.get(module), 'Error', Exception)
+        self._colonnes = None
+        self._statistiques = None
+        self._agregats = None
+
+    @classmethod
+    def depuis_url(cls, url, table=None, partageable=False):
+        return cls(connecter(url, partageable), table or os.environ.get(VARIABLE_TABLE, TABLE_FAIT))
+
+    def __repr__(self):
+        return f"SourceSQL({self.table!r}, {self.dialecte})"
+
+    def lire(self, texte, parametres=()):
+        """Résultat d'une requête en DataFrame (colonnes nommées par la base)."""
+        curseur = self.connexion.cursor()
+        try:
+            curseur.execute(texte, list(parametres))
+            noms = [description[0] for description in curseur.description]
+            return pd.DataFrame.from_records(curseur.fetchall(), columns=noms)
+        finally:
+            curseur.close()
+
+    @property
+    def columns(self):
+        if self._colonnes is None:
+            self._colonnes = pd.Index(self.lire(f"SELECT * FROM {_nom(self.table)} WHERE 1 = 0").columns)
+        return self._colonnes
+
+    @property
+    def agregats(self):
+        """``{grain: nombre de lignes}`` des tables d'agrégats présentes dans la base."""
+        if self._agregats is None:
+            self._agregats = {}
+            for grain in GRAINS if self.prefixe_agregats else ():
+                table = table_agregat(grain, self.prefixe_agregats)
+                try:
+                    self._agregats[grain] = int(self.lire(f"SELECT COUNT(*) FROM {_nom(table)}").iloc[0, 0])
+                except self.erreur:
+                    continue
+        return self._agregats
+
+    def table_pour(self, dimensions):
+        """Plus petite table qui couvre ``dimensions`` : ``(nom, est un agrégat)``."""
+        grain = choisir_grain(dimensions, self.agregats)
+        if grain is None:
+            return self.table, False
+        return table_agregat(grain, self.prefixe_agregats), True
+
+    def _statistiques_table(self):
+        """Nombre de lignes et sommes des mesures, calculés une fois par la base
+        (dans l'agrégat total s'il existe)."""
+        if self._statistiques is None:
+            table, agregat = self.table_pour(())
+            colonnes = [_somme(EFFECTIF, self.dialecte) if agregat else 'COUNT(*)'] \
+                + [_somme(mesure, self.dialecte) for mesure in MESURES]
+            if not agregat and 'id_seq_fait' in self.columns:
+                colonnes.append(f'MAX({_nom("id_seq_fait")})')
+            ligne = self.lire(f"SELECT {', '.join(colonnes)} FROM {_nom(table)}").iloc[0]
+            self._statistiques = tuple(None if pd.isna(v) else int(v) for v in ligne)
+        return self._statistiques
+
+    def __len__(self):
+        return self._statistiques_table()[0] or 0
+
+    def taille_mo(self):
+        # Rien n'est chargé en mémoire : seuls les agrégats sont transférés
+        return 0.0
+
+    def _controle_cles(self):
+        """Sommes de contrôle des clés des dimensions dans le fait, calculées par la base.
+
+        Pour chaque clé : nombre de valeurs renseignées, somme, et sommes
+        pondérées par ``nbr_commande_livrees`` et par ``id_seq_fait`` (modulo
+        un nombre premier, sans débordement) ; une ligne rattachée à un autre
+        client, employé ou mois les change, même à mesures inchangées.
+        """
+        colonnes = []
+        for dim in DIMENSIONS:
+            if dim not in self.columns:
+                continue
+            cle = f'CAST({_nom(dim)} AS BIGINT)' if self.dialecte == 'mssql' else _nom(dim)
+            colonnes += [f'COUNT({_nom(dim)})', f'SUM({cle})', f'SUM({cle} * {_nom("nbr_commande_livrees")})']
+            if 'id_seq_fait' in self.columns:
+                colonnes.append(f'SUM({cle} * ({_nom("id_seq_fait")} % 997 + 1))')
+        if not colonnes:
+            return ()
+        ligne = self.lire(f"SELECT {', '.join(colonnes)} FROM {_nom(self.table)}").iloc[0]
+        return tuple(None if pd.isna(v) else int(v) for v in ligne)
+
+    def empreinte(self):
+        """Empreinte de la table (effectif, sommes, dernière clé, contrôle des clés), sans transférer les lignes.
+
+        Le contrôle des clés parcourt le fait dans la base, même quand les
+        agrégats matérialisés répondent aux visuels.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((self.table, list(self.columns), self._statistiques_table(), self._controle_cles(),
+                       self.agregats)).encode())
+        return h.hexdigest()
+
+    def head(self, n=5):
+        if self.dialecte == 'mssql':
+            return self.lire(f"SELECT TOP (?) * FROM {_nom(self.table)}", [n])
+        return self.lire(f"SELECT * FROM {_nom(self.table)} LIMIT ?", [n])
+
+    def cube(self, dimensions=DIMENSIONS, processus=1):
+        """:class:`CubeCommandes` des ``dimensions``, cases agrégées par la base."""
+        dimensions = tuple(d for d in dimensions if d in self.columns)
+        table, agregat = self.table_pour(dimensions)
+        cases = self.lire(*compiler_cube(dimensions, table, self.dialecte, agregat))
+
+        modalites, codes = {}, []
+        for dim in dimensions:
+            valeurs = _entiers(cases[dim])
+            vides = valeurs.isna().to_numpy()
+            presentes = valeurs.to_numpy(dtype='int64', na_value=0)
+            modalites[dim] = np.unique(presentes[~vides])
+            code = np.searchsorted(modalites[dim], presentes)
+            code[vides] = len(modalites[dim])
+            codes.append(code)
+        forme = tuple(len(modalites[dim]) + 1 for dim in dimensions)
+        plat = np.ravel_multi_index(codes, forme) if codes else np.zeros(len(cases), dtype=np.intp)
+
+        cellules = {mesure: pd.to_numeric(cases[mesure]).fillna(0).to_numpy() for mesure in MESURES}
+        effectifs = pd.to_numeric(cases[EFFECTIF]).fillna(0).to_numpy(dtype='int64')
+        return CubeCommandes.depuis_cases(dimensions, modalites, int(effectifs.sum()), plat,
+                                          cellules, effectifs)
+
+    def executer(self, requete):
+        """Résultat de la requête, calculé par la base (voir :func:`executer`)."""
+        table, _ = self.table_pour(requete.dimensions + tuple(requete.filtres))
+        resultat = self.lire(*compiler(requete, table, self.dialecte))
+        for dim in requete.dimensions:
+            resultat[dim] = _entiers(resultat[dim]).astype('int64')
+        for colonne in MESURES + (('total',) if requete.taux else ()):
+            resultat[colonne] = pd.to_numeric(resultat[colonne]).astype('int64')
+        if requete.taux:
+            resultat['taux'] = pd.to_numeric(resultat['taux']).astype('float64')
+        if requete.top is not None:
+            resultat['rang'] = resultat['rang'].astype('int64')
+        if requete.dimensions:
+            return resultat.set_index(list(requete.dimensions))
+        return resultat
+
+
+def source_sql(url=None, table=None):
+    """:class:`SourceSQL` désignée par ``NORTHWIND_BI_SQL`` (``None`` si non définie)."""
+    url = url or os.environ.get(VARIABLE)
+    return SourceSQL.depuis_url(url, table) if url else None
+
+
+# ============================================
+# 3. EXÉCUTION, AVEC REPLI EN PYTHON
+# ============================================
+
+def agreger_python(donnees, requete):
+    """Même résultat que la requête SQL, calculé sur le cube des ``donnees``."""
+    from northwind_bi.classement import top_k_par_groupe
+    from northwind_bi.normalisation import ajouter_indicateurs
+    from northwind_bi.parallele import cube_commandes
+
+    dimensions = list(requete.dimensions)
+    filtres = [colonne for colonne in requete.filtres if colonne not in dimensions]
+    cube = cube_commandes(donnees, tuple(dimensions + filtres))
+    for colonne in dimensions + filtres:
+        if colonne not in cube:
+            raise KeyError(f"Dimension absente du dataset : {colonne}")
+
+    if dimensions or filtres:
+        resultat = cube.agreger(dimensions + filtres)
+        for colonne, valeurs in requete.filtres.items():
+            resultat = resultat[resultat.index.get_level_values(colonne).isin(valeurs)]
+        if filtres:
+            resultat = (resultat.groupby(level=dimensions, sort=True).sum() if dimensions
+                        else resultat.sum().to_frame().T)
+    else:
+        resultat = pd.DataFrame({mesure: [valeur] for mesure, valeur in cube.totaux().items()})
+
+    if requete.taux:
+        ajouter_indicateurs(resultat, total='total', taux='taux')
+    if requete.top is not None:
+        resultat = top_k_par_groupe(resultat, requete.par, requete.selon, requete.top)
+    return resultat
+
+
+def executer(requete, donnees):
+    """Résultat de la requête sur ``donnees`` : par la base si c'est une
+    :class:`SourceSQL`, sinon (ou si la base la refuse) en Python."""
+    if isinstance(donnees, SourceSQL):
+        try:
+            return donnees.executer(requete)
+        except donnees.erreur as erreur:
+            print(f"⚠️  Requête SQL refusée ({erreur}) : calcul en Python")
+    return agreger_python(donnees, requete)
+
+
+def compter_modalites(donnees, dimension):
+    """Nombre de valeurs distinctes (non vides) de ``dimension``."""
+    if isinstance(donnees, SourceSQL):
+        table, _ = donnees.table_pour((dimension,))
+        texte = f"SELECT COUNT(DISTINCT {_nom(dimension)}) FROM {_nom(table)}"
+        return int(donnees.lire(texte).iloc[0, 0])
+    from northwind_bi.parallele import cube_commandes
+
+    return len(cube_commandes(donnees, (dimension,)).agreger(dimension))
@@ -0,0 +1,266 @@
+"""Stock de faits TF_COMMANDE sur disque, projeté en mémoire.
+
+Pour un fait plus grand que la mémoire vive, chaque colonne est un tableau
+binaire à largeur fixe (``<colonne>.bin``), ouvert avec ``numpy.memmap``,
+et un petit ``manifeste.json`` décrit le stock : nombre de lignes, type,
+bornes et valeur des clés vides de chaque colonne. Rien n'est chargé en
+DataFrame : le cube d'agrégation lit les colonnes par tranches
+(:func:`northwind_bi.parallele.cumuler_tranches`), sur un ou plusieurs
+processus, et le classement se fait ensuite sur le cube. Les agrégats
+matérialisés (:mod:`northwind_bi.agregats`) sont écrits avec le stock
+(``agregat_<grain>.npz``) ; un cube qu'ils couvrent est lu dans le plus petit.
+
+Les visuels acceptent un stock à la place du ``dataset`` de Power BI ::
+
+    NORTHWIND_BI_STOCK=/data/tf_commande python ScriptPythonKPI.py
+
+Le stock s'écrit en flux, lot par lot, par exemple depuis l'ETL ::
+
+    ecrire_stock(construire_fait_commande(lots, resolveur), '/data/tf_commande')
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from northwind_bi.agregation import DIMENSIONS, MESURES, PLAGE_DIRECTE
+from northwind_bi.agregats import GRAINS, CumulAgregats, choisir_grain, cube_agregat
+from northwind_bi.parallele import assembler_cube, cumuler_tranches
+
+VARIABLE = 'NORTHWIND_BI_STOCK'
+MANIFESTE = 'manifeste.json'
+VERSION = 1
+
+# Types à largeur fixe des colonnes de TF_COMMANDE
+TYPES_FAIT = {
+    'id_seq_fait': 'int64',
+    'id_temps': 'int32',
+    'id_seqEmployee': 'int32',
+    'id_seqClient': 'int32',
+    'nbr_commande_livrees': 'int32',
+    'nbr_commande_non_livrees': 'int32',
+}
+# Clé vide (client ou employé introuvable) : les clés de substitution sont positives
+MANQUANT = -1
+# Lignes lues à la fois quand le stock est parcouru en série
+TAILLE_TRANCHE = 1_000_000
+
+
+# ============================================
+# 1. ÉCRITURE
+# ============================================
+
+def _ecrire_json(chemin, contenu):
+    temporaire = chemin.with_name(chemin.name + '.tmp')
+    temporaire.write_text(json.dumps(contenu, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(temporaire, chemin)
+
+
+def ecrire_stock(lots, dossier, types=TYPES_FAIT, grains=GRAINS):
+    """Écrit des lots de faits (DataFrames) dans le stock ``dossier``.
+
+    Les fichiers de colonnes sont remplacés ; le manifeste n'est écrit
+    qu'à la fin, si bien qu'un stock interrompu reste illisible plutôt que
+    tronqué. Les agrégats des ``grains`` sont cumulés au passage (``None``
+    pour s'en passer). Retourne le :class:`StockFait` écrit.
+    """
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    (dossier / MANIFESTE).unlink(missing_ok=True)
+    bornes = {nom: [None, None] for nom in types}
+    nb_lignes = 0
+    cumul = CumulAgregats(grains) if grains else None
+    fichiers = {nom: open(dossier / f'{nom}.bin', 'wb') for nom in types}
+    try:
+        for lot in (cumul.suivre(lots) if cumul else lots):
+            for nom, dtype in types.items():
+                if nom not in lot.columns:
+                    raise ValueError(f"Colonne absente du lot : {nom}")
+                colonne = lot[nom]
+                vides = colonne.isna().to_numpy()
+                if vides.any() and nom not in DIMENSIONS:
+                    raise ValueError(f"Valeurs manquantes dans la colonne {nom}")
+                valeurs = colonne.to_numpy(dtype='int64', na_value=MANQUANT)
+                presentes = valeurs[~vides]
+                if len(presentes):
+                    limites = np.iinfo(dtype)
+                    minimum, maximum = int(presentes.min()), int(presentes.max())
+                    if minimum < limites.min or maximum > limites.max or (nom in DIMENSIONS and minimum <= MANQUANT):
+                        raise ValueError(f"Valeurs de {nom} hors du type {dtype} : [{minimum}, {maximum}]")
+                    ancien_min, ancien_max = bornes[nom]
+                    bornes[nom] = [minimum if ancien_min is None else min(ancien_min, minimum),
+                                   maximum if ancien_max is None else max(ancien_max, maximum)]
+                fichiers[nom].write(valeurs.astype(dtype).tobytes())
+            nb_lignes += len(lot)
+    finally:
+        for fichier in fichiers.values():
+            fichier.close()
+
+    agregats = {}
+    for grain, table in (cumul.tables() if cumul else {}).items():
+        fichier = f'agregat_{grain}.npz'
+        np.savez(dossier / fichier, **{
+            colonne: table[colonne].to_numpy(dtype='int64', na_value=MANQUANT) for colonne in table.columns})
+        agregats[grain] = {'fichier': fichier, 'dimensions': list(cumul.grains[grain]), 'lignes': len(table)}
+
+    _ecrire_json(dossier / MANIFESTE, {
+        'version': VERSION,
+        'schema': 'TF_COMMANDE',
+        'nb_lignes': nb_lignes,
+        'ecrit_le': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'colonnes': {
+            nom: {
+                'fichier': f'{nom}.bin',
+                'dtype': np.dtype(dtype).str,
+                'manquant': MANQUANT if nom in DIMENSIONS else None,
+                'min': bornes[nom][0],
+                'max': bornes[nom][1],
+            }
+            for nom, dtype in types.items()
+        },
+        'agregats': agregats,
+    })
+    return StockFait(dossier)
+
+
+# ============================================
+# 2. LECTURE
+# ============================================
+
+class StockFait:
+    """Stock de faits ouvert en lecture.
+
+    Offre aux visuels ce qu'ils utilisent du ``dataset`` (``len``,
+    ``columns``, ``head``) ; les calculs passent par :meth:`cube`.
+    """
+
+    def __init__(self, dossier):
+        self.dossier = Path(dossier)
+        chemin = self.dossier / MANIFESTE
+        try:
+            self.manifeste = json.loads(chemin.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Stock de faits incomplet ou absent : {chemin}") from None
+        if self.manifeste.get('version') != VERSION:
+            raise ValueError(f"Version de stock non prise en charge : {self.manifeste.get('version')}")
+        self.nb_lignes = self.manifeste['nb_lignes']
+
+    def __len__(self):
+        return self.nb_lignes
+
+    def __repr__(self):
+        return f"StockFait({str(self.dossier)!r}, {self.nb_lignes} lignes)"
+
+    @property
+    def columns(self):
+        return pd.Index(list(self.manifeste['colonnes']))
+
+    def _description(self, nom):
+        try:
+            return self.manifeste['colonnes'][nom]
+        except KeyError:
+            raise KeyError(f"Colonne absente du stock : {nom}") from None
+
+    def colonne(self, nom):
+        """Colonne projetée en mémoire (lecture seule, rien n'est chargé)."""
+        description = self._description(nom)
+        if not self.nb_lignes:
+            return np.empty(0, dtype=description['dtype'])
+        return np.memmap(self.dossier / description['fichier'], dtype=description['dtype'],
+                         mode='r', shape=(self.nb_lignes,))
+
+    @property
+    def agregats(self):
+        """``{grain: nombre de lignes}`` des agrégats matérialisés du stock."""
+        return {grain: d['lignes'] for grain, d in self.manifeste.get('agregats', {}).items()}
+
+    def agregat(self, grain):
+        """Lignes de l'agrégat ``grain`` (clés vides en ``<NA>``)."""
+        description = self.manifeste['agregats'][grain]
+        with np.load(self.dossier / description['fichier']) as contenu:
+            colonnes = {nom: contenu[nom] for nom in contenu.files}
+        for dim in description['dimensions']:
+            colonnes[dim] = pd.arrays.IntegerArray(colonnes[dim], colonnes[dim] == MANQUANT)
+        return pd.DataFrame(colonnes)
+
+    def taille_mo(self):
+        return sum(np.dtype(d['dtype']).itemsize for d in self.manifeste['colonnes'].values()) \
+            * self.nb_lignes / 2**20
+
+    def empreinte(self):
+        """Empreinte du stock (manifeste et fichiers), sans lire les données."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps(self.manifeste, sort_keys=True).encode())
+        for description in self.manifeste['colonnes'].values():
+            etat = (self.dossier / description['fichier']).stat()
+            h.update(f"{etat.st_size}:{etat.st_mtime_ns}".encode())
+        return h.hexdigest()
+
+    def lots(self, colonnes=None, taille=TAILLE_TRANCHE):
+        """DataFrames successifs de ``taille`` lignes (clés vides en ``<NA>``)."""
+        colonnes = list(self.columns if colonnes is None else colonnes)
+        projections = {nom: self.colonne(nom) for nom in colonnes}
+        for debut in range(0, self.nb_lignes, taille):
+            lot = {}
+            for nom, valeurs in projections.items():
+                tranche = np.asarray(valeurs[debut:debut + taille])
+                manquant = self._description(nom)['manquant']
+                if manquant is not None:
+                    tranche = pd.arrays.IntegerArray(tranche.copy(), tranche == manquant)
+                lot[nom] = tranche
+            yield pd.DataFrame(lot, index=pd.RangeIndex(debut, debut + len(next(iter(lot.values())))))
+
+    def head(self, n=5):
+        return next(self.lots(taille=n), pd.DataFrame(columns=self.columns))
+
+    def vers_dataframe(self, colonnes=None):
+        """Tout le stock en DataFrame (à réserver aux stocks qui tiennent en mémoire)."""
+        return pd.concat(self.lots(colonnes), ignore_index=True) if self.nb_lignes else self.head()
+
+    def cube(self, dimensions=DIMENSIONS, processus=1, taille_tranche=TAILLE_TRANCHE):
+        """:class:`~northwind_bi.agregation.CubeCommandes` du stock : lu dans le plus
+        petit agrégat qui couvre ``dimensions``, sinon dans le fait, par tranches."""
+        dimensions = tuple(d for d in dimensions if d in self.columns)
+        grain = choisir_grain(dimensions, self.agregats)
+        if grain is not None:
+            return cube_agregat(self.agregat(grain), dimensions)
+        colonnes = {nom: ('fichier', str(self.dossier / self._description(nom)['fichier']),
+                          self._description(nom)['dtype'], self.nb_lignes)
+                    for nom in dimensions + MESURES}
+        manquants = {dim: self._description(dim)['manquant'] for dim in dimensions}
+
+        # Bornes du manifeste : clés à plage courte codées sans premier passage
+        modalites = []
+        for dim in dimensions:
+            description = self._description(dim)
+            if description['min'] is None or description['max'] - description['min'] >= PLAGE_DIRECTE:
+                modalites = None
+                break
+            modalites.append(np.arange(description['min'], description['max'] + 1, dtype=description['dtype']))
+
+        modalites, cumul = cumuler_tranches(colonnes, dimensions, self.nb_lignes, processus,
+                                            taille_tranche, manquants, modalites)
+        return assembler_cube(dimensions, modalites,
+                              {dim: np.dtype(self._description(dim)['dtype']) for dim in dimensions},
+                              self.nb_lignes, cumul, {mesure: True for mesure in MESURES})
+
+
+def stock_ou_dataset(dataset=None):
+    """Le stock désigné par ``NORTHWIND_BI_STOCK`` s'il est défini, sinon la
+    base désignée par ``NORTHWIND_BI_SQL`` (:mod:`northwind_bi.sql`), sinon ``dataset``."""
+    from northwind_bi.sql import VARIABLE as VARIABLE_SQL, source_sql
+
+    dossier = os.environ.get(VARIABLE)
+    if dossier:
+        return StockFait(dossier)
+    source = source_sql()
+    if source is not None:
+        return source
+    if dataset is None:
+        raise NameError(f"Pas de dataset Power BI : définir {VARIABLE} (stock de faits) ou {VARIABLE_SQL} (base)")
+    return dataset
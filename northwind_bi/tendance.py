@@ -0,0 +1,118 @@
+"""Taux de livraison glissants et tendance par période.
+
+Les commandes livrées / non livrées de chaque ``id_temps`` sont cumulées
+une seule fois (sommes préfixes). Ensuite, toute fenêtre de périodes se
+lit en temps constant : taux de livraison de la fenêtre, variation d'un
+mois sur l'autre et pente des moindres carrés du taux mensuel. Les sommes
+de la régression (``x``, ``x²``, ``y``, ``xy``) sont cumulées de la même
+façon.
+
+La tendance du KPI est la variation ajustée par la droite de régression
+sur la fenêtre. Elle remplace la comparaison du premier et du dernier mois,
+trop sensible à un mois isolé.
+"""
+
+import numpy as np
+
+# Variation ajustée (en points de taux) au-delà de laquelle la tendance n'est plus stable
+SEUIL_TENDANCE = 5.0
+
+
+def _cumuler(valeurs):
+    return np.concatenate(([0.0], np.cumsum(valeurs)))
+
+
+class SerieLivraison:
+    """Série des taux de livraison par période, interrogeable par fenêtre.
+
+    ``par_temps`` est l'agrégat par ``id_temps`` (index ou colonne). Les
+    fenêtres sont des positions ``[debut, fin[`` dans les périodes triées,
+    avec les conventions des tranches Python (``-12`` : douze dernières).
+    L'abscisse de la régression est ``id_temps`` lui-même : les périodes
+    absentes du ``dataset`` (segment filtré) restent des trous.
+    """
+
+    def __init__(self, par_temps):
+        if 'id_temps' in par_temps.columns:
+            par_temps = par_temps.set_index('id_temps')
+        par_temps = par_temps.sort_index()
+        self.periodes = par_temps.index.to_numpy()
+        livrees = par_temps['nbr_commande_livrees'].to_numpy(dtype=float)
+        total = livrees + par_temps['nbr_commande_non_livrees'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.taux_mensuels = livrees / total * 100
+
+        # Abscisse recentrée sur la première période (précision des x²)
+        x = self.periodes.astype(float) - (float(self.periodes[0]) if len(self.periodes) else 0.0)
+        valide = ~np.isnan(self.taux_mensuels)
+        y = np.where(valide, self.taux_mensuels, 0.0)
+        self._livrees = _cumuler(livrees)
+        self._total = _cumuler(total)
+        self._n = _cumuler(valide)
+        self._x = _cumuler(np.where(valide, x, 0.0))
+        self._xx = _cumuler(np.where(valide, x * x, 0.0))
+        self._y = _cumuler(y)
+        self._xy = _cumuler(x * y)
+
+    @classmethod
+    def depuis_cube(cls, cube):
+        return cls(cube.agreger('id_temps'))
+
+    def __len__(self):
+        return len(self.periodes)
+
+    def _bornes(self, debut, fin):
+        debut, fin, _ = slice(debut, fin).indices(len(self))
+        return debut, max(debut, fin)
+
+    def taux(self, debut=None, fin=None):
+        """Taux de livraison (%) de l'ensemble des commandes de la fenêtre."""
+        debut, fin = self._bornes(debut, fin)
+        total = self._total[fin] - self._total[debut]
+        return (self._livrees[fin] - self._livrees[debut]) / total * 100 if total else np.nan
+
+    def taux_glissants(self, fenetre):
+        """Taux de chaque fenêtre de ``fenetre`` périodes, indexé par sa dernière
+        période (``NaN`` tant que la fenêtre est incomplète)."""
+        fin = np.arange(1, len(self) + 1)
+        debut = np.maximum(fin - fenetre, 0)
+        total = self._total[fin] - self._total[debut]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            taux = (self._livrees[fin] - self._livrees[debut]) / total * 100
+        taux[fin < fenetre] = np.nan
+        return taux
+
+    def variations(self):
+        """Variation du taux mensuel sur la période précédente, en points."""
+        return np.diff(self.taux_mensuels, prepend=np.nan)
+
+    def pente(self, debut=None, fin=None):
+        """Pente des moindres carrés du taux mensuel (points par période)."""
+        debut, fin = self._bornes(debut, fin)
+        n = self._n[fin] - self._n[debut]
+        sx = self._x[fin] - self._x[debut]
+        sxx = self._xx[fin] - self._xx[debut]
+        sy = self._y[fin] - self._y[debut]
+        sxy = self._xy[fin] - self._xy[debut]
+        denominateur = n * sxx - sx * sx
+        if n < 2 or denominateur <= 0:
+            return 0.0
+        return (n * sxy - sx * sy) / denominateur
+
+    def variation_ajustee(self, debut=None, fin=None):
+        """Variation du taux lue sur la droite de régression, d'un bout à l'autre de la fenêtre."""
+        debut, fin = self._bornes(debut, fin)
+        if fin - debut < 2:
+            return 0.0
+        return self.pente(debut, fin) * float(self.periodes[fin - 1] - self.periodes[debut])
+
+    def tendance(self, fenetre=None, seuil=SEUIL_TENDANCE):
+        """Libellé de tendance sur les ``fenetre`` dernières périodes (toutes si ``None``)."""
+        if len(self) < 2:
+            return "Stable"
+        variation = self.variation_ajustee(None if fenetre is None else -fenetre)
+        if variation > seuil:
+            return "↗ Amélioration"
+        if variation < -seuil:
+            return "↘ Baisse"
+        return "➡ Stable"
@@ -0,0 +1,82 @@
+"""Cube d'agrégation (dense, creux, parallèle) contre ``groupby``."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from northwind_bi import agregation
+from northwind_bi.agregation import DIMENSIONS, MESURES, CubeCommandes
+from northwind_bi.parallele import cube_commandes
+
+REGROUPEMENTS = [['id_temps'], ['id_seqClient'], ['id_seqEmployee'], ['id_temps', 'id_seqClient'],
+                 ['id_seqClient', 'id_seqEmployee'], ['id_seqEmployee', 'id_temps'], list(DIMENSIONS)]
+
+
+def _fait(n=5000, clients=400, graine=0):
+    rng = np.random.default_rng(graine)
+    fait = pd.DataFrame({
+        'id_seq_fait': np.arange(1, n + 1),
+        'id_temps': rng.integers(1, 24, n),
+        'id_seqClient': rng.integers(1, clients, n),
+        'id_seqEmployee': rng.integers(1, 10, n),
+    })
+    fait['nbr_commande_livrees'] = (rng.random(n) < 0.9).astype('int64')
+    fait['nbr_commande_non_livrees'] = 1 - fait['nbr_commande_livrees']
+    return fait
+
+
+def _avec_cles_vides(fait, graine=1):
+    """Clients et employés vides sur quelques lignes (jointures externes de l'ETL)."""
+    rng = np.random.default_rng(graine)
+    fait = fait.astype({'id_seqClient': 'Int64', 'id_seqEmployee': 'float64'})
+    fait.loc[rng.random(len(fait)) < 0.05, 'id_seqClient'] = pd.NA
+    fait.loc[rng.random(len(fait)) < 0.05, 'id_seqEmployee'] = np.nan
+    return fait
+
+
+def _verifier(cube, fait):
+    assert cube.totaux() == {mesure: fait[mesure].sum() for mesure in MESURES}
+    for dimensions in REGROUPEMENTS:
+        attendu = fait.groupby(dimensions)[list(MESURES)].sum()
+        pd.testing.assert_frame_equal(cube.agreger(dimensions), attendu, check_dtype=False,
+                                      check_index_type=False)
+
+
+@pytest.mark.parametrize('vides', [False, True])
+def test_cube_dense(vides):
+    fait = _fait()
+    fait = _avec_cles_vides(fait) if vides else fait
+    cube = CubeCommandes(fait)
+    assert cube.dense
+    _verifier(cube, fait)
+
+
+@pytest.mark.parametrize('vides', [False, True])
+def test_cube_creux(monkeypatch, vides):
+    monkeypatch.setattr(agregation, 'SEUIL_DENSE', 0)
+    fait = _fait()
+    fait = _avec_cles_vides(fait) if vides else fait
+    cube = CubeCommandes(fait)
+    assert not cube.dense
+    _verifier(cube, fait)
+
+
+def test_cube_dimensions_absentes():
+    fait = _fait().drop(columns='id_seqEmployee')
+    cube = CubeCommandes(fait)
+    assert cube.dimensions == ('id_temps', 'id_seqClient')
+    with pytest.raises(KeyError):
+        cube.agreger('id_seqEmployee')
+
+
+@pytest.mark.parametrize('vides', [False, True])
+def test_cube_parallele(vides):
+    fait = _fait(n=20_000)
+    fait = _avec_cles_vides(fait) if vides else fait
+    serie = cube_commandes(fait, processus=1, seuil=0)
+    parallele = cube_commandes(fait, processus=2, seuil=0)
+    assert parallele.totaux() == serie.totaux()
+    for dimensions in REGROUPEMENTS:
+        pd.testing.assert_frame_equal(parallele.agreger(dimensions), serie.agreger(dimensions),
+                                      check_index_type=False)
+    _verifier(parallele, fait)
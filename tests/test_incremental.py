@@ -0,0 +1,90 @@
+"""Rafraîchissement incrémental de TF_COMMANDE contre une reconstruction complète."""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from northwind_bi.agregats import EFFECTIF, GRAINS, MESURES, agreger_lot, fusionner_agregats, table_agregat
+from northwind_bi.etl.cles import ResolveurCles
+from northwind_bi.etl.fait_commande import COLONNES_FAIT, construire_fait_commande, lire_orders_ssms
+from northwind_bi.etl.incremental import RafraichissementIncremental
+
+NB_COMMANDES = 3000
+NB_CHARGEES = 2000
+
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp('2006-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 700, NB_COMMANDES)), unit='D')
+    expediees = dates + pd.to_timedelta(rng.integers(1, 30, NB_COMMANDES), unit='D')
+    return pd.DataFrame({
+        'OrderID': np.arange(10248, 10248 + NB_COMMANDES),
+        'CustomerID': rng.choice(['ALFKI', 'ANATR', 'BONAP', 'INCONNU'], NB_COMMANDES),
+        'EmployeeID': rng.integers(1, 10, NB_COMMANDES),
+        'OrderDate': dates,
+        'ShippedDate': expediees.where(rng.random(NB_COMMANDES) < 0.8),
+    })
+
+
+@pytest.fixture
+def resolveur():
+    dim_client = pd.DataFrame({'id_seqClient': [1, 2, 3], 'id_client_prod': ['ALFKI', 'ANATR', 'BONAP'],
+                               'source_prod': 'SSMS'})
+    dim_employee = pd.DataFrame({'id_seqEmployee': np.arange(1, 10),
+                                 'id_employee_prod': np.arange(1, 10).astype(str), 'source_prod': 'SSMS'})
+    mois = pd.period_range('2006-01', '2007-12', freq='M')
+    dim_temps = pd.DataFrame({'id_temps': np.arange(1, len(mois) + 1), 'annee': mois.year,
+                              'mois_annee': mois.strftime('%m/%Y')})
+    return lambda: ResolveurCles(dim_client, dim_employee, dim_temps)
+
+
+def _rafraichir(dossier, source, entrepot, resolveur):
+    rafraichissement = RafraichissementIncremental(dossier)
+    lots = lire_orders_ssms(source, taille_lot=400, **rafraichissement.watermarks('SSMS'))
+    return rafraichissement.appliquer(lots, resolveur(), entrepot)
+
+
+def _verifier_reconstruction(source, entrepot, resolveur):
+    complet = pd.concat(construire_fait_commande(lire_orders_ssms(source), resolveur()), ignore_index=True)
+    fait = pd.read_sql_query('SELECT * FROM TF_COMMANDE ORDER BY id_seq_fait', entrepot)
+    pd.testing.assert_frame_equal(fait[COLONNES_FAIT], complet[COLONNES_FAIT], check_dtype=False)
+
+    mensuel = pd.read_sql_query('SELECT * FROM AGG_COMMANDE_MENSUEL', entrepot).set_index('id_temps')
+    attendu = complet.groupby('id_temps')[list(MESURES)].sum()
+    pd.testing.assert_frame_equal(mensuel.loc[attendu.index, MESURES], attendu, check_dtype=False)
+
+    for grain, dims in GRAINS.items():
+        table = pd.read_sql_query(f'SELECT * FROM {table_agregat(grain)}', entrepot)
+        attendu = fusionner_agregats([agreger_lot(complet, dims)], dims)
+        colonnes = [*dims, *MESURES, EFFECTIF]
+        if dims:
+            table = table.astype({dim: 'Int64' for dim in dims}).sort_values(list(dims), ignore_index=True)
+            attendu = attendu.astype({dim: 'Int64' for dim in dims}).sort_values(list(dims), ignore_index=True)
+        pd.testing.assert_frame_equal(table[colonnes], attendu[colonnes], check_dtype=False)
+
+
+def test_expeditions_antidatees(tmp_path, orders, resolveur):
+    source, entrepot = sqlite3.connect(':memory:'), sqlite3.connect(':memory:')
+    chargees = orders.iloc[:NB_CHARGEES].copy()
+    # Une commande en attente passée au jour du watermark
+    chargees.loc[NB_CHARGEES - 1, 'ShippedDate'] = pd.NaT
+    chargees.to_sql('Orders', source, index=False)
+    assert _rafraichir(tmp_path, source, entrepot, resolveur) == {'nouvelles': NB_CHARGEES, 'expediees': 0}
+
+    # Expédition des commandes en attente, datée du lendemain de la commande :
+    # bien avant les dernières expéditions déjà chargées
+    suite = pd.concat([chargees, orders.iloc[NB_CHARGEES:]], ignore_index=True)
+    en_attente = suite.index[:NB_CHARGEES][suite['ShippedDate'].iloc[:NB_CHARGEES].isna()]
+    suite.loc[en_attente, 'ShippedDate'] = suite.loc[en_attente, 'OrderDate'] + pd.Timedelta(days=1)
+    assert suite.loc[en_attente, 'ShippedDate'].min() < chargees['ShippedDate'].max()
+    suite.to_sql('Orders', source, index=False, if_exists='replace')
+
+    bilan = _rafraichir(tmp_path, source, entrepot, resolveur)
+    assert bilan == {'nouvelles': NB_COMMANDES - NB_CHARGEES, 'expediees': len(en_attente)}
+    _verifier_reconstruction(source, entrepot, resolveur)
+
+    assert _rafraichir(tmp_path, source, entrepot, resolveur) == {'nouvelles': 0, 'expediees': 0}
+    _verifier_reconstruction(source, entrepot, resolveur)
@@ -0,0 +1,74 @@
+"""Esquisse de quantiles : erreur de rang, fusion, sérialisation."""
+
+import json
+
+import numpy as np
+import pytest
+
+from northwind_bi.quantiles import K_DEFAUT, EsquisseQuantiles
+
+PROBABILITES = np.linspace(0.01, 0.99, 99)
+# Erreur de rang garantie avec une probabilité de 99 % (docstring du module)
+ERREUR_RANG = 3.3 / K_DEFAUT
+
+
+def _erreur_rang(valeurs, estimations, q):
+    """Écart entre ``q`` et le rang relatif de chaque estimation dans ``valeurs``."""
+    triees = np.sort(valeurs)
+    bas = np.searchsorted(triees, estimations, side='left') / len(triees)
+    haut = np.searchsorted(triees, estimations, side='right') / len(triees)
+    return np.maximum(0, np.maximum(bas - q, q - haut))
+
+
+def _valeurs(n=200_000, graine=0):
+    rng = np.random.default_rng(graine)
+    # Taux de livraison en pourcentage : beaucoup d'ex æquo à 100
+    return np.where(rng.random(n) < 0.3, 100.0, rng.beta(8, 2, n) * 100)
+
+
+def test_exacte_sous_la_capacite():
+    valeurs = _valeurs(n=300)
+    esquisse = EsquisseQuantiles().ajouter(valeurs)
+    assert esquisse.exacte()
+    np.testing.assert_allclose(esquisse.quantiles(PROBABILITES), np.quantile(valeurs, PROBABILITES))
+
+
+@pytest.mark.parametrize('graine', range(3))
+def test_erreur_de_rang(graine):
+    valeurs = _valeurs(graine=graine)
+    esquisse = EsquisseQuantiles(graine=graine)
+    for lot in np.array_split(valeurs, 37):
+        esquisse.ajouter(lot)
+    assert not esquisse.exacte()
+    assert len(esquisse) == len(valeurs)
+    assert sum(len(niveau) for niveau in esquisse.niveaux) < 3 * K_DEFAUT
+    assert _erreur_rang(valeurs, esquisse.quantiles(PROBABILITES), PROBABILITES).max() <= ERREUR_RANG
+    assert esquisse.quantile(0) == valeurs.min()
+    assert esquisse.quantile(1) == valeurs.max()
+
+
+def test_fusion_de_partitions():
+    valeurs = _valeurs()
+    parties = [EsquisseQuantiles(graine=i).ajouter(partie)
+               for i, partie in enumerate(np.array_split(valeurs, 8))]
+    fusion = EsquisseQuantiles()
+    for partie in parties:
+        fusion.fusionner(partie)
+    assert len(fusion) == len(valeurs)
+    assert _erreur_rang(valeurs, fusion.quantiles(PROBABILITES), PROBABILITES).max() <= ERREUR_RANG
+
+
+def test_valeurs_manquantes_et_vide():
+    esquisse = EsquisseQuantiles()
+    assert np.isnan(esquisse.quantile(0.5))
+    esquisse.ajouter([np.nan, 1.0, 3.0, np.nan])
+    assert len(esquisse) == 2
+    assert esquisse.quantile(0.5) == 2.0
+    assert len(esquisse.fusionner(EsquisseQuantiles())) == 2
+
+
+def test_serialisation():
+    esquisse = EsquisseQuantiles().ajouter(_valeurs(n=50_000))
+    reprise = EsquisseQuantiles.depuis_dict(json.loads(json.dumps(esquisse.vers_dict())))
+    np.testing.assert_array_equal(reprise.quantiles(PROBABILITES), esquisse.quantiles(PROBABILITES))
+    assert len(reprise) == len(esquisse)
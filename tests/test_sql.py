@@ -0,0 +1,100 @@
+"""Requêtes compilées en SQL (SQLite) contre le calcul Python sur le DataFrame."""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from northwind_bi.agregation import CubeCommandes
+from northwind_bi.agregats import GRAINS, agreger_lot, ecrire_agregats_sql, fusionner_agregats
+from northwind_bi.sql import Requete, SourceSQL, agreger_python, compiler, compter_modalites, executer
+
+REQUETES = [
+    Requete(),
+    Requete(taux=True),
+    Requete('id_seqClient'),
+    Requete(['id_temps', 'id_seqEmployee'], taux=True),
+    Requete('id_seqClient', top=10),
+    Requete('id_seqClient', top=10, selon='taux'),
+    Requete(['id_temps', 'id_seqClient'], top=3, par='id_temps'),
+    Requete(['id_seqEmployee', 'id_seqClient'], top=2, par='id_seqEmployee', selon='nbr_commande_livrees'),
+    Requete('id_seqClient', filtres={'id_temps': [3, 4, 5]}, taux=True),
+    Requete(filtres={'id_seqEmployee': [1, 2]}),
+    Requete('id_temps', filtres={'id_seqClient': []}),
+]
+
+
+@pytest.fixture
+def fait():
+    rng = np.random.default_rng(0)
+    n = 4000
+    fait = pd.DataFrame({
+        'id_seq_fait': np.arange(1, n + 1),
+        'id_temps': rng.integers(1, 24, n),
+        'id_seqClient': pd.array(rng.integers(1, 90, n), dtype='Int64'),
+        'id_seqEmployee': rng.integers(1, 10, n),
+    })
+    fait.loc[rng.random(n) < 0.03, 'id_seqClient'] = pd.NA
+    fait['nbr_commande_livrees'] = (rng.random(n) < 0.9).astype('int64')
+    fait['nbr_commande_non_livrees'] = 1 - fait['nbr_commande_livrees']
+    return fait
+
+
+@pytest.fixture(params=[False, True], ids=['fait', 'agregats'])
+def source(request, fait):
+    connexion = sqlite3.connect(':memory:')
+    fait.to_sql('TF_COMMANDE', connexion, index=False)
+    if request.param:
+        ecrire_agregats_sql({grain: fusionner_agregats([agreger_lot(fait, dims)], dims)
+                             for grain, dims in GRAINS.items()}, connexion)
+    source = SourceSQL(connexion)
+    assert bool(source.agregats) == request.param
+    yield source
+    connexion.close()
+
+
+@pytest.mark.parametrize('requete', REQUETES, ids=repr)
+def test_requete_sql_comme_python(source, fait, requete, capsys):
+    attendu = agreger_python(fait, requete)
+    resultat = executer(requete, source)
+    # Calculé par la base, sans repli en Python
+    assert 'Requête SQL refusée' not in capsys.readouterr().out
+    pd.testing.assert_frame_equal(resultat.reset_index(drop=not requete.dimensions),
+                                  attendu.reset_index(drop=not requete.dimensions),
+                                  check_dtype=False, check_index_type=False)
+
+
+def test_cube_sql(source, fait):
+    attendu = CubeCommandes(fait)
+    cube = source.cube()
+    assert cube.totaux() == attendu.totaux()
+    assert len(source) == len(fait)
+    for dimensions in (['id_temps'], ['id_seqClient', 'id_seqEmployee'], ['id_temps', 'id_seqClient']):
+        pd.testing.assert_frame_equal(cube.agreger(dimensions), attendu.agreger(dimensions),
+                                      check_dtype=False, check_index_type=False)
+    assert compter_modalites(source, 'id_seqClient') == fait['id_seqClient'].nunique()
+
+
+def test_compiler_mssql():
+    texte, parametres = compiler(Requete('id_seqClient', top=5, filtres={'id_temps': [1, 2]}),
+                                 dialecte='mssql')
+    assert 'SUM(CAST("nbr_commande_livrees" AS BIGINT))' in texte
+    assert 'ROW_NUMBER() OVER (ORDER BY' in texte
+    assert parametres == [1, 2, 5]
+    with pytest.raises(ValueError):
+        compiler(Requete(), dialecte='oracle')
+
+
+def test_empreinte_suit_les_cles(source):
+    empreinte = source.empreinte()
+    assert SourceSQL(source.connexion).empreinte() == empreinte
+    # Deux lignes aux mêmes mesures échangent leur client : sommes et effectif inchangés
+    lignes = source.lire('SELECT id_seq_fait, id_seqClient FROM TF_COMMANDE '
+                         'WHERE nbr_commande_livrees = 1 AND id_seqClient IS NOT NULL ORDER BY id_seq_fait')
+    premiere = lignes.iloc[0]
+    seconde = lignes[lignes['id_seqClient'] != premiere['id_seqClient']].iloc[0]
+    for ligne, client in ((premiere, seconde['id_seqClient']), (seconde, premiere['id_seqClient'])):
+        source.connexion.execute('UPDATE TF_COMMANDE SET id_seqClient = ? WHERE id_seq_fait = ?',
+                                 (int(client), int(ligne['id_seq_fait'])))
+    assert SourceSQL(source.connexion).empreinte() != empreinte